@@ -1,6 +1,18 @@
 import os
-from typing import Generator
+from typing import Any, AsyncIterator, Dict, Generator, Optional
 from dotenv import load_dotenv
+import asyncio
+import threading
+
+from contextlib import asynccontextmanager
+
+from .pool import (
+    AsyncConnectionPool,
+    AsyncPooledConnection,
+    ConnectionPool,
+    PooledConnection,
+    ThreadedAsyncConnection,
+)
 
 # Opção MySQL (legado)
 import pymysql
@@ -16,42 +28,67 @@ except Exception:
 
 def is_postgres_connection(conn: object) -> bool:
     try:
-        return psycopg is not None and isinstance(conn, psycopg.Connection)
+        raw = conn
+        while isinstance(raw, (PooledConnection, AsyncPooledConnection, ThreadedAsyncConnection)):
+            raw = raw.raw
+        return psycopg is not None and isinstance(raw, (psycopg.Connection, psycopg.AsyncConnection))
     except Exception:
         return False
 
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env"))
 
 
-def get_db() -> Generator[object, None, None]:
-    """
-    Retorna conexão com banco.
-    - Se PGHOST estiver definido, conecta em PostgreSQL (psycopg) com row_factory dict.
-    - Caso contrário, usa MySQL (PyMySQL) como fallback.
-    """
-    pghost = os.getenv("PGHOST")
-    if pghost and psycopg is not None:
-        connection = psycopg.connect(
-            host=pghost,
-            port=int(os.getenv("PGPORT", "5432")),
-            user=os.getenv("PGUSER"),
-            password=os.getenv("PGPASSWORD"),
-            dbname=os.getenv("PGDATABASE"),
-            sslmode=os.getenv("PGSSLMODE", "require"),
-            row_factory=pg_dict_row,
-        )
-        connection.autocommit = True
-        try:
-            yield connection
-        finally:
-            try:
-                connection.close()
-            except Exception:
-                pass
-        return
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_async_pool: Optional[AsyncConnectionPool] = None
+
+
+def _use_postgres() -> bool:
+    return bool(os.getenv("PGHOST")) and psycopg is not None
+
+
+def _pool_settings() -> Dict[str, Any]:
+    return {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+        "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+        "check_interval": float(os.getenv("DB_POOL_CHECK_INTERVAL", "30")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    }
+
+
+def _connect_postgres():
+    connection = psycopg.connect(
+        host=os.getenv("PGHOST"),
+        port=int(os.getenv("PGPORT", "5432")),
+        user=os.getenv("PGUSER"),
+        password=os.getenv("PGPASSWORD"),
+        dbname=os.getenv("PGDATABASE"),
+        sslmode=os.getenv("PGSSLMODE", "require"),
+        row_factory=pg_dict_row,
+    )
+    connection.autocommit = True
+    return connection
 
-    # Fallback MySQL
-    connection = pymysql.connect(
+
+def _check_postgres(connection) -> bool:
+    if connection.closed or connection.broken:
+        return False
+    with connection.cursor() as cur:
+        cur.execute("SELECT 1")
+    return True
+
+
+def _reset_postgres(connection) -> None:
+    # Conexões devolvidas com transação aberta/erro (ex.: autocommit desligado) são limpas
+    if connection.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+        connection.rollback()
+    connection.autocommit = True
+
+
+def _connect_mysql():
+    return pymysql.connect(
         host=os.getenv("DB_HOST", "localhost"),
         user=os.getenv("DB_USER", "root"),
         password=os.getenv("DB_PASS", ""),
@@ -60,11 +97,155 @@ def get_db() -> Generator[object, None, None]:
         cursorclass=pymysql.cursors.DictCursor,
         autocommit=True,
     )
+
+
+def _check_mysql(connection) -> bool:
+    if not connection.open:
+        return False
+    connection.ping(reconnect=False)
+    return True
+
+
+def _reset_mysql(connection) -> None:
+    connection.rollback()
+    connection.autocommit(True)
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Pool de conexões do processo (criado sob demanda).
+    - PostgreSQL se PGHOST estiver definido; caso contrário MySQL.
+    - Dimensionado via DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_MAX_IDLE,
+      DB_POOL_MAX_LIFETIME, DB_POOL_CHECK_INTERVAL e DB_POOL_TIMEOUT.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            use_pg = _use_postgres()
+            _pool = ConnectionPool(
+                _connect_postgres if use_pg else _connect_mysql,
+                check=_check_postgres if use_pg else _check_mysql,
+                reset=_reset_postgres if use_pg else _reset_mysql,
+                name="postgres" if use_pg else "mysql",
+                **_pool_settings(),
+            )
+    return _pool
+
+
+async def _connect_postgres_async():
+    return await psycopg.AsyncConnection.connect(
+        host=os.getenv("PGHOST"),
+        port=int(os.getenv("PGPORT", "5432")),
+        user=os.getenv("PGUSER"),
+        password=os.getenv("PGPASSWORD"),
+        dbname=os.getenv("PGDATABASE"),
+        sslmode=os.getenv("PGSSLMODE", "require"),
+        row_factory=pg_dict_row,
+        autocommit=True,
+    )
+
+
+async def _check_postgres_async(connection) -> bool:
+    if connection.closed or connection.broken:
+        return False
+    async with connection.cursor() as cur:
+        await cur.execute("SELECT 1")
+    return True
+
+
+async def _reset_postgres_async(connection) -> None:
+    if connection.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+        await connection.rollback()
+    await connection.set_autocommit(True)
+
+
+def get_async_pool() -> Optional[AsyncConnectionPool]:
+    """
+    Pool assíncrono nativo (psycopg AsyncConnection). Retorna None no MySQL,
+    onde o acesso assíncrono usa o pool síncrono com I/O em threads.
+    """
+    global _async_pool
+    if not _use_postgres():
+        return None
+    if _async_pool is None:
+        # Criado dentro do event loop; sem await entre o teste e a atribuição
+        _async_pool = AsyncConnectionPool(
+            _connect_postgres_async,
+            check=_check_postgres_async,
+            reset=_reset_postgres_async,
+            name="postgres-async",
+            **_pool_settings(),
+        )
+    return _async_pool
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Estatísticas do pool (em uso, aguardando, criadas, recicladas) para dimensionamento."""
+    stats: Dict[str, Any] = {"initialized": _pool is not None}
+    if _pool is not None:
+        stats.update(_pool.stats())
+    if _async_pool is not None:
+        stats["async"] = _async_pool.stats()
+    return stats
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+async def close_async_pool() -> None:
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+def get_db() -> Generator[object, None, None]:
+    """
+    Retorna conexão com banco, emprestada do pool do processo.
+    - Se PGHOST estiver definido, usa PostgreSQL (psycopg) com row_factory dict.
+    - Caso contrário, usa MySQL (PyMySQL) como fallback.
+    A conexão volta ao pool ao final da dependência ou quando o router chama `db.close()`.
+    """
+    pool = get_pool()
+    connection = pool.getconn()
     try:
         yield connection
     finally:
+        pool.putconn(connection)
+
+
+@asynccontextmanager
+async def async_db() -> AsyncIterator[Any]:
+    """
+    Conexão assíncrona emprestada do pool, para uso com `async with async_db() as db`.
+    - PostgreSQL: psycopg AsyncConnection (`async with db.cursor() as cur: await cur.execute(...)`).
+    - MySQL: mesma interface, com as chamadas do PyMySQL executadas em threads.
+    """
+    async_pool = get_async_pool()
+    if async_pool is not None:
+        connection = await async_pool.getconn()
         try:
-            connection.close()
-        except Exception:
-            pass
+            yield connection
+        finally:
+            await async_pool.putconn(connection)
+        return
 
+    pooled = await asyncio.to_thread(get_pool().getconn)
+    connection = ThreadedAsyncConnection(pooled)
+    try:
+        yield connection
+    finally:
+        await connection.close()
+
+
+async def get_async_db() -> AsyncIterator[Any]:
+    """Dependência FastAPI equivalente a `get_db`, sem bloquear o event loop."""
+    async with async_db() as connection:
+        yield connection
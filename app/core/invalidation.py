@@ -0,0 +1,22 @@
+from typing import Any, Callable, Dict, List
+
+
+# Listeners por tabela: caches em memória que dependem de dados do painel se registram aqui
+# e são avisados quando um router grava nessas tabelas.
+_listeners: Dict[str, List[Callable[..., None]]] = {}
+
+
+def on_change(tables: List[str], listener: Callable[..., None]) -> None:
+    """Registra `listener(table, **info)` para ser chamado quando alguma das tabelas mudar."""
+    for table in tables:
+        _listeners.setdefault(table, []).append(listener)
+
+
+def notify_change(table: str, **info: Any) -> None:
+    """Avisa os caches registrados que `table` foi alterada (chamar após o write com sucesso)."""
+    for listener in _listeners.get(table, []):
+        try:
+            listener(table, **info)
+        except Exception as e:
+            # Invalidação nunca deve quebrar a rota que gravou
+            print(f"[invalidation] listener falhou para {table}: {e}")
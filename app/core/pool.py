@@ -0,0 +1,501 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera configurado."""
+
+
+class PooledConnection:
+    """
+    Proxy fino sobre a conexão real do driver.
+    - Delega todos os atributos (cursor, commit, rollback...) para a conexão original.
+    - `close()` devolve a conexão ao pool em vez de encerrar o socket, mantendo
+      compatível o padrão `db = next(get_db()) ... db.close()` usado nos routers.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw: Any) -> None:
+        self._pool = pool
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self._checked_out = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._pool.putconn(self)
+
+
+class ConnectionPool:
+    """
+    Pool de conexões síncrono e thread-safe, independente do driver (psycopg ou PyMySQL).
+
+    - min_size/max_size: conexões mantidas abertas / teto de conexões simultâneas
+    - max_idle: segundos que uma conexão ociosa pode ficar no pool antes de ser descartada
+    - max_lifetime: idade máxima (segundos) de uma conexão antes de ser reciclada
+    - check_interval: conexões ociosas há mais tempo que isso passam por health check no checkout
+    - timeout: tempo máximo de espera por uma conexão livre
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        check: Callable[[Any], bool],
+        reset: Optional[Callable[[Any], None]] = None,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 300.0,
+        max_lifetime: float = 1800.0,
+        check_interval: float = 30.0,
+        timeout: float = 10.0,
+        name: str = "db",
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size deve ser >= 1")
+        self.name = name
+        self._factory = factory
+        self._check = check
+        self._reset = reset
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.timeout = timeout
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._size = 0  # conexões abertas (ociosas + em uso)
+        self._waiting = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+        self._last_prune = time.monotonic()
+        self._stats: Dict[str, int] = {
+            "connections_created": 0,
+            "connections_recycled": 0,
+            "connections_failed_check": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+        }
+
+    # ===== API pública =====
+    def getconn(self, timeout: Optional[float] = None) -> PooledConnection:
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            candidate: Optional[PooledConnection] = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError(f"Pool '{self.name}' encerrado")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"Pool '{self.name}' sem conexões livres (max_size={self.max_size})")
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    # LIFO: reaproveita a conexão mais "quente"
+                    candidate = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                return self._checkout(self._open())
+
+            assert candidate is not None
+            if self._is_usable(candidate):
+                return self._checkout(candidate)
+            # Conexão expirada/quebrada: descarta e tenta novamente
+            self._discard(candidate)
+
+    def putconn(self, conn: PooledConnection) -> None:
+        with self._cond:
+            if not conn._checked_out:
+                return  # devolução repetida (ex.: close() + finally do generator)
+            conn._checked_out = False
+        now = time.monotonic()
+        keep = not self._closed and (now - conn.created_at) < self.max_lifetime
+        if keep and self._reset is not None:
+            try:
+                self._reset(conn.raw)
+            except Exception:
+                keep = False
+        if not keep:
+            self._discard(conn)
+            return
+        conn.last_used_at = now
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+            should_prune = (now - self._last_prune) >= self.check_interval
+            if should_prune:
+                self._last_prune = now
+        if should_prune:
+            self.prune()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "name": self.name,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "waiting": self._waiting,
+                **self._stats,
+            }
+
+    def prune(self) -> None:
+        """Fecha conexões ociosas além de `max_idle` mantendo ao menos `min_size` abertas."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            keep: Deque[PooledConnection] = deque()
+            for conn in self._idle:
+                too_old = (now - conn.created_at) >= self.max_lifetime
+                too_idle = (now - conn.last_used_at) >= self.max_idle
+                if (too_old or too_idle) and (self._size - len(expired)) > self.min_size:
+                    expired.append(conn)
+                else:
+                    keep.append(conn)
+            self._idle = keep
+        for conn in expired:
+            self._discard(conn)
+
+    def warmup(self) -> None:
+        """Abre conexões até atingir `min_size` (chamado no startup da aplicação)."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            conn.last_used_at = time.monotonic()
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    # ===== Helpers internos =====
+    def _open(self) -> PooledConnection:
+        try:
+            raw = self._factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return PooledConnection(self, raw)
+
+    def _checkout(self, conn: PooledConnection) -> PooledConnection:
+        with self._cond:
+            conn._checked_out = True
+            self._stats["checkouts"] += 1
+        return conn
+
+    def _is_usable(self, conn: PooledConnection) -> bool:
+        now = time.monotonic()
+        if (now - conn.created_at) >= self.max_lifetime or (now - conn.last_used_at) >= self.max_idle:
+            return False
+        if (now - conn.last_used_at) < self.check_interval:
+            return True
+        try:
+            ok = self._check(conn.raw)
+        except Exception:
+            ok = False
+        if not ok:
+            with self._cond:
+                self._stats["connections_failed_check"] += 1
+        return ok
+
+    def _discard(self, conn: PooledConnection) -> None:
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["connections_recycled"] += 1
+            self._cond.notify()
+
+
+class AsyncPooledConnection:
+    """Equivalente assíncrono de `PooledConnection` (ex.: psycopg.AsyncConnection)."""
+
+    def __init__(self, pool: "AsyncConnectionPool", raw: Any) -> None:
+        self._pool = pool
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self._checked_out = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+    async def __aenter__(self) -> "AsyncPooledConnection":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._pool.putconn(self)
+
+
+class AsyncConnectionPool:
+    """
+    Pool de conexões assíncrono para drivers com API nativa asyncio (psycopg AsyncConnection).
+    Mesmos parâmetros e estatísticas de `ConnectionPool`, mas sem bloquear o event loop.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Awaitable[Any]],
+        *,
+        check: Callable[[Any], Awaitable[bool]],
+        reset: Optional[Callable[[Any], Awaitable[None]]] = None,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 300.0,
+        max_lifetime: float = 1800.0,
+        check_interval: float = 30.0,
+        timeout: float = 10.0,
+        name: str = "db-async",
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("max_size deve ser >= 1")
+        self.name = name
+        self._factory = factory
+        self._check = check
+        self._reset = reset
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.timeout = timeout
+
+        self._idle: Deque[AsyncPooledConnection] = deque()
+        self._size = 0
+        self._waiting = 0
+        self._cond = asyncio.Condition()
+        self._closed = False
+        self._stats: Dict[str, int] = {
+            "connections_created": 0,
+            "connections_recycled": 0,
+            "connections_failed_check": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+        }
+
+    # ===== API pública =====
+    async def getconn(self, timeout: Optional[float] = None) -> AsyncPooledConnection:
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            candidate: Optional[AsyncPooledConnection] = None
+            async with self._cond:
+                if self._closed:
+                    raise RuntimeError(f"Pool '{self.name}' encerrado")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"Pool '{self.name}' sem conexões livres (max_size={self.max_size})")
+                    self._waiting += 1
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if candidate is None:
+                return self._checkout(await self._open())
+            if await self._is_usable(candidate):
+                return self._checkout(candidate)
+            await self._discard(candidate)
+
+    async def putconn(self, conn: AsyncPooledConnection) -> None:
+        if not conn._checked_out:
+            return
+        conn._checked_out = False
+        now = time.monotonic()
+        keep = not self._closed and (now - conn.created_at) < self.max_lifetime
+        if keep and self._reset is not None:
+            try:
+                await self._reset(conn.raw)
+            except Exception:
+                keep = False
+        if not keep:
+            await self._discard(conn)
+            return
+        conn.last_used_at = now
+        async with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        idle = len(self._idle)
+        return {
+            "name": self.name,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": idle,
+            "in_use": self._size - idle,
+            "waiting": self._waiting,
+            **self._stats,
+        }
+
+    async def warmup(self) -> None:
+        while not self._closed and self._size < self.min_size:
+            self._size += 1
+            conn = await self._open()
+            async with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    async def close(self) -> None:
+        async with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            await self._discard(conn)
+
+    # ===== Helpers internos =====
+    async def _open(self) -> AsyncPooledConnection:
+        try:
+            raw = await self._factory()
+        except Exception:
+            self._size -= 1
+            async with self._cond:
+                self._cond.notify()
+            raise
+        self._stats["connections_created"] += 1
+        return AsyncPooledConnection(self, raw)
+
+    def _checkout(self, conn: AsyncPooledConnection) -> AsyncPooledConnection:
+        conn._checked_out = True
+        self._stats["checkouts"] += 1
+        return conn
+
+    async def _is_usable(self, conn: AsyncPooledConnection) -> bool:
+        now = time.monotonic()
+        if (now - conn.created_at) >= self.max_lifetime or (now - conn.last_used_at) >= self.max_idle:
+            return False
+        if (now - conn.last_used_at) < self.check_interval:
+            return True
+        try:
+            ok = await self._check(conn.raw)
+        except Exception:
+            ok = False
+        if not ok:
+            self._stats["connections_failed_check"] += 1
+        return ok
+
+    async def _discard(self, conn: AsyncPooledConnection) -> None:
+        try:
+            await conn.raw.close()
+        except Exception:
+            pass
+        self._size -= 1
+        self._stats["connections_recycled"] += 1
+        async with self._cond:
+            self._cond.notify()
+
+
+class _ThreadedAsyncCursor:
+    """Cursor síncrono exposto com a mesma interface do AsyncCursor do psycopg."""
+
+    def __init__(self, cursor: Any) -> None:
+        self._cursor = cursor
+
+    async def __aenter__(self) -> "_ThreadedAsyncCursor":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self._cursor.close()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self) -> Any:
+        return self._cursor.lastrowid
+
+    async def execute(self, query: str, params: Any = None) -> "_ThreadedAsyncCursor":
+        await asyncio.to_thread(self._cursor.execute, query, params)
+        return self
+
+    async def executemany(self, query: str, params_seq: Any) -> "_ThreadedAsyncCursor":
+        await asyncio.to_thread(self._cursor.executemany, query, params_seq)
+        return self
+
+    async def fetchone(self) -> Any:
+        return await asyncio.to_thread(self._cursor.fetchone)
+
+    async def fetchall(self) -> Any:
+        return await asyncio.to_thread(self._cursor.fetchall)
+
+
+class ThreadedAsyncConnection:
+    """
+    Fallback assíncrono para drivers sem suporte asyncio (PyMySQL): cada operação de I/O
+    roda em thread do pool padrão, liberando o event loop. A conexão vem do pool síncrono.
+    """
+
+    def __init__(self, conn: PooledConnection) -> None:
+        self.raw = conn
+
+    async def __aenter__(self) -> "ThreadedAsyncConnection":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    def cursor(self) -> _ThreadedAsyncCursor:
+        return _ThreadedAsyncCursor(self.raw.cursor())
+
+    async def commit(self) -> None:
+        await asyncio.to_thread(self.raw.commit)
+
+    async def rollback(self) -> None:
+        await asyncio.to_thread(self.raw.rollback)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self.raw.close)
@@ -44,6 +44,43 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
         "message": "Desculpe, ocorreu um erro. Por favor, tente novamente."
     })
 
+# Recursos de processo: pool de conexões, clientes OpenAI e workers em background.
+# No shutdown, os workers gravam o que está pendente antes de o pool ser encerrado.
+from .core.db import get_pool, get_async_pool, close_pool, close_async_pool
+from .services.openai_service import OpenAIService, close_openai_clients
+from .services.summary_worker import summary_worker
+from .services.chat_writer import chat_writer
+
+
+@app.on_event("startup")
+async def _startup_resources() -> None:
+    try:
+        async_pool = get_async_pool()
+        if async_pool is not None:
+            await async_pool.warmup()
+        else:
+            get_pool().warmup()
+    except Exception as e:
+        print(f"[WARN] Pool de conexões não pré-aquecido: {e}")
+
+    # Clientes OpenAI/Azure: criados uma vez e compartilhados entre requisições
+    try:
+        OpenAIService().warmup()
+    except Exception as e:
+        print(f"[WARN] Cliente OpenAI não inicializado: {e}")
+
+    await chat_writer.start()
+    await summary_worker.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown_resources() -> None:
+    await chat_writer.stop()
+    await summary_worker.stop()
+    await close_openai_clients()
+    await close_async_pool()
+    close_pool()
+
 # Montagem dos routers
 # Essenciais (não engolir erros)
 from .routers import exchange_rate, feedback
@@ -72,13 +109,14 @@ _try_include("app.routers.panel.configuracoes")
 _try_include("app.routers.panel.convenios")
 # _try_include("app.routers.panel.excecoes")  # Removido - integrado com Google Calendar
 _try_include("app.routers.panel.faq")
-# _try_include("app.routers.panel.horarios")  # Removido - integrado com Google Calendar
+_try_include("app.routers.panel.horarios")
 _try_include("app.routers.panel.pagamentos")
 _try_include("app.routers.panel.parceiros")
 _try_include("app.routers.panel.profissionais")
 _try_include("app.routers.panel.servicos")
 _try_include("app.routers.panel.agendamentos")
 _try_include("app.routers.panel.agenda")
+_try_include("app.routers.panel.sistema")
 
 # Agendamento
 _try_include("app.routers.agendamento")
@@ -6,7 +6,7 @@ from psycopg import Connection
 from datetime import datetime, date
 import logging
 
-from ..core.db import get_db
+from ..core.db import async_db
 router = APIRouter(prefix="/admin", tags=["admin-clientes"])
 
 @router.get("/clientes")
@@ -16,10 +16,8 @@ async def listar_clientes(
 ):
     """Lista todos os clientes com filtros opcionais"""
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Construir query com filtros
                 where_conditions = []
                 params = []
@@ -35,7 +33,7 @@ async def listar_clientes(
                 
                 where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
                 
-                cur.execute(f"""
+                await cur.execute(f"""
                     SELECT 
                         id, nome, email, telefone, data_nascimento,
                         endereco, observacoes, ativo, created_at
@@ -44,7 +42,7 @@ async def listar_clientes(
                     ORDER BY nome
                 """, params)
                 
-                clientes_raw = cur.fetchall()
+                clientes_raw = await cur.fetchall()
                 clientes = []
                 
                 for c in clientes_raw:
@@ -66,11 +64,6 @@ async def listar_clientes(
                     "total": len(clientes)
                 }))
                 
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
                 
     except Exception as e:
         logging.error(f"Erro ao listar clientes: {str(e)}")
@@ -85,12 +78,10 @@ async def obter_cliente(
 ):
     """Obtém detalhes de um cliente específico"""
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Buscar dados do cliente
-                cur.execute("""
+                await cur.execute("""
                     SELECT 
                         id, nome, email, telefone, data_nascimento,
                         endereco, observacoes, ativo, created_at, updated_at
@@ -98,7 +89,7 @@ async def obter_cliente(
                     WHERE id = %s
                 """, (cliente_id,))
                 
-                cliente_raw = cur.fetchone()
+                cliente_raw = await cur.fetchone()
                 
                 if not cliente_raw:
                     return JSONResponse(
@@ -107,7 +98,7 @@ async def obter_cliente(
                     )
                 
                 # Buscar histórico de agendamentos
-                cur.execute("""
+                await cur.execute("""
                     SELECT 
                         a.id, a.data_consulta, a.hora_inicio, a.hora_fim,
                         a.tipo_atendimento, a.status, a.valor,
@@ -121,7 +112,7 @@ async def obter_cliente(
                     LIMIT 20
                 """, (cliente_id,))
                 
-                agendamentos_raw = cur.fetchall()
+                agendamentos_raw = await cur.fetchall()
                 
                 # Formatear dados
                 cliente = {
@@ -161,11 +152,6 @@ async def obter_cliente(
                     "total_agendamentos": len(agendamentos)
                 }))
                 
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
                 
     except Exception as e:
         logging.error(f"Erro ao obter cliente {cliente_id}: {str(e)}")
@@ -199,13 +185,11 @@ async def criar_cliente(
                 status_code=400
             )
         
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Verificar se email já existe
-                cur.execute("SELECT id FROM clientes WHERE email = %s", (email,))
-                if cur.fetchone():
+                await cur.execute("SELECT id FROM clientes WHERE email = %s", (email,))
+                if await cur.fetchone():
                     return JSONResponse(
                         content={"success": False, "message": "Email já cadastrado"},
                         status_code=400
@@ -223,7 +207,7 @@ async def criar_cliente(
                         )
                 
                 # Inserir cliente
-                cur.execute("""
+                await cur.execute("""
                     INSERT INTO clientes (nome, email, telefone, data_nascimento, endereco, observacoes)
                     VALUES (%s, %s, %s, %s, %s, %s)
                     RETURNING id
@@ -236,8 +220,8 @@ async def criar_cliente(
                     data.get("observacoes")
                 ))
                 
-                cliente_id = cur.fetchone()[0]
-                db.commit()
+                cliente_id = (await cur.fetchone())[0]
+                await db.commit()
                 
                 return JSONResponse(content={
                     "success": True,
@@ -245,11 +229,6 @@ async def criar_cliente(
                     "cliente_id": cliente_id
                 })
                 
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
                 
     except Exception as e:
         logging.error(f"Erro ao criar cliente: {str(e)}")
@@ -267,13 +246,11 @@ async def atualizar_cliente(
     try:
         data = await request.json()
         
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Verificar se cliente existe
-                cur.execute("SELECT id FROM clientes WHERE id = %s", (cliente_id,))
-                if not cur.fetchone():
+                await cur.execute("SELECT id FROM clientes WHERE id = %s", (cliente_id,))
+                if not await cur.fetchone():
                     return JSONResponse(
                         content={"success": False, "message": "Cliente não encontrado"},
                         status_code=404
@@ -281,11 +258,11 @@ async def atualizar_cliente(
                 
                 # Verificar email único (se alterado)
                 if "email" in data:
-                    cur.execute(
+                    await cur.execute(
                         "SELECT id FROM clientes WHERE email = %s AND id != %s",
                         (data["email"], cliente_id)
                     )
-                    if cur.fetchone():
+                    if await cur.fetchone():
                         return JSONResponse(
                             content={"success": False, "message": "Email já em uso por outro cliente"},
                             status_code=400
@@ -345,19 +322,14 @@ async def atualizar_cliente(
                 
                 # Executar atualização
                 sql = f"UPDATE clientes SET {', '.join(campos)} WHERE id = %s"
-                cur.execute(sql, valores)
-                db.commit()
+                await cur.execute(sql, valores)
+                await db.commit()
                 
                 return JSONResponse(content={
                     "success": True,
                     "message": "Cliente atualizado com sucesso"
                 })
                 
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
                 
     except Exception as e:
         logging.error(f"Erro ao atualizar cliente {cliente_id}: {str(e)}")
@@ -372,13 +344,11 @@ async def excluir_cliente(
 ):
     """Desativa um cliente (soft delete)"""
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Verificar se cliente existe
-                cur.execute("SELECT nome FROM clientes WHERE id = %s", (cliente_id,))
-                cliente = cur.fetchone()
+                await cur.execute("SELECT nome FROM clientes WHERE id = %s", (cliente_id,))
+                cliente = await cur.fetchone()
                 
                 if not cliente:
                     return JSONResponse(
@@ -387,13 +357,13 @@ async def excluir_cliente(
                     )
                 
                 # Verificar se há agendamentos ativos
-                cur.execute("""
+                await cur.execute("""
                     SELECT COUNT(*) 
                     FROM agendamentos 
                     WHERE cliente_id = %s AND status IN (0, 1) AND data_consulta >= CURRENT_DATE
                 """, (cliente_id,))
                 
-                agendamentos_ativos = cur.fetchone()[0]
+                agendamentos_ativos = (await cur.fetchone())[0]
                 
                 if agendamentos_ativos > 0:
                     return JSONResponse(
@@ -405,22 +375,17 @@ async def excluir_cliente(
                     )
                 
                 # Desativar cliente
-                cur.execute(
+                await cur.execute(
                     "UPDATE clientes SET ativo = 0, updated_at = %s WHERE id = %s",
                     (datetime.now(), cliente_id)
                 )
-                db.commit()
+                await db.commit()
                 
                 return JSONResponse(content={
                     "success": True,
                     "message": f"Cliente {cliente[0]} desativado com sucesso"
                 })
                 
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
                 
     except Exception as e:
         logging.error(f"Erro ao excluir cliente {cliente_id}: {str(e)}")
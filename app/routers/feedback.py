@@ -1,14 +1,34 @@
 
+from typing import Any, AsyncIterator
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from ..core.db import get_db
 from ..schemas.feedback import FeedbackIn, RewriteIn, ChatIn
+from ..services.chat_writer import chat_writer
+from ..services.llm_admission import llm_admission
 from ..services.openai_service import OpenAIService
 
 router = APIRouter()
 
+
+async def _db_after_flush() -> AsyncIterator[Any]:
+    """
+    Conexão da requisição (`get_db`) emprestada só depois do `chat_writer.flush()`: no modo
+    write-behind a última linha de `conversas` já está gravada, e o flush não pega uma segunda
+    conexão do pool enquanto a requisição segura a primeira.
+    """
+    await chat_writer.flush()
+    connections = get_db()
+    db = await run_in_threadpool(next, connections)
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(connections.close)
+
 @router.post("/feedback")
-async def feedback(payload: FeedbackIn, db = Depends(get_db)):
+async def feedback(payload: FeedbackIn, db = Depends(_db_after_flush)):
     try:
         with db.cursor() as cur:
             # Buscar conversa mais recente desta sessão
@@ -33,7 +53,7 @@ async def feedback(payload: FeedbackIn, db = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Erro ao registrar feedback")
 
 @router.post("/rewrite")
-async def rewrite(payload: RewriteIn, db = Depends(get_db)):
+async def rewrite(payload: RewriteIn, db = Depends(_db_after_flush)):
     try:
         with db.cursor() as cur:
             cur.execute(
@@ -66,7 +86,8 @@ async def chat(payload: ChatIn):
         ai = OpenAIService()
         if ai.is_configured():
             try:
-                result = ai.generate_reply(user_message, payload.sessionId, payload.isFirst)
+                async with llm_admission.slot(payload.sessionId):
+                    result = await ai.generate_reply_async(user_message, payload.sessionId, payload.isFirst)
                 return JSONResponse(content={
                     "success": True,
                     "message": result["message"],
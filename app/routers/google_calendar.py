@@ -14,7 +14,7 @@ import pytz
 
 from ..core.db import get_db
 from .auth import verify_admin_user, get_current_user
-from ..services.google_calendar_service import google_calendar_service
+from ..services.google_calendar_service import google_calendar_registry, google_calendar_service
 
 router = APIRouter(prefix="/google-calendar", tags=["google-calendar"])
 
@@ -91,12 +91,17 @@ async def oauth_callback(
         redirect_uri = "http://127.0.0.1:8000/api/google-calendar/callback"
         token_data = google_calendar_service.exchange_code_for_token(code, redirect_uri)
         
+        # Cliente próprio do profissional (fica no registry para as próximas sincronizações)
+        calendar = google_calendar_registry.register(profissional_id, token_data)
+        
         # Obter informações dos calendários
-        calendars = google_calendar_service.get_calendar_list()
+        calendars = calendar.get_calendar_list()
         primary_calendar = next((cal for cal in calendars if cal.get('primary')), None)
         
         if not primary_calendar:
+            google_calendar_registry.invalidate(profissional_id)
             raise HTTPException(status_code=400, detail="Nenhum calendário primário encontrado")
+        calendar.calendar_id = primary_calendar['id']
         
         # Salvar credenciais no banco
         db_gen = get_db()
@@ -263,30 +268,13 @@ async def sync_calendar(
         db = next(db_gen)
         try:
             with db.cursor() as cur:
-                # Buscar credenciais do profissional
-                cur.execute("""
-                    SELECT access_token, refresh_token, token_uri, client_id, 
-                           client_secret, calendar_id
-                    FROM profissional_google_credentials
-                    WHERE profissional_id = %s AND ativo = 1
-                """, (profissional_id,))
+                # Cliente do profissional (credenciais em cache, token renovado antes de vencer)
+                calendar = google_calendar_registry.get(profissional_id, db)
                 
-                credentials = cur.fetchone()
-                
-                if not credentials:
+                if calendar is None:
                     raise HTTPException(status_code=404, detail="Credenciais não encontradas")
                 
-                # Carregar credenciais no serviço
-                token_data = {
-                    'access_token': credentials[0],
-                    'refresh_token': credentials[1],
-                    'token_uri': credentials[2],
-                    'client_id': credentials[3],
-                    'client_secret': credentials[4]
-                }
-                
-                google_calendar_service.load_credentials_from_token(token_data)
-                calendar_id = credentials[5]
+                calendar_id = calendar.calendar_id
                 
                 # Buscar agendamentos pendentes de sincronização
                 cur.execute("""
@@ -323,7 +311,7 @@ async def sync_calendar(
                         
                         attendees = [cliente_email] if cliente_email else []
                         
-                        event_result = google_calendar_service.create_event(
+                        event_result = calendar.create_event(
                             calendar_id=calendar_id,
                             title=title,
                             start_datetime=data_inicio,
@@ -434,6 +422,7 @@ async def disconnect_calendar(
                 """, (profissional_id,))
                 
                 db.commit()
+                google_calendar_registry.invalidate(profissional_id)
                 
                 return JSONResponse(content={
                     "success": True,
@@ -1,14 +1,25 @@
 import os
 import json
-from typing import Any, Dict, List, Optional, Tuple
-import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, Header, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from ..core.db import get_db, is_postgres_connection
+from ..core.db import async_db, is_postgres_connection
 from ..schemas.feedback import ChatIn
+from ..services.admin_snapshot import admin_snapshot_cache
+from ..services.chat_writer import chat_writer
+from ..services.conversation_cache import conversation_cache
+from ..services.conversation_facts import extract_facts, facts_bullets, facts_from_history, parse_facts, save_facts
+from ..services.faq_index import faq_index
+from ..services.llm_admission import PRIORITY_BOOKING, PRIORITY_INTERACTIVE, llm_admission
 from ..services.openai_service import OpenAIService
+from ..services.reply_guard import ReplyGuard, StreamGuard, default_guard, guard_from_config
+from ..services.response_cache import context_digest, response_cache
+from ..services.single_flight import single_flight
+from ..services.summary_worker import summary_worker
+from ..services.text_normalize import normalize_text
+from ..services.token_budget import count_tokens, fit_prompt
 
 
 router = APIRouter()
@@ -25,47 +36,39 @@ def _require_auth_header(authorization: Optional[str] = Header(None)) -> None:
         raise HTTPException(status_code=401, detail="Token inválido")
 
 
-def _ensure_conversation(db, session_id: str) -> int:
-    with db.cursor() as cur:
-        cur.execute("SELECT id FROM conversations WHERE session_id = %s", (session_id,))
-        row = cur.fetchone()
+async def _ensure_conversation(db, session_id: str) -> int:
+    async with db.cursor() as cur:
+        await cur.execute("SELECT id FROM conversations WHERE session_id = %s", (session_id,))
+        row = await cur.fetchone()
         if row:
             return row["id"] if isinstance(row, dict) else row[0]
-        cur.execute("INSERT INTO conversations (session_id) VALUES (%s) RETURNING id", (session_id,))
-        new_id_row = cur.fetchone()
+        await cur.execute("INSERT INTO conversations (session_id) VALUES (%s) RETURNING id", (session_id,))
+        new_id_row = await cur.fetchone()
         return new_id_row["id"] if isinstance(new_id_row, dict) else new_id_row[0]
 
 
-def _get_conversation_summary(db, conversation_id: int) -> Optional[str]:
-    with db.cursor() as cur:
-        cur.execute("SELECT summary FROM conversations WHERE id = %s", (conversation_id,))
-        row = cur.fetchone()
+async def _get_conversation_state(db, conversation_id: int) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Resumo e fatos persistidos da conversa (fatos None se ainda não gravados)."""
+    async with db.cursor() as cur:
+        try:
+            await cur.execute("SELECT summary, facts FROM conversations WHERE id = %s", (conversation_id,))
+        except Exception:
+            # Coluna `facts` ainda não criada (scripts/create_chat_tables.py)
+            await cur.execute("SELECT summary, NULL AS facts FROM conversations WHERE id = %s", (conversation_id,))
+        row = await cur.fetchone()
         if not row:
-            return None
-        return row["summary"] if isinstance(row, dict) else row[0]
-
-
-def _insert_message(db, conversation_id: int, role: str, content: str, tokens: Optional[Dict[str, int]] = None) -> None:
-    with db.cursor() as cur:
-        if tokens:
-            cur.execute(
-                "INSERT INTO conversation_messages (conversation_id, role, content, tokens_prompt, tokens_completion) VALUES (%s, %s, %s, %s, %s)",
-                (conversation_id, role, content, tokens.get("prompt_tokens"), tokens.get("completion_tokens")),
-            )
-        else:
-            cur.execute(
-                "INSERT INTO conversation_messages (conversation_id, role, content) VALUES (%s, %s, %s)",
-                (conversation_id, role, content),
-            )
+            return None, None
+        summary = row["summary"] if isinstance(row, dict) else row[0]
+        return summary, parse_facts(row["facts"] if isinstance(row, dict) else row[1])
 
 
-def _get_last_messages(db, conversation_id: int, limit: int) -> List[Dict[str, str]]:
-    with db.cursor() as cur:
-        cur.execute(
+async def _get_last_messages(db, conversation_id: int, limit: int) -> List[Dict[str, str]]:
+    async with db.cursor() as cur:
+        await cur.execute(
             "SELECT role, content FROM conversation_messages WHERE conversation_id = %s ORDER BY id DESC LIMIT %s",
             (conversation_id, limit),
         )
-        rows = cur.fetchall() or []
+        rows = (await cur.fetchall()) or []
         items = [
             {"role": (r["role"] if isinstance(r, dict) else r[0]), "content": (r["content"] if isinstance(r, dict) else r[1])}
             for r in rows
@@ -74,116 +77,12 @@ def _get_last_messages(db, conversation_id: int, limit: int) -> List[Dict[str, s
         return items
 
 
-def _get_or_build_admin_snapshot(db) -> Dict[str, Any]:
-    with db.cursor() as cur:
-        cur.execute("SELECT data FROM admin_snapshots ORDER BY created_at DESC LIMIT 1")
-        row = cur.fetchone()
-        if row:
-            raw = row["data"] if isinstance(row, dict) else row[0]
-            try:
-                return raw if isinstance(raw, dict) else json.loads(raw)
-            except Exception:
-                return {}
-
-    # Construir snapshot básico a partir das tabelas do painel
-    snapshot: Dict[str, Any] = {}
-    try:
-        with db.cursor() as cur:
-            # Configurações (mapa chave->valor)
-            cur.execute("SELECT chave, valor FROM configuracoes")
-            cfg_rows = cur.fetchall() or []
-            configuracoes = { (r["chave"] if isinstance(r, dict) else r[0]): (r["valor"] if isinstance(r, dict) else r[1]) for r in cfg_rows }
-            snapshot["configuracoes"] = configuracoes
-
-            # Serviços ativos (limite 15)
-            cur.execute("SELECT nome, valor, categoria FROM servicos_clinica WHERE ativo = 1 LIMIT 15")
-            servicos_rows = cur.fetchall() or []
-            servicos = []
-            for r in servicos_rows:
-                nome = r["nome"] if isinstance(r, dict) else r[0]
-                valor = r["valor"] if isinstance(r, dict) else r[1]
-                categoria = r["categoria"] if isinstance(r, dict) else r[2]
-                servicos.append({"nome": nome, "valor": float(valor) if valor is not None else None, "categoria": categoria})
-            snapshot["servicos_ativos"] = servicos
-
-            # Profissionais ativos (limite 15)
-            cur.execute("SELECT nome, especialidade FROM profissionais WHERE ativo = 1 LIMIT 15")
-            prof_rows = cur.fetchall() or []
-            profissionais = []
-            for r in prof_rows:
-                nome = r["nome"] if isinstance(r, dict) else r[0]
-                esp = r["especialidade"] if isinstance(r, dict) else r[1]
-                profissionais.append({"nome": nome, "especialidade": esp})
-            snapshot["profissionais_ativos"] = profissionais
-
-        # Persistir snapshot
-        with db.cursor() as cur2:
-            cur2.execute("INSERT INTO admin_snapshots (data) VALUES (%s)", (json.dumps(snapshot, ensure_ascii=False),))
-    except Exception:
-        # Falha silenciosa para não quebrar o chat
-        pass
-
-    return snapshot
-
-
-def _maybe_summarize(db, conversation_id: int, ai: OpenAIService, tokens_estimate: int) -> None:
+def _maybe_summarize(conversation_id: int, tokens_estimate: int) -> None:
+    """Ao passar do limiar, agenda a sumarização em background (não atrasa a resposta)."""
     threshold = int(os.getenv("CHAT_SUMMARY_TOKENS_THRESHOLD", "3000"))
     if tokens_estimate < threshold:
         return
-    # Carregar toda a conversa para sumarizar de forma estável
-    with db.cursor() as cur:
-        cur.execute("SELECT role, content FROM conversation_messages WHERE conversation_id = %s ORDER BY id ASC", (conversation_id,))
-        rows = cur.fetchall() or []
-        text = []
-        for r in rows:
-            role = r["role"] if isinstance(r, dict) else r[0]
-            content = r["content"] if isinstance(r, dict) else r[1]
-            text.append(f"{role.upper()}: {content}")
-        merged = "\n".join(text)
-        # Limitar entrada da sumarização para evitar excesso
-        if len(merged) > 24000:
-            merged = merged[-24000:]
-        try:
-            summary = ai.summarize(merged, max_words=300)
-            with db.cursor() as cur2:
-                cur2.execute("UPDATE conversations SET summary = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s", (summary, conversation_id))
-        except Exception:
-            pass
-
-
-def _extract_facts_from_history(messages: List[Dict[str, str]]) -> Dict[str, Any]:
-    facts: Dict[str, Any] = {}
-    name_patterns = [
-        r"\bmeu nome é\s+([A-Za-zÀ-ÖØ-öø-ÿ]+)",
-        r"\beu sou\s+([A-Za-zÀ-ÖØ-öø-ÿ]+)",
-        r"\bchamo\-?me\s+([A-Za-zÀ-ÖØ-öø-ÿ]+)",
-    ]
-    age_patterns = [
-        r"\btenho\s+(\d{1,3})\s+anos\b",
-        r"\bminha idade é\s+(\d{1,3})\b",
-    ]
-
-    for m in messages:
-        content = m.get("content", "")
-        lower = content.lower()
-        # Nome
-        if "nome" in lower or "sou" in lower or "chamo" in lower:
-            for pat in name_patterns:
-                mt = re.search(pat, lower)
-                if mt:
-                    facts["nome_usuario"] = mt.group(1).strip().title()
-                    break
-        # Idade
-        if "anos" in lower or "idade" in lower:
-            for pat in age_patterns:
-                mt = re.search(pat, lower)
-                if mt:
-                    try:
-                        facts["idade_usuario"] = int(mt.group(1))
-                    except Exception:
-                        pass
-                    break
-    return facts
+    summary_worker.schedule(conversation_id)
 
 
 def _maybe_answer_locally(extracted: Dict[str, Any], user_message: str) -> Optional[str]:
@@ -199,178 +98,420 @@ def _maybe_answer_locally(extracted: Dict[str, Any], user_message: str) -> Optio
     return None
 
 
-def _sanitize_reply(text: str) -> str:
+_BOOKING_WORDS = ("agend", "marcar", "remarcar", "desmarcar", "horario", "vaga", "encaixe")
+
+
+def _admission_priority(extracted: Dict[str, Any], user_message: str) -> int:
+    """Conversa com agendamento em andamento passa na frente na fila de chamadas ao modelo."""
+    if any(extracted.get(k) for k in ("profissional", "servico", "turno_preferido")):
+        return PRIORITY_BOOKING
+    norm = normalize_text(user_message)
+    if any(w in norm for w in _BOOKING_WORDS):
+        return PRIORITY_BOOKING
+    return PRIORITY_INTERACTIVE
+
+
+def _sanitize_reply(text: str, guard: Optional[ReplyGuard] = None) -> str:
     """
     Remove/evita vazamentos de dados internos (painel/DB) e mensagens de ausência de cadastros.
     Se detectar termos proibidos, substitui por uma resposta neutra de agendamento.
+    Os marcadores (padrão + `chat_marcadores_bloqueados` em configuracoes) são verificados
+    por um autômato de Aho-Corasick, em uma passada pela resposta.
     """
-    low = (text or "").lower()
-    banned_markers = [
-        "painel", "banco de dados", "banco de dados", "banco", "no sistema",
-        "no banco", "cadastrado", "cadastrados", "profissionais ativos",
-        "serviços ativos", "servicos ativos", "atualmente não há", "no momento não há",
-        "não há serviços", "não há profissionais", "na base", "no bd",
-    ]
-    if any(m in low for m in banned_markers):
-        return (
-            "Posso te ajudar com o agendamento. "
-            "Você prefere um dia/turno específico? Também posso indicar especialidades conforme sua necessidade."
-        )
-    return text
+    return (guard or default_guard).sanitize(text)
+
+
+_BASE_SYSTEM = (
+    "Você é um assistente de agendamentos de clínica. Seja objetivo, claro e útil. "
+    "Responda sempre em português do Brasil."
+)
+
+_SYSTEM_RULES = (
+    "Você é um assistente de agendamentos de clínica. Siga as regras: "
+    "1) Seja objetivo, natural e proativo, guiando o usuário a um agendamento eficiente. "
+    "2) Faça perguntas para remover ambiguidade (dia, turno, profissional, tipo de serviço). "
+    "3) Use o histórico fornecido (resumo + últimas mensagens) apenas como CONTEXTO. "
+    "4) É ESTRITAMENTE PROIBIDO mencionar ou insinuar informações internas, banco de dados, painel administrativo, cadastros ou ausência/presença de itens. "
+    "5) Nunca diga que não há serviços/profissionais. Em vez disso, conduza o usuário perguntando preferências e prossiga com alternativas. "
+    "6) As informações pessoais fornecidas pelo usuário (ex.: nome, idade) podem e DEVEM ser usadas de forma contextual e respeitosa. "
+    "7) Se houver fatos conhecidos (ex.: idade_usuario=21) e o usuário perguntar sobre isso, responda diretamente e retome o fluxo de agendamento. "
+    "8) Responda em português do Brasil."
+)
+
+
+def _mock_reply(user_message: str) -> Tuple[str, Dict[str, int]]:
+    reply = f"(mock) Você disse: {user_message}. Em breve este endpoint falará com a IA."
+    tokens = {"prompt_tokens": max(1, count_tokens(user_message)), "completion_tokens": max(1, count_tokens(reply))}
+    return reply, tokens
+
+
+def _fallback_reply(extracted: Dict[str, Any]) -> str:
+    """Resposta simples usando fatos conhecidos quando a IA não responde."""
+    if extracted.get("nome_usuario") or extracted.get("idade_usuario"):
+        parts = []
+        if extracted.get("nome_usuario"):
+            parts.append(f"{extracted['nome_usuario']}")
+        if extracted.get("idade_usuario"):
+            parts.append(f"{extracted['idade_usuario']} anos")
+        who = ", ".join(parts)
+        return f"Entendi: {who}. Para seguirmos com o agendamento, você prefere manhã, tarde ou noite?"
+    return "Para seguirmos com o agendamento, você prefere manhã, tarde ou noite?"
+
+
+def _remember_reply(turn: Dict[str, Any], user_message: str, reply: str) -> None:
+    """Guarda a resposta do modelo para perguntas repetidas, exceto se citar fatos do usuário."""
+    nome = turn["extracted"].get("nome_usuario")
+    if nome and nome.lower() in reply.lower():
+        return
+    response_cache.put(user_message, turn["snapshot_version"], reply, turn["cache_context"])
 
 
-@router.post("/messages")
-async def messages(payload: ChatIn, db = Depends(get_db), _auth: None = Depends(_require_auth_header)):
-    user_message = payload.message.strip()
-    if not user_message:
-        return JSONResponse(content={"success": False, "message": "Mensagem vazia"})
+async def _prepare_turn(db, session_id: str, user_message: str) -> Dict[str, Any]:
+    """
+    Registra a mensagem do usuário e monta o contexto do modelo
+    (system + resumo + snapshot + fatos + janela de mensagens).
+    """
+    window_size = int(os.getenv("CHAT_WINDOW_SIZE", "10"))
+
+    # Lida antes de montar o prompt: uma invalidação no meio do turno descarta a resposta do cache
+    snapshot_version = admin_snapshot_cache.version
+    snapshot = await admin_snapshot_cache.get(db)
+    guard = guard_from_config(snapshot.get("configuracoes") or {})
+
+    cached = conversation_cache.get(session_id, window_size)
+    if cached is not None:
+        # Contexto quente: janela, resumo e fatos vêm da memória (write-through)
+        conversation_id = cached.conversation_id
+        await chat_writer.add_message(db, conversation_id, "user", user_message)
+        conversation_cache.append(session_id, "user", user_message)
+        last_msgs = cached.window()
+        summary = cached.summary
+        facts = cached.facts
+        facts_changed = extract_facts(user_message, facts, snapshot)
+    else:
+        conversation_id = await _ensure_conversation(db, session_id)
+
+        # Registrar mensagem do usuário
+        await chat_writer.add_message(db, conversation_id, "user", user_message)
+
+        # Carregar contexto (no modo buffered, grava o pendente antes de ler a janela)
+        await chat_writer.flush()
+        last_msgs = await _get_last_messages(db, conversation_id, window_size)
+        summary, facts = await _get_conversation_state(db, conversation_id)
+        if facts is None:
+            # Conversa anterior aos fatos persistidos: extrai uma vez da janela
+            facts = facts_from_history(last_msgs, snapshot)
+            facts_changed = bool(facts)
+        else:
+            facts_changed = extract_facts(user_message, facts, snapshot)
+        conversation_cache.put(session_id, conversation_id, summary, last_msgs, window_size, facts)
+
+    # Contexto além da pergunta atual (a janela já termina com ela), para a chave do cache de respostas
+    history = last_msgs[:-1] if last_msgs and last_msgs[-1].get("content") == user_message else last_msgs
+    cache_context = context_digest(history, summary, facts)
+
+    # Fatos só são regravados quando a mensagem nova muda algum deles
+    if facts_changed:
+        try:
+            await save_facts(db, conversation_id, facts)
+        except Exception as e:
+            print(f"[messages] falha ao gravar fatos da conversa {conversation_id}: {e}")
+
+    # FAQs do painel mais próximas da pergunta (índice em memória)
+    faq_hits = await faq_index.search(db, user_message)
+    faq_block = "\n".join(f"- P: {h['pergunta']}\n  R: {h['resposta']}" for h in faq_hits)
+
+    # Prompt dentro do orçamento de tokens; o snapshot do painel (em cache) é reduzido
+    # ao que sobrar, sem quebrar o JSON
+    messages_for_model, budget = await fit_prompt(
+        _SYSTEM_RULES,
+        last_msgs,
+        summary=summary,
+        facts=facts_bullets(facts),
+        faq=faq_block,
+        snapshot=lambda max_tokens: admin_snapshot_cache.get_json_within(db, max_tokens),
+    )
+
+    return {
+        "conversation_id": conversation_id,
+        "messages_for_model": messages_for_model,
+        "extracted": facts,
+        "context_tokens": budget["context_tokens"],
+        "snapshot_version": snapshot_version,
+        "cache_context": cache_context,
+        "faq_hits": faq_hits,
+        "guard": guard,
+    }
+
+
+async def _persist_turn(db, session_id: str, conversation_id: int, user_message: str, assistant_reply: str, tokens: Dict[str, int]) -> None:
+    # Registrar resposta do assistente
+    await chat_writer.add_message(db, conversation_id, "assistant", assistant_reply, tokens)
+    conversation_cache.append(session_id, "assistant", assistant_reply)
+
+    # Compatibilidade com tabela legado 'conversas' (para feedback/rewrite já existentes)
+    try:
+        await chat_writer.add_conversa(db, session_id, user_message, assistant_reply, tokens)
+    except Exception:
+        # Ignorar erro de compatibilidade
+        pass
+
+
+def _quick_reply(turn: Dict[str, Any], user_message: str) -> Optional[str]:
+    """Resposta sem o modelo: fatos do usuário, FAQ ou cache de perguntas repetidas."""
+    # Resposta local determinística para perguntas diretas (fatos do usuário ou FAQ)
+    local_reply = _maybe_answer_locally(turn["extracted"], user_message) or faq_index.best_answer(turn["faq_hits"])
+    if local_reply:
+        return local_reply
+    # Pergunta repetida com o mesmo snapshot do painel: responde do cache
+    return response_cache.get(user_message, turn["snapshot_version"], turn["cache_context"])
+
+
+async def _message_reply(payload: ChatIn, user_message: str) -> Dict[str, Any]:
+    """
+    Turno do chat de `/messages`; retorna o corpo da resposta. A conexão do pool é usada só
+    para montar o contexto e, depois, para gravar a resposta: não fica presa durante a fila de
+    admissão e a chamada ao modelo (com retentativas/hedging).
+    """
+    zero_tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+    try:
+        async with async_db() as db:
+            # Requer PostgreSQL para armazenar contexto ampliado (conversations, snapshots)
+            turn = await _prepare_turn(db, payload.sessionId, user_message) if is_postgres_connection(db) else None
+            quick_reply = _quick_reply(turn, user_message) if turn is not None else None
+            if quick_reply:
+                await _persist_turn(db, payload.sessionId, turn["conversation_id"], user_message, quick_reply, zero_tokens)
+                return {"success": True, "message": quick_reply, "tokens": zero_tokens}
+    except HTTPException:
+        raise
+    except Exception:
+        reply, tokens = _mock_reply(user_message)
+        return {"success": True, "message": reply, "tokens": tokens, "fallback": True}
 
-    # Requer PostgreSQL para armazenar contexto ampliado (conversations, snapshots)
-    if not is_postgres_connection(db):
+    if turn is None:
         # Fallback: responde sem contexto avançado
         try:
             ai = OpenAIService()
-            base_system = (
-                "Você é um assistente de agendamentos de clínica. Seja objetivo, claro e útil. "
-                "Responda sempre em português do Brasil."
-            )
             msgs = [
-                {"role": "system", "content": base_system},
+                {"role": "system", "content": _BASE_SYSTEM},
                 {"role": "user", "content": user_message},
             ]
-            result = ai.chat_completion(msgs)
-            return JSONResponse(content={"success": True, "message": result["message"], "tokens": result.get("tokens", {})})
+            async with llm_admission.slot(payload.sessionId):
+                result = await ai.chat_completion_async(msgs)
+            return {"success": True, "message": result["message"], "tokens": result.get("tokens", {})}
         except Exception:
-            reply = f"(mock) Você disse: {user_message}. Em breve este endpoint falará com a IA."
-            tokens = {"prompt_tokens": max(1, len(user_message)//4), "completion_tokens": max(1, len(reply)//4)}
-            return JSONResponse(content={"success": True, "message": reply, "tokens": tokens})
+            reply, tokens = _mock_reply(user_message)
+            return {"success": True, "message": reply, "tokens": tokens, "fallback": True}
 
     # Fluxo PostgreSQL: janela deslizante + sumarização + snapshot
     try:
         ai = OpenAIService()
-        conversation_id = _ensure_conversation(db, payload.sessionId)
-
-        # Registrar mensagem do usuário
-        _insert_message(db, conversation_id, "user", user_message)
-
-        # Carregar contexto
-        window_size = int(os.getenv("CHAT_WINDOW_SIZE", "10"))
-        last_msgs = _get_last_messages(db, conversation_id, window_size)
-        summary = _get_conversation_summary(db, conversation_id)
-        admin_snapshot = _get_or_build_admin_snapshot(db)
-
-        # Montar prompts (system + contexto + histórico + mensagem corrente)
-        system_rules = (
-            "Você é um assistente de agendamentos de clínica. Siga as regras: "
-            "1) Seja objetivo, natural e proativo, guiando o usuário a um agendamento eficiente. "
-            "2) Faça perguntas para remover ambiguidade (dia, turno, profissional, tipo de serviço). "
-            "3) Use o histórico fornecido (resumo + últimas mensagens) apenas como CONTEXTO. "
-            "4) É ESTRITAMENTE PROIBIDO mencionar ou insinuar informações internas, banco de dados, painel administrativo, cadastros ou ausência/presença de itens. "
-            "5) Nunca diga que não há serviços/profissionais. Em vez disso, conduza o usuário perguntando preferências e prossiga com alternativas. "
-            "6) As informações pessoais fornecidas pelo usuário (ex.: nome, idade) podem e DEVEM ser usadas de forma contextual e respeitosa. "
-            "7) Se houver fatos conhecidos (ex.: idade_usuario=21) e o usuário perguntar sobre isso, responda diretamente e retome o fluxo de agendamento. "
-            "8) Responda em português do Brasil."
-        )
+        conversation_id = turn["conversation_id"]
+        extracted = turn["extracted"]
 
-        context_parts: List[str] = []
-        if summary:
-            context_parts.append(f"Resumo da conversa até aqui:\n{summary}")
-        if admin_snapshot:
-            # Limitar tamanho do snapshot para o prompt
-            snap_str = json.dumps(admin_snapshot, ensure_ascii=False)
-            if len(snap_str) > 6000:
-                snap_str = snap_str[:6000]
-            context_parts.append(f"Dados do painel (contexto):\n{snap_str}")
-
-        # Extrair fatos simples do histórico recente
-        extracted = _extract_facts_from_history(last_msgs)
-        if extracted:
-            bullets = []
-            if "nome_usuario" in extracted:
-                bullets.append(f"- Nome do usuário: {extracted['nome_usuario']}")
-            if "idade_usuario" in extracted:
-                bullets.append(f"- Idade do usuário: {extracted['idade_usuario']}")
-            if bullets:
-                context_parts.append("Fatos conhecidos sobre o usuário:\n" + "\n".join(bullets))
-
-        context_block = "\n\n".join(context_parts) if context_parts else ""
-
-        messages_for_model: List[Dict[str, str]] = []
-        messages_for_model.append({"role": "system", "content": system_rules})
-        if context_block:
-            messages_for_model.append({"role": "system", "content": context_block})
-        messages_for_model.extend(last_msgs)
-
-        # Resposta local determinística para perguntas diretas
-        local_reply = _maybe_answer_locally(extracted, user_message)
-        if local_reply:
-            # Registrar resposta do assistente e retornar
-            _insert_message(db, conversation_id, "assistant", local_reply, {"prompt_tokens": 0, "completion_tokens": 0})
-            try:
-                with db.cursor() as cur:
-                    cur.execute(
-                        "INSERT INTO conversas (session_id, mensagem_usuario, resposta_agente, tokens_prompt, tokens_completion) VALUES (%s, %s, %s, %s, %s)",
-                        (payload.sessionId, user_message, local_reply, 0, 0),
-                    )
-            except Exception:
-                pass
-            return JSONResponse(content={
-                "success": True,
-                "message": local_reply,
-                "tokens": {"prompt_tokens": 0, "completion_tokens": 0},
-            })
-
-        # Chamar IA (com fallback se não houver configuração)
+        # Chamar IA (com fallback se não houver configuração ou se a chamada for recusada
+        # pelo controle de admissão)
         try:
-            result = ai.chat_completion(messages_for_model)
+            async with llm_admission.slot(payload.sessionId, _admission_priority(extracted, user_message)):
+                result = await ai.chat_completion_async(turn["messages_for_model"])
             assistant_reply = result["message"]
-            tokens = result.get("tokens", {"prompt_tokens": 0, "completion_tokens": 0})
+            tokens = result.get("tokens", zero_tokens)
+            from_model = True
         except Exception:
-            # Fallback: construir resposta simples usando fatos conhecidos
-            if extracted.get("nome_usuario") or extracted.get("idade_usuario"):
-                parts = []
-                if extracted.get("nome_usuario"):
-                    parts.append(f"{extracted['nome_usuario']}")
-                if extracted.get("idade_usuario"):
-                    parts.append(f"{extracted['idade_usuario']} anos")
-                who = ", ".join(parts)
-                assistant_reply = f"Entendi: {who}. Para seguirmos com o agendamento, você prefere manhã, tarde ou noite?"
-            else:
-                assistant_reply = "Para seguirmos com o agendamento, você prefere manhã, tarde ou noite?"
-            tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+            assistant_reply = _fallback_reply(extracted)
+            tokens = zero_tokens
+            from_model = False
 
         # Sanitização de saída para evitar vazamentos de dados internos
-        assistant_reply = _sanitize_reply(assistant_reply)
-
-        # Registrar resposta do assistente
-        _insert_message(db, conversation_id, "assistant", assistant_reply, tokens)
+        sanitized = _sanitize_reply(assistant_reply, turn["guard"])
+        if from_model and sanitized == assistant_reply:
+            _remember_reply(turn, user_message, assistant_reply)
+        assistant_reply = sanitized
 
-        # Compatibilidade com tabela legado 'conversas' (para feedback/rewrite já existentes)
-        try:
-            with db.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO conversas (session_id, mensagem_usuario, resposta_agente, tokens_prompt, tokens_completion) VALUES (%s, %s, %s, %s, %s)",
-                    (payload.sessionId, user_message, assistant_reply, tokens.get("prompt_tokens"), tokens.get("completion_tokens")),
-                )
-        except Exception:
-            # Ignorar erro de compatibilidade
-            pass
+        async with async_db() as db:
+            await _persist_turn(db, payload.sessionId, conversation_id, user_message, assistant_reply, tokens)
 
-        # Decidir sumarização (estratégia híbrida)
-        approx_tokens = int((sum(len(m["content"]) for m in messages_for_model) + len(assistant_reply)) / 4)
-        _maybe_summarize(db, conversation_id, ai, approx_tokens)
+        # Decidir sumarização pelo tamanho real do contexto (tokens do tokenizer do modelo)
+        _maybe_summarize(conversation_id, turn["context_tokens"] + count_tokens(assistant_reply))
 
-        return JSONResponse(content={
+        content = {
             "success": True,
             "message": assistant_reply,
             "tokens": tokens,
-        })
+        }
+        if not from_model:
+            content["fallback"] = True
+        return content
     except HTTPException:
         raise
     except Exception:
         # Fallback final: não quebrar UX
-        reply = f"(mock) Você disse: {user_message}. Em breve este endpoint falará com a IA."
-        tokens = {"prompt_tokens": max(1, len(user_message)//4), "completion_tokens": max(1, len(reply)//4)}
-        return JSONResponse(content={"success": True, "message": reply, "tokens": tokens})
+        reply, tokens = _mock_reply(user_message)
+        return {"success": True, "message": reply, "tokens": tokens, "fallback": True}
+
+
+@router.post("/messages")
+async def messages(payload: ChatIn, _auth: None = Depends(_require_auth_header)):
+    user_message = payload.message.strip()
+    if not user_message:
+        return JSONResponse(content={"success": False, "message": "Mensagem vazia"})
+
+    # Duplo clique/reenvio da mesma mensagem: um único turno (uma chamada ao modelo, sem
+    # linhas duplicadas); as repetidas recebem a mesma resposta. Respostas de fallback
+    # (modelo fora, admissão recusada) não ficam guardadas para reenvios posteriores
+    key = single_flight.key("messages", payload.sessionId, user_message)
+    content = await single_flight.do(
+        key,
+        lambda: _message_reply(payload, user_message),
+        keep=lambda c: not c.get("fallback"),
+    )
+    return JSONResponse(content=content)
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def _stream_events(payload: ChatIn, user_message: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Eventos do chat em streaming:
+    - { type: "token", content }: trecho da resposta conforme o provedor emite; no fluxo com
+      contexto, só o texto já verificado pelo guard (`StreamGuard`: o fim fica retido até o
+      próximo token, e nada sai depois de um marcador)
+    - { type: "done", message, tokens, replaced, fallback }: texto final já sanitizado;
+      `replaced=true` indica que o cliente deve substituir o texto exibido pelo `message` final;
+      `fallback=true`, que a resposta não veio completa do modelo
+    As conexões são obtidas aqui (e não via Depends) porque o corpo é enviado depois que as
+    dependências da rota já foram finalizadas: uma para montar o contexto e outra para gravar
+    a resposta; nenhuma fica presa durante o streaming do modelo.
+    """
+    ai = OpenAIService()
+    zero_tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+    try:
+        async with async_db() as db:
+            turn = await _prepare_turn(db, payload.sessionId, user_message) if is_postgres_connection(db) else None
+            quick_reply = _quick_reply(turn, user_message) if turn is not None else None
+            if quick_reply:
+                await _persist_turn(db, payload.sessionId, turn["conversation_id"], user_message, quick_reply, zero_tokens)
+
+        if turn is None:
+            # Sem contexto ampliado: apenas repassa os tokens
+            msgs = [
+                {"role": "system", "content": _BASE_SYSTEM},
+                {"role": "user", "content": user_message},
+            ]
+            parts: List[str] = []
+            tokens = zero_tokens
+            fallback = False
+            try:
+                async with llm_admission.slot(payload.sessionId):
+                    async for event in ai.chat_completion_stream(msgs):
+                        if event["type"] == "token":
+                            parts.append(event["content"])
+                            yield event
+                        else:
+                            tokens = event["tokens"]
+                reply = "".join(parts)
+            except Exception:
+                fallback = True
+                reply = "".join(parts)
+                if not reply:
+                    reply, tokens = _mock_reply(user_message)
+            yield {"type": "done", "message": reply, "tokens": tokens, "replaced": not parts, "fallback": fallback}
+            return
+
+        if quick_reply:
+            yield {"type": "done", "message": quick_reply, "tokens": zero_tokens, "replaced": True}
+            return
+
+        conversation_id = turn["conversation_id"]
+        extracted = turn["extracted"]
+        parts = []
+        stream = StreamGuard(turn["guard"])
+        tokens = zero_tokens
+        complete = False
+        try:
+            # A vaga fica ocupada durante todo o streaming
+            async with llm_admission.slot(payload.sessionId, _admission_priority(extracted, user_message)):
+                async for event in ai.chat_completion_stream(turn["messages_for_model"]):
+                    if event["type"] == "token":
+                        parts.append(event["content"])
+                        safe = stream.feed(event["content"])
+                        if safe:
+                            yield {"type": "token", "content": safe}
+                    else:
+                        tokens = event["tokens"]
+            streamed = "".join(parts)
+            complete = bool(streamed)
+        except Exception:
+            # Falha antes do primeiro token: resposta de fallback; falha no meio: mantém o parcial
+            streamed = "".join(parts) or _fallback_reply(extracted)
+
+        # Sanitização sobre o texto montado
+        assistant_reply = _sanitize_reply(streamed, turn["guard"])
+        if assistant_reply == streamed:
+            tail = stream.flush()
+            if tail:
+                yield {"type": "token", "content": tail}
+            if complete:
+                _remember_reply(turn, user_message, assistant_reply)
+        async with async_db() as db:
+            await _persist_turn(db, payload.sessionId, conversation_id, user_message, assistant_reply, tokens)
+        yield {
+            "type": "done",
+            "message": assistant_reply,
+            "tokens": tokens,
+            "replaced": assistant_reply != stream.emitted,
+            "fallback": not complete,
+        }
+
+        _maybe_summarize(conversation_id, turn["context_tokens"] + count_tokens(assistant_reply))
+    except Exception:
+        reply, tokens = _mock_reply(user_message)
+        yield {"type": "done", "message": reply, "tokens": tokens, "replaced": True, "fallback": True}
 
 
+async def _stream_turn(payload: ChatIn, user_message: str) -> AsyncIterator[str]:
+    """
+    Gerador SSE do chat (eventos de `_stream_events`). Repetições da mesma mensagem da sessão
+    (duplo clique/reenvio) não geram outro turno: recebem apenas o `done` do primeiro.
+    """
+    key = single_flight.key("stream", payload.sessionId, user_message)
+    leader, future = single_flight.claim(key) if single_flight.enabled else (True, None)
+    if not leader:
+        ok, done = await single_flight.wait(future)
+        if ok:
+            yield _sse({**done, "replaced": True})
+            return
+        # O primeiro falhou ou foi interrompido: executa o turno normalmente
+        future = None
+
+    done = None
+    try:
+        async for event in _stream_events(payload, user_message):
+            if event["type"] == "done":
+                done = event
+            yield _sse(event)
+    except BaseException as e:
+        if future is not None:
+            single_flight.fail(key, future, e)
+        raise
+    if future is not None:
+        if done is not None:
+            single_flight.resolve(key, future, done, keep=not done.get("fallback"))
+        else:
+            single_flight.fail(key, future)
+
+
+@router.post("/messages/stream")
+async def messages_stream(payload: ChatIn, _auth: None = Depends(_require_auth_header)):
+    """Variante de `/messages` que envia os tokens via Server-Sent Events."""
+    user_message = payload.message.strip()
+    if not user_message:
+        return JSONResponse(content={"success": False, "message": "Mensagem vazia"})
+
+    return StreamingResponse(
+        _stream_turn(payload, user_message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,39 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
-from ...core.db import get_db
+from ...core.db import get_async_db
+from ...core.invalidation import notify_change
 from ..auth import verify_admin_user
 
 router = APIRouter(prefix="/panel", tags=["panel-configuracoes"], dependencies=[Depends(verify_admin_user)])
 
 @router.get("/configuracoes")
-async def listar_configuracoes(db = Depends(get_db)):
+async def listar_configuracoes(db = Depends(get_async_db)):
     try:
-        with db.cursor() as cur:
-            cur.execute("SELECT chave, valor FROM configuracoes ORDER BY id")
-            configuracoes = cur.fetchall()
+        async with db.cursor() as cur:
+            await cur.execute("SELECT chave, valor FROM configuracoes ORDER BY id")
+            configuracoes = await cur.fetchall()
             return JSONResponse(content={"success": True, "configuracoes": configuracoes})
     except Exception as e:
         return JSONResponse(content={"error": "Erro na conexão com banco de dados"}, status_code=500)
 
 @router.post("/configuracoes")
-async def atualizar_configuracoes(payload: dict, db = Depends(get_db)):
+async def atualizar_configuracoes(payload: dict, db = Depends(get_async_db)):
     if not payload:
         raise HTTPException(status_code=400, detail="Dados inválidos")
     try:
-        with db.cursor() as cur:
+        async with db.cursor() as cur:
             for chave, valor in payload.items():
-                cur.execute(
+                await cur.execute(
                     "UPDATE configuracoes SET valor = %s, updated_at = NOW() WHERE chave = %s",
                     (valor, chave)
                 )
         try:
-            db.commit()
+            await db.commit()
         except Exception:
             pass
+        notify_change("configuracoes")
         return JSONResponse(content={"success": True, "message": "Configurações atualizadas com sucesso"})
     except Exception:
         try:
-            db.rollback()
+            await db.rollback()
         except Exception:
             pass
         return JSONResponse(content={"success": False, "message": "Erro ao atualizar configurações"})
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
-from ...core.db import get_db, is_postgres_connection
+from ...core.db import async_db, is_postgres_connection
+from ...core.invalidation import notify_change
 from ..auth import verify_admin_user
 from ...schemas.panel import ConvenioCreate, ConvenioUpdate
 
@@ -10,18 +11,11 @@ router = APIRouter(prefix="/panel", tags=["panel-convenios"], dependencies=[Depe
 @router.get("/convenios")
 async def listar_convenios():
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
-                cur.execute("SELECT * FROM convenios_aceitos ORDER BY nome")
-                convenios = cur.fetchall()
+        async with async_db() as db:
+            async with db.cursor() as cur:
+                await cur.execute("SELECT * FROM convenios_aceitos ORDER BY nome")
+                convenios = await cur.fetchall()
                 return JSONResponse(content=jsonable_encoder({"success": True, "convenios": convenios}))
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": "Erro ao buscar convênios", "error": str(e)}, status_code=500)
 
@@ -29,30 +23,24 @@ async def listar_convenios():
 @router.post("/convenios")
 async def criar_convenio(payload: ConvenioCreate):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 if is_postgres_connection(db):
-                    cur.execute(
+                    await cur.execute(
                         "INSERT INTO convenios_aceitos (nome, registro_ans, observacoes, ativo) VALUES (%s, %s, %s, %s) RETURNING id",
                         (payload.nome, payload.registro_ans, payload.observacoes, 1 if payload.ativo else 0)
                     )
-                    result = cur.fetchone()
+                    result = await cur.fetchone()
                     convenio_id = result["id"] if isinstance(result, dict) else result[0]
                 else:
-                    cur.execute(
+                    await cur.execute(
                         "INSERT INTO convenios_aceitos (nome, registro_ans, observacoes, ativo) VALUES (%s, %s, %s, %s)",
                         (payload.nome, payload.registro_ans, payload.observacoes, 1 if payload.ativo else 0)
                     )
                     convenio_id = cur.lastrowid
                 
+                notify_change("convenios_aceitos")
                 return JSONResponse(content={"success": True, "message": "Convênio criado com sucesso", "id": convenio_id})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao criar convênio: {str(e)}"}, status_code=500)
 
@@ -60,9 +48,7 @@ async def criar_convenio(payload: ConvenioCreate):
 @router.put("/convenios/{convenio_id}")
 async def atualizar_convenio(convenio_id: int, payload: ConvenioUpdate):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
+        async with async_db() as db:
             updates = []
             values = []
             
@@ -80,20 +66,16 @@ async def atualizar_convenio(convenio_id: int, payload: ConvenioUpdate):
             updates.append("updated_at = CURRENT_TIMESTAMP")
             values.append(convenio_id)
             
-            with db.cursor() as cur:
-                cur.execute("SELECT id FROM convenios_aceitos WHERE id = %s", (convenio_id,))
-                if not cur.fetchone():
+            async with db.cursor() as cur:
+                await cur.execute("SELECT id FROM convenios_aceitos WHERE id = %s", (convenio_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "Convênio não encontrado"}, status_code=404)
                 
                 query = f"UPDATE convenios_aceitos SET {', '.join(updates)} WHERE id = %s"
-                cur.execute(query, values)
+                await cur.execute(query, values)
                 
+                notify_change("convenios_aceitos")
                 return JSONResponse(content={"success": True, "message": "Convênio atualizado com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao atualizar convênio: {str(e)}"}, status_code=500)
 
@@ -101,21 +83,15 @@ async def atualizar_convenio(convenio_id: int, payload: ConvenioUpdate):
 @router.delete("/convenios/{convenio_id}")
 async def deletar_convenio(convenio_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
-                cur.execute("SELECT id FROM convenios_aceitos WHERE id = %s", (convenio_id,))
-                if not cur.fetchone():
+        async with async_db() as db:
+            async with db.cursor() as cur:
+                await cur.execute("SELECT id FROM convenios_aceitos WHERE id = %s", (convenio_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "Convênio não encontrado"}, status_code=404)
                 
-                cur.execute("UPDATE convenios_aceitos SET ativo = 0 WHERE id = %s", (convenio_id,))
+                await cur.execute("UPDATE convenios_aceitos SET ativo = 0 WHERE id = %s", (convenio_id,))
+                notify_change("convenios_aceitos")
                 return JSONResponse(content={"success": True, "message": "Convênio desativado com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao deletar convênio: {str(e)}"}, status_code=500)
 
@@ -123,21 +99,14 @@ async def deletar_convenio(convenio_id: int):
 @router.get("/convenios/{convenio_id}")
 async def obter_convenio(convenio_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
-                cur.execute("SELECT * FROM convenios_aceitos WHERE id = %s", (convenio_id,))
-                convenio = cur.fetchone()
+        async with async_db() as db:
+            async with db.cursor() as cur:
+                await cur.execute("SELECT * FROM convenios_aceitos WHERE id = %s", (convenio_id,))
+                convenio = await cur.fetchone()
                 if not convenio:
                     return JSONResponse(content={"success": False, "message": "Convênio não encontrado"}, status_code=404)
                 
                 return JSONResponse(content=jsonable_encoder({"success": True, "convenio": convenio}))
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao buscar convênio: {str(e)}"}, status_code=500)
 
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
-from ...core.db import get_db, is_postgres_connection
+from ...core.db import async_db, is_postgres_connection
+from ...core.invalidation import notify_change
 from ..auth import verify_admin_user
 from ...schemas.panel import FAQCreate, FAQUpdate
 
@@ -10,18 +11,11 @@ router = APIRouter(prefix="/panel", tags=["panel-faq"], dependencies=[Depends(ve
 @router.get("/faq")
 async def listar_faq():
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
-                cur.execute("SELECT * FROM faq ORDER BY categoria, pergunta")
-                faqs = cur.fetchall()
+        async with async_db() as db:
+            async with db.cursor() as cur:
+                await cur.execute("SELECT * FROM faq ORDER BY categoria, pergunta")
+                faqs = await cur.fetchall()
                 return JSONResponse(content=jsonable_encoder({"success": True, "faqs": faqs}))
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": "Erro ao buscar FAQ", "error": str(e)}, status_code=500)
 
@@ -29,22 +23,20 @@ async def listar_faq():
 @router.post("/faq")
 async def criar_faq(payload: FAQCreate):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 if is_postgres_connection(db):
-                    cur.execute(
+                    await cur.execute(
                         """
                         INSERT INTO faq (pergunta, resposta, categoria, palavras_chave, ativo)
                         VALUES (%s, %s, %s, %s, %s) RETURNING id
                         """,
                         (payload.pergunta, payload.resposta, payload.categoria, payload.palavras_chave, 1 if payload.ativo else 0)
                     )
-                    result = cur.fetchone()
+                    result = await cur.fetchone()
                     faq_id = result["id"] if isinstance(result, dict) else result[0]
                 else:
-                    cur.execute(
+                    await cur.execute(
                         """
                         INSERT INTO faq (pergunta, resposta, categoria, palavras_chave, ativo)
                         VALUES (%s, %s, %s, %s, %s)
@@ -53,12 +45,8 @@ async def criar_faq(payload: FAQCreate):
                     )
                     faq_id = cur.lastrowid
                 
+                notify_change("faq", id=faq_id)
                 return JSONResponse(content={"success": True, "message": "FAQ criado com sucesso", "id": faq_id})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao criar FAQ: {str(e)}"}, status_code=500)
 
@@ -66,9 +54,7 @@ async def criar_faq(payload: FAQCreate):
 @router.put("/faq/{faq_id}")
 async def atualizar_faq(faq_id: int, payload: FAQUpdate):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
+        async with async_db() as db:
             # Montar query dinamicamente baseada nos campos fornecidos
             updates = []
             values = []
@@ -96,22 +82,18 @@ async def atualizar_faq(faq_id: int, payload: FAQUpdate):
             updates.append("updated_at = CURRENT_TIMESTAMP")
             values.append(faq_id)
             
-            with db.cursor() as cur:
+            async with db.cursor() as cur:
                 # Verificar se existe
-                cur.execute("SELECT id FROM faq WHERE id = %s", (faq_id,))
-                if not cur.fetchone():
+                await cur.execute("SELECT id FROM faq WHERE id = %s", (faq_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "FAQ não encontrado"}, status_code=404)
                 
                 # Atualizar
                 query = f"UPDATE faq SET {', '.join(updates)} WHERE id = %s"
-                cur.execute(query, values)
+                await cur.execute(query, values)
                 
+                notify_change("faq", id=faq_id)
                 return JSONResponse(content={"success": True, "message": "FAQ atualizado com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao atualizar FAQ: {str(e)}"}, status_code=500)
 
@@ -119,24 +101,18 @@ async def atualizar_faq(faq_id: int, payload: FAQUpdate):
 @router.delete("/faq/{faq_id}")
 async def deletar_faq(faq_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Verificar se existe
-                cur.execute("SELECT id FROM faq WHERE id = %s", (faq_id,))
-                if not cur.fetchone():
+                await cur.execute("SELECT id FROM faq WHERE id = %s", (faq_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "FAQ não encontrado"}, status_code=404)
                 
                 # Desativar em vez de deletar (soft delete)
-                cur.execute("UPDATE faq SET ativo = 0 WHERE id = %s", (faq_id,))
+                await cur.execute("UPDATE faq SET ativo = 0, updated_at = CURRENT_TIMESTAMP WHERE id = %s", (faq_id,))
                 
+                notify_change("faq", id=faq_id)
                 return JSONResponse(content={"success": True, "message": "FAQ desativado com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao deletar FAQ: {str(e)}"}, status_code=500)
 
@@ -144,21 +120,14 @@ async def deletar_faq(faq_id: int):
 @router.get("/faq/{faq_id}")
 async def obter_faq(faq_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
-                cur.execute("SELECT * FROM faq WHERE id = %s", (faq_id,))
-                faq = cur.fetchone()
+        async with async_db() as db:
+            async with db.cursor() as cur:
+                await cur.execute("SELECT * FROM faq WHERE id = %s", (faq_id,))
+                faq = await cur.fetchone()
                 if not faq:
                     return JSONResponse(content={"success": False, "message": "FAQ não encontrado"}, status_code=404)
                 
                 return JSONResponse(content=jsonable_encoder({"success": True, "faq": faq}))
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao buscar FAQ: {str(e)}"}, status_code=500)
 
@@ -7,6 +7,7 @@ from datetime import datetime, time, date
 import logging
 
 from ...core.db import get_db
+from ...core.invalidation import notify_change
 from ..auth import verify_admin_user
 
 router = APIRouter(prefix="/panel", tags=["panel-horarios"], dependencies=[Depends(verify_admin_user)])
@@ -61,8 +62,8 @@ async def listar_horarios():
                 # Organizar por profissional
                 profissionais_horarios = {}
                 for horario in horarios:
-                    prof_id = horario[1]
-                    prof_nome = horario[2]
+                    prof_id = horario["profissional_id"]
+                    prof_nome = horario["profissional_nome"]
                     
                     if prof_id not in profissionais_horarios:
                         profissionais_horarios[prof_id] = {
@@ -72,17 +73,17 @@ async def listar_horarios():
                         }
                     
                     profissionais_horarios[prof_id]["horarios"].append({
-                        "id": horario[0],
-                        "dia_semana": horario[3],
-                        "dia_semana_nome": DIAS_SEMANA.get(horario[3], f"Dia {horario[3]}"),
-                        "hora_inicio": horario[4].strftime("%H:%M") if horario[4] else None,
-                        "hora_fim": horario[5].strftime("%H:%M") if horario[5] else None,
-                        "intervalo_inicio": horario[6].strftime("%H:%M") if horario[6] else None,
-                        "intervalo_fim": horario[7].strftime("%H:%M") if horario[7] else None,
-                        "tipo_atendimento": horario[8],
-                        "tipo_atendimento_nome": TIPOS_ATENDIMENTO.get(horario[8], horario[8]),
-                        "duracao_consulta": horario[9],
-                        "ativo": horario[10]
+                        "id": horario["id"],
+                        "dia_semana": horario["dia_semana"],
+                        "dia_semana_nome": DIAS_SEMANA.get(horario["dia_semana"], f"Dia {horario['dia_semana']}"),
+                        "hora_inicio": horario["hora_inicio"].strftime("%H:%M") if horario["hora_inicio"] else None,
+                        "hora_fim": horario["hora_fim"].strftime("%H:%M") if horario["hora_fim"] else None,
+                        "intervalo_inicio": horario["intervalo_inicio"].strftime("%H:%M") if horario["intervalo_inicio"] else None,
+                        "intervalo_fim": horario["intervalo_fim"].strftime("%H:%M") if horario["intervalo_fim"] else None,
+                        "tipo_atendimento": horario["tipo_atendimento"],
+                        "tipo_atendimento_nome": TIPOS_ATENDIMENTO.get(horario["tipo_atendimento"], horario["tipo_atendimento"]),
+                        "duracao_consulta": horario["duracao_consulta"],
+                        "ativo": horario["ativo"]
                     })
                 
                 # Converter para lista
@@ -111,8 +112,8 @@ async def obter_horarios_profissional(profissional_id: int):
     try:
         db_gen = get_db()
         db = next(db_gen)
-    try:
-        with db.cursor() as cur:
+        try:
+            with db.cursor() as cur:
                 # Verificar se o profissional existe
                 cur.execute("SELECT nome FROM profissionais WHERE id = %s AND ativo = 1", (profissional_id,))
                 profissional = cur.fetchone()
@@ -139,23 +140,23 @@ async def obter_horarios_profissional(profissional_id: int):
                 
                 for h in horarios_raw:
                     horarios.append({
-                        "id": h[0],
-                        "dia_semana": h[1],
-                        "dia_semana_nome": DIAS_SEMANA.get(h[1], f"Dia {h[1]}"),
-                        "hora_inicio": h[2].strftime("%H:%M") if h[2] else None,
-                        "hora_fim": h[3].strftime("%H:%M") if h[3] else None,
-                        "intervalo_inicio": h[4].strftime("%H:%M") if h[4] else None,
-                        "intervalo_fim": h[5].strftime("%H:%M") if h[5] else None,
-                        "tipo_atendimento": h[6],
-                        "tipo_atendimento_nome": TIPOS_ATENDIMENTO.get(h[6], h[6]),
-                        "duracao_consulta": h[7],
-                        "ativo": h[8]
+                        "id": h["id"],
+                        "dia_semana": h["dia_semana"],
+                        "dia_semana_nome": DIAS_SEMANA.get(h["dia_semana"], f"Dia {h['dia_semana']}"),
+                        "hora_inicio": h["hora_inicio"].strftime("%H:%M") if h["hora_inicio"] else None,
+                        "hora_fim": h["hora_fim"].strftime("%H:%M") if h["hora_fim"] else None,
+                        "intervalo_inicio": h["intervalo_inicio"].strftime("%H:%M") if h["intervalo_inicio"] else None,
+                        "intervalo_fim": h["intervalo_fim"].strftime("%H:%M") if h["intervalo_fim"] else None,
+                        "tipo_atendimento": h["tipo_atendimento"],
+                        "tipo_atendimento_nome": TIPOS_ATENDIMENTO.get(h["tipo_atendimento"], h["tipo_atendimento"]),
+                        "duracao_consulta": h["duracao_consulta"],
+                        "ativo": h["ativo"]
                     })
                 
                 return JSONResponse(content=jsonable_encoder({
                     "success": True,
                     "profissional_id": profissional_id,
-                    "profissional_nome": profissional[0],
+                    "profissional_nome": profissional["nome"],
                     "horarios": horarios
                 }))
                 
@@ -260,16 +261,17 @@ async def definir_horarios_profissional(
                         ))
                 
                 db.commit()
+                notify_change("disponibilidades_profissional", profissional_id=profissional_id)
                 
                 return JSONResponse(content={
                     "success": True,
-                    "message": f"Horários definidos com sucesso para {profissional[0]}"
+                    "message": f"Horários definidos com sucesso para {profissional['nome']}"
                 })
                 
         finally:
             try:
                 db.close()
-    except Exception:
+            except Exception:
                 pass
                 
     except Exception as e:
@@ -352,6 +354,7 @@ async def atualizar_horario(
                 sql = f"UPDATE disponibilidades_profissional SET {', '.join(campos)} WHERE id = %s"
                 cur.execute(sql, valores)
                 db.commit()
+                notify_change("disponibilidades_profissional", profissional_id=horario_existe["profissional_id"])
                 
                 return JSONResponse(content={
                     "success": True,
@@ -388,10 +391,11 @@ async def excluir_horario(
             with db.cursor() as cur:
                 # Verificar se existe
                 cur.execute(
-                    "SELECT id FROM disponibilidades_profissional WHERE id = %s",
+                    "SELECT profissional_id FROM disponibilidades_profissional WHERE id = %s",
                     (horario_id,)
                 )
-                if not cur.fetchone():
+                horario_existe = cur.fetchone()
+                if not horario_existe:
                     return JSONResponse(
                         content={"success": False, "message": "Horário não encontrado"},
                         status_code=404
@@ -403,6 +407,7 @@ async def excluir_horario(
                     (horario_id,)
                 )
                 db.commit()
+                notify_change("disponibilidades_profissional", profissional_id=horario_existe["profissional_id"])
                 
                 return JSONResponse(content={
                     "success": True,
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
-from ...core.db import get_db, is_postgres_connection
+from ...core.db import async_db, is_postgres_connection
+from ...core.invalidation import notify_change
 from ...schemas.panel import ProfissionalCreate, ProfissionalUpdate
 from ...services.calendar_integration import CalendarIntegration
 import logging
@@ -12,19 +13,17 @@ router = APIRouter(prefix="/panel", tags=["panel-profissionais"])
 async def listar_profissionais():
     """Lista profissionais com informações para integração Google Calendar"""
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Buscar profissionais com informações extras para Google Calendar
-                cur.execute("""
+                await cur.execute("""
                     SELECT 
                         id, nome, especialidade, crm, ativo, email,
                         horas_trabalho_semana, created_at, updated_at
                     FROM profissionais 
                     ORDER BY nome
                 """)
-                profissionais_raw = cur.fetchall()
+                profissionais_raw = await cur.fetchall()
                 
                 # Formatear dados para incluir status de integração
                 profissionais = []
@@ -48,11 +47,6 @@ async def listar_profissionais():
                     "profissionais": profissionais,
                     "total": len(profissionais)
                 }))
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         logging.error(f"Erro ao buscar profissionais: {str(e)}")
         return JSONResponse(content={"success": False, "message": "Erro ao buscar profissionais", "error": str(e)}, status_code=500)
@@ -62,21 +56,19 @@ async def listar_profissionais():
 async def criar_profissional(payload: ProfissionalCreate):
     """Cria profissional com integração Google Calendar"""
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Verificar se email já existe (se fornecido)
                 if payload.email:
-                    cur.execute("SELECT id FROM profissionais WHERE email = %s", (payload.email,))
-                    if cur.fetchone():
+                    await cur.execute("SELECT id FROM profissionais WHERE email = %s", (payload.email,))
+                    if await cur.fetchone():
                         return JSONResponse(
                             content={"success": False, "message": "Email já está em uso"},
                             status_code=400
                         )
                 
                 if is_postgres_connection(db):
-                    cur.execute(
+                    await cur.execute(
                         """
                         INSERT INTO profissionais 
                         (nome, especialidade, crm, email, horas_trabalho_semana, ativo)
@@ -85,10 +77,10 @@ async def criar_profissional(payload: ProfissionalCreate):
                         (payload.nome, payload.especialidade, payload.crm, 
                          payload.email, payload.horas_trabalho_semana, 1 if payload.ativo else 0)
                     )
-                    result = cur.fetchone()
+                    result = await cur.fetchone()
                     prof_id = result["id"] if isinstance(result, dict) else result[0]
                 else:
-                    cur.execute(
+                    await cur.execute(
                         """
                         INSERT INTO profissionais 
                         (nome, especialidade, crm, email, horas_trabalho_semana, ativo)
@@ -99,17 +91,13 @@ async def criar_profissional(payload: ProfissionalCreate):
                     )
                     prof_id = cur.lastrowid
                 
+                notify_change("profissionais")
                 return JSONResponse(content={
                     "success": True, 
                     "message": "Profissional criado com sucesso", 
                     "id": prof_id,
                     "google_calendar_ready": payload.email is not None
                 })
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         logging.error(f"Erro ao criar profissional: {str(e)}")
         return JSONResponse(content={"success": False, "message": f"Erro ao criar profissional: {str(e)}"}, status_code=500)
@@ -118,9 +106,7 @@ async def criar_profissional(payload: ProfissionalCreate):
 @router.put("/profissionais/{prof_id}")
 async def atualizar_profissional(prof_id: int, payload: ProfissionalUpdate):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
+        async with async_db() as db:
             # Montar query dinamicamente baseada nos campos fornecidos
             updates = []
             values = []
@@ -151,22 +137,18 @@ async def atualizar_profissional(prof_id: int, payload: ProfissionalUpdate):
             updates.append("updated_at = CURRENT_TIMESTAMP")
             values.append(prof_id)
             
-            with db.cursor() as cur:
+            async with db.cursor() as cur:
                 # Verificar se existe
-                cur.execute("SELECT id FROM profissionais WHERE id = %s", (prof_id,))
-                if not cur.fetchone():
+                await cur.execute("SELECT id FROM profissionais WHERE id = %s", (prof_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "Profissional não encontrado"}, status_code=404)
                 
                 # Atualizar
                 query = f"UPDATE profissionais SET {', '.join(updates)} WHERE id = %s"
-                cur.execute(query, values)
+                await cur.execute(query, values)
                 
+                notify_change("profissionais")
                 return JSONResponse(content={"success": True, "message": "Profissional atualizado com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao atualizar profissional: {str(e)}"}, status_code=500)
 
@@ -174,30 +156,25 @@ async def atualizar_profissional(prof_id: int, payload: ProfissionalUpdate):
 @router.delete("/profissionais/{prof_id}")
 async def deletar_profissional(prof_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Verificar se existe
-                cur.execute("SELECT id FROM profissionais WHERE id = %s", (prof_id,))
-                if not cur.fetchone():
+                await cur.execute("SELECT id FROM profissionais WHERE id = %s", (prof_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "Profissional não encontrado"}, status_code=404)
                 
                 # Verificar se há horários vinculados
-                cur.execute("SELECT id FROM horarios_disponiveis WHERE profissional_id = %s LIMIT 1", (prof_id,))
-                if cur.fetchone():
+                await cur.execute("SELECT id FROM horarios_disponiveis WHERE profissional_id = %s LIMIT 1", (prof_id,))
+                if await cur.fetchone():
                     # Se há horários vinculados, apenas desativar
-                    cur.execute("UPDATE profissionais SET ativo = 0 WHERE id = %s", (prof_id,))
+                    await cur.execute("UPDATE profissionais SET ativo = 0 WHERE id = %s", (prof_id,))
+                    notify_change("profissionais")
                     return JSONResponse(content={"success": True, "message": "Profissional desativado com sucesso (possui horários vinculados)"})
                 else:
                     # Se não há vinculações, pode deletar
-                    cur.execute("DELETE FROM profissionais WHERE id = %s", (prof_id,))
+                    await cur.execute("DELETE FROM profissionais WHERE id = %s", (prof_id,))
+                    notify_change("profissionais")
                     return JSONResponse(content={"success": True, "message": "Profissional excluído com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao deletar profissional: {str(e)}"}, status_code=500)
 
@@ -205,21 +182,14 @@ async def deletar_profissional(prof_id: int):
 @router.get("/profissionais/{prof_id}")
 async def obter_profissional(prof_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
-                cur.execute("SELECT * FROM profissionais WHERE id = %s", (prof_id,))
-                profissional = cur.fetchone()
+        async with async_db() as db:
+            async with db.cursor() as cur:
+                await cur.execute("SELECT * FROM profissionais WHERE id = %s", (prof_id,))
+                profissional = await cur.fetchone()
                 if not profissional:
                     return JSONResponse(content={"success": False, "message": "Profissional não encontrado"}, status_code=404)
                 
                 return JSONResponse(content={"success": True, "profissional": profissional})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao buscar profissional: {str(e)}"}, status_code=500)
 
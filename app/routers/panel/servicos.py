@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
-from ...core.db import get_db, is_postgres_connection
+from ...core.db import async_db, is_postgres_connection
+from ...core.invalidation import notify_change
 from ..auth import verify_admin_user
 from ...schemas.panel import ServicoCreate, ServicoUpdate
 
@@ -10,25 +11,18 @@ router = APIRouter(prefix="/panel", tags=["panel-servicos"], dependencies=[Depen
 @router.get("/servicos")
 async def listar_servicos(request: Request):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
+        async with async_db() as db:
             id_str = request.query_params.get("id")
-            with db.cursor() as cur:
+            async with db.cursor() as cur:
                 if id_str is not None:
-                    cur.execute("SELECT * FROM servicos_clinica WHERE id = %s", (id_str,))
-                    servico = cur.fetchone()
+                    await cur.execute("SELECT * FROM servicos_clinica WHERE id = %s", (id_str,))
+                    servico = await cur.fetchone()
                     if servico:
                         return JSONResponse(content={"success": True, "servico": servico})
                     return JSONResponse(content={"success": False, "message": "Serviço não encontrado"})
-                cur.execute("SELECT * FROM servicos_clinica ORDER BY nome")
-                servicos = cur.fetchall()
+                await cur.execute("SELECT * FROM servicos_clinica ORDER BY nome")
+                servicos = await cur.fetchall()
                 return JSONResponse(content=jsonable_encoder({"success": True, "servicos": servicos}))
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": "Erro ao buscar serviços", "error": str(e)}, status_code=500)
 
@@ -36,12 +30,10 @@ async def listar_servicos(request: Request):
 @router.post("/servicos")
 async def criar_servico(payload: ServicoCreate):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 if is_postgres_connection(db):
-                    cur.execute(
+                    await cur.execute(
                         """
                         INSERT INTO servicos_clinica (
                             nome, descricao, valor, categoria, palavras_chave, observacoes, 
@@ -54,10 +46,10 @@ async def criar_servico(payload: ServicoCreate):
                             payload.anestesia_tipo, payload.local_realizacao, 1 if payload.ativo else 0
                         )
                     )
-                    result = cur.fetchone()
+                    result = await cur.fetchone()
                     servico_id = result["id"] if isinstance(result, dict) else result[0]
                 else:
-                    cur.execute(
+                    await cur.execute(
                         """
                         INSERT INTO servicos_clinica (
                             nome, descricao, valor, categoria, palavras_chave, observacoes, 
@@ -72,12 +64,8 @@ async def criar_servico(payload: ServicoCreate):
                     )
                     servico_id = cur.lastrowid
                 
+                notify_change("servicos_clinica")
                 return JSONResponse(content={"success": True, "message": "Serviço criado com sucesso", "id": servico_id})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao criar serviço: {str(e)}"}, status_code=500)
 
@@ -85,9 +73,7 @@ async def criar_servico(payload: ServicoCreate):
 @router.put("/servicos/{servico_id}")
 async def atualizar_servico(servico_id: int, payload: ServicoUpdate):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
+        async with async_db() as db:
             # Montar query dinamicamente baseada nos campos fornecidos
             updates = []
             values = []
@@ -107,22 +93,18 @@ async def atualizar_servico(servico_id: int, payload: ServicoUpdate):
             updates.append("updated_at = CURRENT_TIMESTAMP")
             values.append(servico_id)
             
-            with db.cursor() as cur:
+            async with db.cursor() as cur:
                 # Verificar se existe
-                cur.execute("SELECT id FROM servicos_clinica WHERE id = %s", (servico_id,))
-                if not cur.fetchone():
+                await cur.execute("SELECT id FROM servicos_clinica WHERE id = %s", (servico_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "Serviço não encontrado"}, status_code=404)
                 
                 # Atualizar
                 query = f"UPDATE servicos_clinica SET {', '.join(updates)} WHERE id = %s"
-                cur.execute(query, values)
+                await cur.execute(query, values)
                 
+                notify_change("servicos_clinica")
                 return JSONResponse(content={"success": True, "message": "Serviço atualizado com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao atualizar serviço: {str(e)}"}, status_code=500)
 
@@ -130,24 +112,18 @@ async def atualizar_servico(servico_id: int, payload: ServicoUpdate):
 @router.delete("/servicos/{servico_id}")
 async def deletar_servico(servico_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
+        async with async_db() as db:
+            async with db.cursor() as cur:
                 # Verificar se existe
-                cur.execute("SELECT id FROM servicos_clinica WHERE id = %s", (servico_id,))
-                if not cur.fetchone():
+                await cur.execute("SELECT id FROM servicos_clinica WHERE id = %s", (servico_id,))
+                if not await cur.fetchone():
                     return JSONResponse(content={"success": False, "message": "Serviço não encontrado"}, status_code=404)
                 
                 # Desativar em vez de deletar (soft delete)
-                cur.execute("UPDATE servicos_clinica SET ativo = 0 WHERE id = %s", (servico_id,))
+                await cur.execute("UPDATE servicos_clinica SET ativo = 0 WHERE id = %s", (servico_id,))
                 
+                notify_change("servicos_clinica")
                 return JSONResponse(content={"success": True, "message": "Serviço desativado com sucesso"})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao deletar serviço: {str(e)}"}, status_code=500)
 
@@ -155,21 +131,14 @@ async def deletar_servico(servico_id: int):
 @router.get("/servicos/{servico_id}")
 async def obter_servico(servico_id: int):
     try:
-        db_gen = get_db()
-        db = next(db_gen)
-        try:
-            with db.cursor() as cur:
-                cur.execute("SELECT * FROM servicos_clinica WHERE id = %s", (servico_id,))
-                servico = cur.fetchone()
+        async with async_db() as db:
+            async with db.cursor() as cur:
+                await cur.execute("SELECT * FROM servicos_clinica WHERE id = %s", (servico_id,))
+                servico = await cur.fetchone()
                 if not servico:
                     return JSONResponse(content={"success": False, "message": "Serviço não encontrado"}, status_code=404)
                 
                 return JSONResponse(content={"success": True, "servico": servico})
-        finally:
-            try:
-                db.close()
-            except Exception:
-                pass
     except Exception as e:
         return JSONResponse(content={"success": False, "message": f"Erro ao buscar serviço: {str(e)}"}, status_code=500)
 
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from ...core.db import get_pool_stats
+from ..auth import verify_admin_user
+from ...services.availability_bitmap import availability_bitmaps
+from ...services.booking import booking_service
+from ...services.chat_writer import chat_writer
+from ...services.conversation_cache import conversation_cache
+from ...services.faq_index import faq_index
+from ...services.llm_admission import llm_admission
+from ...services.llm_resilience import backend_stats
+from ...services.response_cache import response_cache
+from ...services.single_flight import single_flight
+from ...services.slot_store import slot_store
+from ...services.summary_worker import summary_worker
+from ...services.token_budget import budget_info
+
+router = APIRouter(prefix="/panel", tags=["panel-sistema"], dependencies=[Depends(verify_admin_user)])
+
+
+@router.get("/sistema/metricas")
+async def obter_metricas():
+    """Métricas de runtime do processo (pool de conexões, fila de sumarização, caches do chat) para dimensionamento sob carga."""
+    return JSONResponse(content={
+        "success": True,
+        "db_pool": get_pool_stats(),
+        "summary_worker": summary_worker.stats(),
+        "conversation_cache": conversation_cache.stats(),
+        "chat_writer": chat_writer.stats(),
+        "prompt_budget": budget_info(),
+        "response_cache": response_cache.stats(),
+        "faq_index": faq_index.stats(),
+        "llm_backends": backend_stats(),
+        "llm_admission": llm_admission.stats(),
+        "chat_dedup": single_flight.stats(),
+        "slot_store": slot_store.stats(),
+        "availability_bitmaps": availability_bitmaps.stats(),
+        "booking": booking_service.stats(),
+    })
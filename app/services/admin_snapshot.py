@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ..core.invalidation import on_change
+from .token_budget import count_tokens
+
+
+async def _build_snapshot(db) -> Dict[str, Any]:
+    """Monta o snapshot básico a partir das tabelas do painel."""
+    snapshot: Dict[str, Any] = {}
+    async with db.cursor() as cur:
+        # Configurações (mapa chave->valor)
+        await cur.execute("SELECT chave, valor FROM configuracoes")
+        cfg_rows = (await cur.fetchall()) or []
+        snapshot["configuracoes"] = {
+            (r["chave"] if isinstance(r, dict) else r[0]): (r["valor"] if isinstance(r, dict) else r[1]) for r in cfg_rows
+        }
+
+        # Serviços ativos (limite 15)
+        await cur.execute("SELECT nome, valor, categoria FROM servicos_clinica WHERE ativo = 1 LIMIT 15")
+        servicos = []
+        for r in (await cur.fetchall()) or []:
+            nome = r["nome"] if isinstance(r, dict) else r[0]
+            valor = r["valor"] if isinstance(r, dict) else r[1]
+            categoria = r["categoria"] if isinstance(r, dict) else r[2]
+            servicos.append({"nome": nome, "valor": float(valor) if valor is not None else None, "categoria": categoria})
+        snapshot["servicos_ativos"] = servicos
+
+        # Profissionais ativos (limite 15)
+        await cur.execute("SELECT nome, especialidade FROM profissionais WHERE ativo = 1 LIMIT 15")
+        profissionais = []
+        for r in (await cur.fetchall()) or []:
+            nome = r["nome"] if isinstance(r, dict) else r[0]
+            esp = r["especialidade"] if isinstance(r, dict) else r[1]
+            profissionais.append({"nome": nome, "especialidade": esp})
+        snapshot["profissionais_ativos"] = profissionais
+
+        # Convênios aceitos (limite 30)
+        await cur.execute("SELECT nome FROM convenios_aceitos WHERE ativo = 1 ORDER BY nome LIMIT 30")
+        snapshot["convenios_aceitos"] = [(r["nome"] if isinstance(r, dict) else r[0]) for r in (await cur.fetchall()) or []]
+    return snapshot
+
+
+def _prompt_view(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Snapshot sem as configurações internas do chat (`chat_*`), que não vão para o prompt."""
+    cfg = snapshot.get("configuracoes")
+    if not isinstance(cfg, dict) or not any(str(k).startswith("chat_") for k in cfg):
+        return snapshot
+    return {**snapshot, "configuracoes": {k: v for k, v in cfg.items() if not str(k).startswith("chat_")}}
+
+
+def serialize_capped(snapshot: Dict[str, Any], max_chars: int, size: Callable[[str], int] = len) -> str:
+    """
+    Serializa o snapshot em JSON válido com `size(json) <= max_chars` (caracteres por
+    padrão; passe um contador de tokens para limitar em tokens).
+    Em vez de cortar a string (JSON quebrado), remove itens do fim da maior lista
+    e, se ainda não couber, descarta as chaves menos importantes (as últimas).
+    """
+    data = {k: (list(v) if isinstance(v, list) else v) for k, v in snapshot.items()}
+    out = json.dumps(data, ensure_ascii=False)
+    while size(out) > max_chars and data:
+        lists = [k for k, v in data.items() if isinstance(v, list) and v]
+        if lists:
+            longest = max(lists, key=lambda k: len(data[k]))
+            data[longest].pop()
+        else:
+            data.pop(next(reversed(data)))
+        out = json.dumps(data, ensure_ascii=False)
+    return out if data else ""
+
+
+class AdminSnapshotCache:
+    """
+    Snapshot do painel em memória para o contexto do chat.
+    - Reconstruído sob demanda quando expira (ADMIN_SNAPSHOT_TTL_SECONDS) ou quando um router do
+      painel grava em configuracoes/servicos/profissionais/faq/convenios (`invalidate`).
+    - Guarda o JSON já serializado e limitado (ADMIN_SNAPSHOT_MAX_CHARS) para ir direto ao prompt.
+    - `get_json_within` devolve o JSON reduzido a um orçamento de tokens (memorizado por snapshot).
+    - `version` muda a cada invalidação, servindo de chave para caches derivados.
+    A invalidação é por processo; em múltiplos workers o TTL limita a defasagem.
+    """
+
+    def __init__(self) -> None:
+        self.ttl = float(os.getenv("ADMIN_SNAPSHOT_TTL_SECONDS", "300"))
+        self.max_chars = int(os.getenv("ADMIN_SNAPSHOT_MAX_CHARS", "6000"))
+        self.version = 0
+        self._data: Optional[Dict[str, Any]] = None
+        self._json = ""
+        self._within: Dict[int, str] = {}
+        self._built_at = 0.0
+        self._built_version = -1
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _fresh(self) -> bool:
+        return (
+            self._data is not None
+            and self._built_version == self.version
+            and (time.monotonic() - self._built_at) < self.ttl
+        )
+
+    async def get(self, db) -> Dict[str, Any]:
+        await self._ensure(db)
+        return self._data or {}
+
+    async def get_json(self, db) -> str:
+        await self._ensure(db)
+        return self._json
+
+    async def get_json_within(self, db, max_tokens: int) -> str:
+        """JSON do snapshot com no máximo `max_tokens` tokens (sem quebrar a estrutura)."""
+        await self._ensure(db)
+        if not self._json or count_tokens(self._json) <= max_tokens:
+            return self._json
+        # Orçamento arredondado para baixo: poucas variações memorizadas por snapshot
+        key = max(0, max_tokens - max_tokens % 100)
+        out = self._within.get(key)
+        if out is None:
+            out = serialize_capped(_prompt_view(self._data or {}), key, size=count_tokens) if key else ""
+            self._within[key] = out
+        return out
+
+    def invalidate(self, *_args: Any, **_info: Any) -> None:
+        self.version += 1
+
+    async def _ensure(self, db) -> None:
+        if self._fresh():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Outra requisição pode ter reconstruído enquanto esperávamos
+            if self._fresh():
+                return
+            version = self.version
+            try:
+                data = await _build_snapshot(db)
+            except Exception:
+                # Falha silenciosa para não quebrar o chat: mantém o último snapshot conhecido
+                # e tenta de novo em até 30s
+                if self._data is None:
+                    self._data, self._json = {}, ""
+                self._built_at = time.monotonic() - max(0.0, self.ttl - 30)
+                self._built_version = version
+                return
+            self._data = data
+            self._json = serialize_capped(_prompt_view(data), self.max_chars)
+            self._within = {}
+            self._built_at = time.monotonic()
+            self._built_version = version
+
+
+admin_snapshot_cache = AdminSnapshotCache()
+on_change(["configuracoes", "servicos_clinica", "profissionais", "faq", "convenios_aceitos"], admin_snapshot_cache.invalidate)
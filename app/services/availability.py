@@ -0,0 +1,296 @@
+import heapq
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .slot_engine import Interval, day_busy, format_minutes, iter_free_slots, to_minutes
+from .text_normalize import tokenize
+
+
+# Tipo pedido -> tipos de disponibilidade que o atendem (mesma regra de /api/slots-disponiveis)
+TIPOS_COMPATIVEIS = {
+    "presencial": ["presencial", "hibrido"],
+    "remoto": ["remoto", "hibrido"],
+    "hibrido": ["presencial", "remoto", "hibrido"],
+}
+
+# Bloqueio sem horário = dia inteiro
+_FULL_DAY: Interval = (0, 23 * 60 + 59)
+
+
+def tipo_compativel(tipo_atendimento: Optional[str], tipo_disponivel: Optional[str]) -> bool:
+    if tipo_disponivel == "indisponivel":
+        return False
+    if not tipo_atendimento:
+        return True
+    return tipo_atendimento in TIPOS_COMPATIVEIS.get(tipo_disponivel, [tipo_disponivel])
+
+
+def _placeholders(values: Sequence[Any]) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def _daterange(start: date, end: date) -> Iterable[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def _row_slots(row: Dict[str, Any], occupied: List[Interval], not_before: Optional[int]) -> Iterable[Tuple[int, int, int]]:
+    start, end = to_minutes(row["hora_inicio"]), to_minutes(row["hora_fim"])
+    if start is None or end is None:
+        return
+    duration = row["duracao_consulta"] or 60
+    busy = day_busy(row["intervalo_inicio"], row["intervalo_fim"], [])
+    busy.extend(occupied)
+    for s, e in iter_free_slots(start, end, busy, duration):
+        if not_before is None or s >= not_before:
+            yield s, e, duration
+
+
+class AvailabilityWindow:
+    """
+    Dados de agenda de vários profissionais em um período, carregados em uma consulta por
+    tabela (profissionais, disponibilidades_profissional, agendamentos, bloqueios_agenda) e
+    agrupados em memória por profissional/dia. Os slots de cada dia saem do motor de
+    app/services/slot_engine.py.
+    """
+
+    def __init__(self, data_inicio: date, data_fim: date) -> None:
+        self.data_inicio = data_inicio
+        self.data_fim = data_fim
+        self.profissionais: Dict[int, Dict[str, Any]] = {}
+        # profissional_id -> dia_semana (1=segunda..7=domingo) -> linhas de disponibilidade
+        self.schedule: Dict[int, Dict[int, List[Dict[str, Any]]]] = {}
+        # (profissional_id, data) -> períodos ocupados em minutos
+        self.bookings: Dict[Tuple[int, date], List[Interval]] = {}
+        # (profissional_id ou None para bloqueio geral, data) -> períodos bloqueados
+        self.blocks: Dict[Tuple[Optional[int], date], List[Interval]] = {}
+
+    @classmethod
+    async def load(cls, db, profissional_ids: Sequence[int], data_inicio: date, data_fim: date) -> "AvailabilityWindow":
+        window = cls(data_inicio, data_fim)
+        ids = list(dict.fromkeys(profissional_ids))
+        if not ids:
+            return window
+        marks = _placeholders(ids)
+        async with db.cursor() as cur:
+            await cur.execute(
+                f"SELECT id, nome, especialidade FROM profissionais WHERE id IN ({marks}) AND ativo = 1",
+                tuple(ids),
+            )
+            for r in (await cur.fetchall()) or []:
+                window.profissionais[r["id"]] = {"id": r["id"], "nome": r["nome"], "especialidade": r.get("especialidade")}
+
+            ativos = [pid for pid in ids if pid in window.profissionais]
+            if not ativos:
+                return window
+            marks = _placeholders(ativos)
+
+            await cur.execute(
+                f"""
+                SELECT profissional_id, dia_semana, hora_inicio, hora_fim, intervalo_inicio, intervalo_fim,
+                       tipo_atendimento, duracao_consulta
+                FROM disponibilidades_profissional
+                WHERE profissional_id IN ({marks}) AND ativo = 1
+                ORDER BY profissional_id, dia_semana, hora_inicio
+                """,
+                tuple(ativos),
+            )
+            for r in (await cur.fetchall()) or []:
+                window.schedule.setdefault(r["profissional_id"], {}).setdefault(r["dia_semana"], []).append(r)
+
+            await cur.execute(
+                f"""
+                SELECT profissional_id, data_consulta, hora_inicio, hora_fim
+                FROM agendamentos
+                WHERE profissional_id IN ({marks})
+                AND data_consulta BETWEEN %s AND %s
+                AND status IN (0, 1)  -- agendado ou confirmado
+                """,
+                (*ativos, data_inicio, data_fim),
+            )
+            for r in (await cur.fetchall()) or []:
+                start, end = to_minutes(r["hora_inicio"]), to_minutes(r["hora_fim"])
+                if start is not None and end is not None:
+                    window.bookings.setdefault((r["profissional_id"], r["data_consulta"]), []).append((start, end))
+
+            await cur.execute(
+                f"""
+                SELECT profissional_id, data_inicio, data_fim, hora_inicio, hora_fim
+                FROM bloqueios_agenda
+                WHERE (profissional_id IN ({marks}) OR profissional_id IS NULL)
+                AND data_inicio <= %s AND data_fim >= %s
+                AND ativo = 1
+                """,
+                (*ativos, data_fim, data_inicio),
+            )
+            for r in (await cur.fetchall()) or []:
+                window.add_block(r["profissional_id"], r["data_inicio"], r["data_fim"], r["hora_inicio"], r["hora_fim"])
+        return window
+
+    def add_block(self, profissional_id: Optional[int], data_inicio: date, data_fim: date, hora_inicio: Any, hora_fim: Any) -> None:
+        start, end = to_minutes(hora_inicio), to_minutes(hora_fim)
+        interval = (start if start is not None else _FULL_DAY[0], end if end is not None else _FULL_DAY[1])
+        for day in _daterange(max(data_inicio, self.data_inicio), min(data_fim, self.data_fim)):
+            self.blocks.setdefault((profissional_id, day), []).append(interval)
+
+    def busy(self, profissional_id: int, day: date) -> List[Interval]:
+        """Agendamentos ativos + bloqueios do profissional e gerais no dia."""
+        return (
+            self.bookings.get((profissional_id, day), [])
+            + self.blocks.get((profissional_id, day), [])
+            + self.blocks.get((None, day), [])
+        )
+
+    def day_rows(self, profissional_id: int, day: date, tipo_atendimento: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Disponibilidades do dia da semana compatíveis com o tipo de atendimento."""
+        rows = self.schedule.get(profissional_id, {}).get(day.isoweekday(), [])
+        return [r for r in rows if tipo_compativel(tipo_atendimento, r["tipo_atendimento"])]
+
+    def iter_day_slots(
+        self,
+        profissional_id: int,
+        day: date,
+        tipo_atendimento: Optional[str] = None,
+        not_before: Optional[int] = None,
+    ) -> Iterable[Tuple[int, int, int]]:
+        """
+        Slots livres do dia como (inicio, fim, duracao) em minutos, em ordem de início.
+        `not_before` descarta slots que começam antes desse minuto (ex.: hoje, hora atual).
+        """
+        rows = self.day_rows(profissional_id, day, tipo_atendimento)
+        if not rows:
+            return
+        occupied = self.busy(profissional_id, day)
+        if len(rows) == 1:
+            yield from _row_slots(rows[0], occupied, not_before)
+        else:
+            # Mais de um expediente no mesmo dia (ex.: manhã e tarde em linhas separadas)
+            yield from sorted(slot for r in rows for slot in _row_slots(r, occupied, not_before))
+
+    def day_summary(
+        self,
+        profissional_id: int,
+        day: date,
+        tipo_atendimento: Optional[str] = None,
+        not_before: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Resultado compacto de um dia: horários de início e a duração da consulta."""
+        return summarize_day(day, list(self.iter_day_slots(profissional_id, day, tipo_atendimento, not_before)))
+
+
+def summarize_day(day: date, slots: Sequence[Tuple[int, int, int]]) -> Dict[str, Any]:
+    """Formato de dia de `/api/slots-disponiveis/periodo` a partir de (inicio, fim, duracao)."""
+    durations = {d for _, _, d in slots}
+    # Duração única no dia: só os inícios; durações diferentes: "inicio-fim"
+    uniform = len(durations) <= 1
+    return {
+        "data": day.isoformat(),
+        "dia_semana": day.isoweekday(),
+        "duracao_consulta": next(iter(durations)) if len(durations) == 1 else None,
+        "slots": [format_minutes(s) if uniform else f"{format_minutes(s)}-{format_minutes(e)}" for s, e, _ in slots],
+    }
+
+
+def _same_term(a: str, b: str) -> bool:
+    """"dermatologista" ~ "dermatologia", "psicóloga" ~ "psicologia": prefixo comum longo."""
+    common = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        common += 1
+    return common >= 5 and common >= min(len(a), len(b)) - 3
+
+
+def especialidade_match(consulta: str, especialidade: Optional[str]) -> bool:
+    termos = tokenize(especialidade or "")
+    return any(any(_same_term(q, t) for t in termos) for q in tokenize(consulta) if len(q) >= 4)
+
+
+async def candidate_professionals(db, especialidade: Optional[str] = None, servico_id: Optional[int] = None) -> List[int]:
+    """
+    Profissionais ativos que atendem a especialidade (comparação sem acento, tolerante a
+    variações como "dermatologista"/"dermatologia") e/ou que já realizaram o serviço
+    (agendamentos com `servico_id`). Duas consultas no máximo.
+    """
+    async with db.cursor() as cur:
+        await cur.execute("SELECT id, especialidade FROM profissionais WHERE ativo = 1 ORDER BY id")
+        rows = (await cur.fetchall()) or []
+        ids = [r["id"] for r in rows if not especialidade or especialidade_match(especialidade, r["especialidade"])]
+        if servico_id is not None and ids:
+            await cur.execute("SELECT DISTINCT profissional_id FROM agendamentos WHERE servico_id = %s", (servico_id,))
+            atendem = {r["profissional_id"] for r in (await cur.fetchall()) or []}
+            ids = [pid for pid in ids if pid in atendem]
+    return ids
+
+
+async def find_next_available(
+    db,
+    profissional_ids: Sequence[int],
+    data_inicio: date,
+    dias: int,
+    quantidade: int,
+    tipo_atendimento: Optional[str] = None,
+    not_before: Optional[int] = None,
+    max_por_profissional: Optional[int] = None,
+    bloco_dias: int = 7,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Primeiros `quantidade` slots livres entre os profissionais, em ordem cronológica.
+    Os dias são percorridos em ordem; em cada dia, uma fila de prioridade (heap) guarda o
+    próximo slot de cada profissional e entrega sempre o mais cedo, avançando só o gerador
+    de quem saiu. A busca para assim que encontra `quantidade` slots. Os dados vêm em blocos
+    de `bloco_dias` dias (quatro consultas por bloco), então o número de consultas depende
+    só do horizonte, e não do número de profissionais.
+    `not_before` vale só para `data_inicio` (ex.: hoje, a partir da hora atual).
+    """
+    found: List[Dict[str, Any]] = []
+    stats = {"blocos": 0, "dias_pesquisados": 0}
+    if not profissional_ids or quantidade <= 0 or dias <= 0:
+        return found, stats
+    por_profissional: Dict[int, int] = {}
+    data_fim = data_inicio + timedelta(days=dias - 1)
+    bloco_inicio = data_inicio
+    while bloco_inicio <= data_fim and len(found) < quantidade:
+        bloco_fim = min(data_fim, bloco_inicio + timedelta(days=max(1, bloco_dias) - 1))
+        window = await AvailabilityWindow.load(db, profissional_ids, bloco_inicio, bloco_fim)
+        stats["blocos"] += 1
+        ativos = [pid for pid in profissional_ids if pid in window.profissionais]
+        if not ativos:
+            break
+        dia = bloco_inicio
+        while dia <= bloco_fim and len(found) < quantidade:
+            stats["dias_pesquisados"] += 1
+            limite = not_before if dia == data_inicio else None
+            heap: List[Tuple[int, int, int, int, Iterator[Tuple[int, int, int]]]] = []
+            for ordem, pid in enumerate(ativos):
+                if max_por_profissional and por_profissional.get(pid, 0) >= max_por_profissional:
+                    continue
+                slots = iter(window.iter_day_slots(pid, dia, tipo_atendimento, limite))
+                first = next(slots, None)
+                if first is not None:
+                    heap.append((first[0], ordem, first[1], first[2], slots))
+            heapq.heapify(heap)
+            while heap and len(found) < quantidade:
+                inicio, ordem, fim, duracao, slots = heapq.heappop(heap)
+                pid = ativos[ordem]
+                info = window.profissionais[pid]
+                found.append({
+                    "profissional_id": pid,
+                    "profissional_nome": info["nome"],
+                    "especialidade": info.get("especialidade"),
+                    "data": dia.isoformat(),
+                    "inicio": format_minutes(inicio),
+                    "fim": format_minutes(fim),
+                    "duracao_consulta": duracao,
+                })
+                por_profissional[pid] = por_profissional.get(pid, 0) + 1
+                if max_por_profissional and por_profissional[pid] >= max_por_profissional:
+                    continue
+                nxt = next(slots, None)
+                if nxt is not None:
+                    heapq.heappush(heap, (nxt[0], ordem, nxt[1], nxt[2], slots))
+            dia += timedelta(days=1)
+        bloco_inicio = bloco_fim + timedelta(days=1)
+    return found, stats
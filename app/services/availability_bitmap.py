@@ -0,0 +1,204 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..core.invalidation import on_change
+from .availability import AvailabilityWindow, tipo_compativel
+from .slot_engine import MINUTES_PER_DAY, Interval, to_minutes
+
+
+def _bits(first: int, last: int) -> int:
+    """Bits [first, last) ligados."""
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+class AvailabilityBitmaps:
+    """
+    Agenda de cada profissional em bits, em memória, para responder "o profissional X está
+    livre das T às T+d?" sem ir ao banco. Cada bit é um bloco de AGENDA_BITMAP_RESOLUCAO_MIN
+    minutos (5) do dia, em um `int` do Python (288 bits por dia):
+    - modelo semanal: por dia da semana, os expedientes de `disponibilidades_profissional`
+      (sem o intervalo de descanso), um bitmap por tipo de atendimento;
+    - sobreposição por data: agendamentos ativos + bloqueios do profissional e gerais.
+    Livre = expediente & ~ocupado; checar um horário é um AND, e o primeiro horário livre de
+    uma duração sai de deslocamentos e ANDs. Horas fora da grade são arredondadas a favor de
+    não conflitar (expediente para dentro, ocupações para fora).
+    Os dados de vários profissionais/dias vêm de `AvailabilityWindow.load` (quatro consultas);
+    gravações em agendamentos, bloqueios, disponibilidades ou profissionais invalidam só o
+    que mudou (notify_change). Gravações de outros processos (outros workers, painel, sync do
+    Google) não passam por aqui: cada profissional-dia é recarregado depois de
+    AGENDA_BITMAP_TTL_SEGUNDOS (15). No máximo AGENDA_BITMAP_MAX_DIAS profissionais-dia em memória.
+    """
+
+    def __init__(self) -> None:
+        self.resolution = max(1, int(os.getenv("AGENDA_BITMAP_RESOLUCAO_MIN", "5")))
+        self.max_days = int(os.getenv("AGENDA_BITMAP_MAX_DIAS", "20000"))
+        self.ttl = float(os.getenv("AGENDA_BITMAP_TTL_SEGUNDOS", "15"))
+        self.slots_per_day = -(-MINUTES_PER_DAY // self.resolution)
+        # profissional_id -> dia_semana -> [(tipo_atendimento, bitmap do expediente)]; {} = inativo
+        self._templates: Dict[int, Dict[int, List[Tuple[str, int]]]] = {}
+        # (profissional_id, data) -> bitmap ocupado (agendamentos + bloqueios)
+        self._overlays: "OrderedDict[Tuple[int, date], int]" = OrderedDict()
+        # Momento (monotonic) da carga do modelo de cada profissional; o dos dias vai junto
+        self._loaded_at: Dict[int, float] = {}
+        self._overlay_loaded_at: Dict[Tuple[int, date], float] = {}
+        # Incrementado a cada invalidação: uma carga que cruzou uma gravação é refeita
+        self._generation = 0
+        self._stats: Dict[str, int] = {"checks": 0, "loads": 0, "invalidations": 0, "expired": 0}
+        on_change(["agendamentos", "bloqueios_agenda", "disponibilidades_profissional", "profissionais"], self.invalidate)
+
+    # ===== Conversão minutos <-> bits =====
+    def _inner(self, start: int, end: int) -> int:
+        res = self.resolution
+        return _bits(-(-start // res), end // res)
+
+    def _outer(self, start: int, end: int) -> int:
+        res = self.resolution
+        return _bits(start // res, min(-(-end // res), self.slots_per_day))
+
+    def _busy_bits(self, intervals: Sequence[Interval]) -> int:
+        mask = 0
+        for start, end in intervals:
+            mask |= self._outer(start, end)
+        return mask
+
+    # ===== Invalidação =====
+    def invalidate(self, table: str, **info: Any) -> None:
+        self._generation += 1
+        self._stats["invalidations"] += 1
+        profissional_id = info.get("profissional_id")
+        inicio = info.get("data") or info.get("data_inicio")
+        fim = info.get("data") or info.get("data_fim") or inicio
+        if table in ("disponibilidades_profissional", "profissionais"):
+            if profissional_id is None:
+                self._templates.clear()
+                self._loaded_at.clear()
+            else:
+                self._templates.pop(profissional_id, None)
+                self._loaded_at.pop(profissional_id, None)
+            if table == "disponibilidades_profissional":
+                return
+        for key in list(self._overlays):
+            pid, dia = key
+            if profissional_id is not None and pid != profissional_id:
+                continue
+            if inicio is not None and not (inicio <= dia <= fim):
+                continue
+            del self._overlays[key]
+            self._overlay_loaded_at.pop(key, None)
+
+    # ===== Carga =====
+    async def ensure(self, db, profissional_ids: Sequence[int], data_inicio: date, data_fim: date) -> None:
+        """Carrega (em uma janela só) o que faltar dos profissionais no período."""
+        dias = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+        limite = time.monotonic() - self.ttl
+        faltando = [
+            pid for pid in dict.fromkeys(profissional_ids)
+            if self._loaded_at.get(pid, limite) <= limite
+            or any(self._overlay_loaded_at.get((pid, dia), limite) <= limite for dia in dias)
+        ]
+        self._stats["expired"] += sum(1 for pid in faltando if pid in self._loaded_at and self._loaded_at[pid] <= limite)
+        if not faltando or not dias:
+            return
+        for _ in range(3):
+            generation = self._generation
+            window = await AvailabilityWindow.load(db, faltando, data_inicio, data_fim)
+            self._stats["loads"] += 1
+            # Gravação durante a carga: o resultado pode ter perdido a mudança, carrega de novo
+            if generation == self._generation:
+                break
+        self._store(window, faltando, dias)
+
+    def _store(self, window: AvailabilityWindow, profissional_ids: Sequence[int], dias: Sequence[date]) -> None:
+        agora = time.monotonic()
+        for pid in profissional_ids:
+            template: Dict[int, List[Tuple[str, int]]] = {}
+            if pid in window.profissionais:
+                for dia_semana, rows in window.schedule.get(pid, {}).items():
+                    for row in rows:
+                        start, end = to_minutes(row["hora_inicio"]), to_minutes(row["hora_fim"])
+                        if start is None or end is None or row["tipo_atendimento"] == "indisponivel":
+                            continue
+                        mask = self._inner(start, end)
+                        pause_start, pause_end = to_minutes(row["intervalo_inicio"]), to_minutes(row["intervalo_fim"])
+                        if pause_start is not None and pause_end is not None:
+                            mask &= ~self._outer(pause_start, pause_end)
+                        template.setdefault(dia_semana, []).append((row["tipo_atendimento"], mask))
+            self._templates[pid] = template
+            self._loaded_at[pid] = agora
+            for dia in dias:
+                key = (pid, dia)
+                self._overlays[key] = self._busy_bits(window.busy(pid, dia))
+                self._overlays.move_to_end(key)
+                self._overlay_loaded_at[key] = agora
+        while len(self._overlays) > self.max_days:
+            key, _ = self._overlays.popitem(last=False)
+            self._overlay_loaded_at.pop(key, None)
+
+    # ===== Consultas =====
+    def free_bits(self, profissional_id: int, dia: date, tipo_atendimento: Optional[str] = None) -> int:
+        """Blocos livres do dia (expediente compatível com o tipo, menos o ocupado); exige `ensure`."""
+        work = 0
+        for tipo, mask in self._templates.get(profissional_id, {}).get(dia.isoweekday(), []):
+            if tipo_compativel(tipo_atendimento, tipo):
+                work |= mask
+        return work & ~self._overlays.get((profissional_id, dia), 0)
+
+    def is_free(self, profissional_id: int, dia: date, inicio: int, fim: int, tipo_atendimento: Optional[str] = None) -> bool:
+        """[inicio, fim) em minutos cabe inteiro em blocos livres."""
+        self._stats["checks"] += 1
+        wanted = self._outer(inicio, fim)
+        return bool(wanted) and self.free_bits(profissional_id, dia, tipo_atendimento) & wanted == wanted
+
+    def first_free(
+        self,
+        profissional_id: int,
+        dia: date,
+        duracao: int,
+        tipo_atendimento: Optional[str] = None,
+        not_before: int = 0,
+    ) -> Optional[int]:
+        """Primeiro minuto (na grade da resolução) a partir de `not_before` com `duracao` minutos livres."""
+        n = -(-duracao // self.resolution)
+        runs = self.free_bits(profissional_id, dia, tipo_atendimento) & ~_bits(0, -(-not_before // self.resolution))
+        # Bit i continua ligado só se i..i+n-1 estão livres (deslocamentos dobrando: log2(n) ANDs)
+        covered = 1
+        while covered < n and runs:
+            shift = min(covered, n - covered)
+            runs &= runs >> shift
+            covered += shift
+        if not runs:
+            return None
+        return ((runs & -runs).bit_length() - 1) * self.resolution
+
+    async def check_many(
+        self,
+        db,
+        profissional_ids: Sequence[int],
+        data_inicio: date,
+        data_fim: date,
+        inicio: int,
+        fim: int,
+        tipo_atendimento: Optional[str] = None,
+    ) -> Dict[int, Dict[date, bool]]:
+        """O mesmo horário em vários profissionais e dias: uma carga e um AND por profissional-dia."""
+        await self.ensure(db, profissional_ids, data_inicio, data_fim)
+        dias = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+        return {
+            pid: {dia: self.is_free(pid, dia, inicio, fim, tipo_atendimento) for dia in dias}
+            for pid in dict.fromkeys(profissional_ids)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "resolution_minutes": self.resolution,
+            "ttl_seconds": self.ttl,
+            "professionals": len(self._templates),
+            "professional_days": len(self._overlays),
+        }
+
+
+availability_bitmaps = AvailabilityBitmaps()
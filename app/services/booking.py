@@ -0,0 +1,168 @@
+import time as _time
+from datetime import date, time
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.db import is_postgres_connection
+from .availability import AvailabilityWindow
+from .slot_engine import to_minutes
+
+try:
+    from psycopg import errors as pg_errors
+except Exception:
+    pg_errors = None
+
+
+# Criada por scripts/create_scheduling_tables.py (EXCLUDE USING gist sobre tsrange)
+EXCLUSION_CONSTRAINT = "agendamentos_sem_sobreposicao"
+# Primeira chave de pg_advisory_xact_lock(int, int) quando a constraint não existe
+_ADVISORY_NAMESPACE = 5301
+
+
+class BookingConflict(Exception):
+    """
+    Reserva recusada por conflito de agenda, com o motivo para quem chama oferecer outros
+    horários: "ocupado" (outro agendamento ativo sobreposto), "bloqueado", "intervalo",
+    "fora_do_expediente" ou "em_andamento" (outra reserva do mesmo profissional segura o lock).
+    """
+
+    def __init__(self, reason: str, message: str) -> None:
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+
+
+def validate_slot(
+    window: AvailabilityWindow,
+    profissional_id: int,
+    dia: date,
+    inicio: int,
+    duracao: Optional[int],
+    tipo_atendimento: Optional[str],
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Expediente do dia que comporta [inicio, inicio + duracao) (minutos; sem duração, a
+    `duracao_consulta` do expediente) e o minuto de fim. BookingConflict se o horário cair fora
+    do expediente, no intervalo ou em bloqueio. Outros agendamentos ficam para o INSERT.
+    """
+    bloqueios = window.blocks.get((profissional_id, dia), []) + window.blocks.get((None, dia), [])
+    for row in window.day_rows(profissional_id, dia, tipo_atendimento):
+        start, end = to_minutes(row["hora_inicio"]), to_minutes(row["hora_fim"])
+        fim = inicio + (duracao or row["duracao_consulta"] or 60)
+        if start is None or end is None or inicio < start or fim > end:
+            continue
+        pause_start, pause_end = to_minutes(row["intervalo_inicio"]), to_minutes(row["intervalo_fim"])
+        if pause_start is not None and pause_end is not None and pause_start < fim and pause_end > inicio:
+            raise BookingConflict("intervalo", "Horário no intervalo do profissional")
+        if any(s < fim and e > inicio for s, e in bloqueios):
+            raise BookingConflict("bloqueado", "Agenda bloqueada neste horário")
+        return row, fim
+    raise BookingConflict("fora_do_expediente", "Horário fora do expediente do profissional")
+
+
+class BookingService:
+    """
+    Criação de agendamentos segura sob concorrência, decidida no INSERT:
+    - PostgreSQL: a constraint de exclusão `agendamentos_sem_sobreposicao` (profissional_id =,
+      tsrange(data + hora_inicio, data + hora_fim) &&, só status 0/1) recusa a segunda reserva
+      do mesmo horário; ExclusionViolation vira BookingConflict("ocupado"). Sem a constraint
+      (script ainda não aplicado), serializa por profissional com pg_advisory_xact_lock e
+      confere a sobreposição na mesma transação.
+    - MySQL: GET_LOCK por profissional + conferência + INSERT.
+    Expediente, intervalo e bloqueios ficam em `validate_slot`, antes (não cabem na constraint).
+    """
+
+    def __init__(self) -> None:
+        self._constraint: Optional[bool] = None
+        self._constraint_checked_at = 0.0
+        self._stats: Dict[str, int] = {"reserved": 0, "insert_conflicts": 0, "locked_fallback": 0}
+
+    async def _has_constraint(self, db) -> bool:
+        # Encontrada uma vez, fica; ausente, confere de novo a cada 5 minutos
+        if self._constraint or (self._constraint is False and _time.monotonic() - self._constraint_checked_at < 300):
+            return bool(self._constraint)
+        async with db.cursor() as cur:
+            await cur.execute("SELECT 1 AS ok FROM pg_constraint WHERE conname = %s", (EXCLUSION_CONSTRAINT,))
+            self._constraint = bool(await cur.fetchone())
+        self._constraint_checked_at = _time.monotonic()
+        if not self._constraint:
+            print(f"[Booking] constraint {EXCLUSION_CONSTRAINT} ausente; usando lock por profissional")
+        return self._constraint
+
+    @staticmethod
+    async def _assert_free(cur, profissional_id: int, data: date, inicio: time, fim: time) -> None:
+        await cur.execute(
+            """
+            SELECT id FROM agendamentos
+            WHERE profissional_id = %s AND data_consulta = %s AND status IN (0, 1)
+            AND hora_inicio < %s AND hora_fim > %s
+            LIMIT 1
+            """,
+            (profissional_id, data, fim, inicio),
+        )
+        if await cur.fetchone():
+            raise BookingConflict("ocupado", "Horário já reservado")
+
+    async def reserve(
+        self,
+        db,
+        profissional_id: int,
+        data: date,
+        inicio: time,
+        fim: time,
+        tipo_atendimento: str,
+        cliente_id: Optional[int] = None,
+        servico_id: Optional[int] = None,
+        observacao: Optional[str] = None,
+    ) -> int:
+        """Insere o agendamento (status 0) e devolve o id; BookingConflict se o horário foi tomado."""
+        params = (cliente_id, profissional_id, servico_id, data, inicio, fim, tipo_atendimento, observacao)
+        insert = """
+            INSERT INTO agendamentos
+            (cliente_id, profissional_id, servico_id, data_consulta, hora_inicio, hora_fim, tipo_atendimento, status, observacao)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 0, %s)
+        """
+        try:
+            if is_postgres_connection(db):
+                agendamento_id = await self._reserve_postgres(db, insert, params, profissional_id, data, inicio, fim)
+            else:
+                agendamento_id = await self._reserve_mysql(db, insert, params, profissional_id, data, inicio, fim)
+        except BookingConflict:
+            self._stats["insert_conflicts"] += 1
+            raise
+        self._stats["reserved"] += 1
+        return agendamento_id
+
+    async def _reserve_postgres(self, db, insert: str, params: tuple, profissional_id: int, data: date, inicio: time, fim: time) -> int:
+        locked = not await self._has_constraint(db)
+        try:
+            async with db.transaction():
+                async with db.cursor() as cur:
+                    if locked:
+                        self._stats["locked_fallback"] += 1
+                        await cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (_ADVISORY_NAMESPACE, profissional_id))
+                        await self._assert_free(cur, profissional_id, data, inicio, fim)
+                    await cur.execute(insert + " RETURNING id", params)
+                    return (await cur.fetchone())["id"]
+        except Exception as e:
+            if pg_errors is not None and isinstance(e, pg_errors.ExclusionViolation):
+                raise BookingConflict("ocupado", "Horário já reservado") from e
+            raise
+
+    async def _reserve_mysql(self, db, insert: str, params: tuple, profissional_id: int, data: date, inicio: time, fim: time) -> int:
+        lock_name = f"agendamentos:{profissional_id}"
+        async with db.cursor() as cur:
+            await cur.execute("SELECT GET_LOCK(%s, %s) AS ok", (lock_name, 5))
+            if not (await cur.fetchone() or {}).get("ok"):
+                raise BookingConflict("em_andamento", "Outra reserva deste profissional está em andamento, tente novamente")
+            try:
+                await self._assert_free(cur, profissional_id, data, inicio, fim)
+                await cur.execute(insert, params)
+                return cur.lastrowid
+            finally:
+                await cur.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "exclusion_constraint": self._constraint}
+
+
+booking_service = BookingService()
@@ -0,0 +1,236 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.db import async_db, is_postgres_connection
+
+
+_MESSAGE_COLUMNS = "(conversation_id, role, content)"
+_MESSAGE_COLUMNS_TOKENS = "(conversation_id, role, content, tokens_prompt, tokens_completion)"
+_CONVERSAS_COLUMNS = "(session_id, mensagem_usuario, resposta_agente, tokens_prompt, tokens_completion)"
+
+
+def _multi_row_insert(table: str, columns: str, rows: List[Tuple[Any, ...]]) -> Tuple[str, List[Any]]:
+    """Monta um único INSERT com várias linhas em VALUES (uma ida ao banco por lote)."""
+    width = len(rows[0])
+    placeholders = "(" + ", ".join(["%s"] * width) + ")"
+    params: List[Any] = []
+    for row in rows:
+        params.extend(row)
+    return f"INSERT INTO {table} {columns} VALUES " + ", ".join([placeholders] * len(rows)), params
+
+
+@asynccontextmanager
+async def _transaction(db) -> AsyncIterator[None]:
+    """Transação explícita nas conexões em autocommit (psycopg ou PyMySQL em thread)."""
+    if is_postgres_connection(db):
+        async with db.transaction():
+            yield
+        return
+    async with db.cursor() as cur:
+        await cur.execute("START TRANSACTION")
+    try:
+        yield
+    except BaseException:
+        await db.rollback()
+        raise
+    await db.commit()
+
+
+class ChatWriter:
+    """
+    Persistência das mensagens do chat (`conversation_messages`) e da tabela legado `conversas`.
+    - CHAT_PERSISTENCE_MODE=sync (padrão): cada linha é gravada na hora, na conexão da requisição.
+    - CHAT_PERSISTENCE_MODE=buffered: write-behind; as linhas vão para um buffer em memória e são
+      gravadas em INSERTs multi-linha quando o lote atinge CHAT_WRITE_BATCH_SIZE, a cada
+      CHAT_WRITE_FLUSH_MS e no shutdown. Quem lê essas tabelas logo após um turno
+      (feedback/rewrite, janela do chat) chama `flush()` antes.
+    Cada flush é uma transação: falhou, nada foi gravado e o lote volta ao buffer. Depois de
+    CHAT_WRITE_MAX_ATTEMPTS falhas seguidas o lote é gravado linha a linha, e as linhas que
+    ainda falham são descartadas e registradas no log (uma linha ruim não trava o buffer).
+    Com CHAT_WRITE_MAX_PENDING linhas pendentes, uma linha nova primeiro grava o acumulado (a
+    ordem dos ids de `conversation_messages`, usada pela janela e pelo resumo, é mantida). Se o
+    buffer continuar cheio (lote falhando), ela vai direto na conexão da requisição, como no
+    modo sync, e pode ficar com id menor que o das pendentes.
+    """
+
+    def __init__(self) -> None:
+        self.mode = os.getenv("CHAT_PERSISTENCE_MODE", "sync").strip().lower()
+        self.batch_size = max(1, int(os.getenv("CHAT_WRITE_BATCH_SIZE", "50")))
+        self.flush_interval = float(os.getenv("CHAT_WRITE_FLUSH_MS", "200")) / 1000.0
+        self.max_pending = max(self.batch_size, int(os.getenv("CHAT_WRITE_MAX_PENDING", "5000")))
+        self.max_attempts = max(1, int(os.getenv("CHAT_WRITE_MAX_ATTEMPTS", "3")))
+        self._messages: List[Tuple[Any, ...]] = []
+        self._conversas: List[Tuple[Any, ...]] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        # Falhas seguidas do lote que está no início do buffer
+        self._failures = 0
+        self._stats: Dict[str, int] = {
+            "buffered_rows": 0,
+            "flushes": 0,
+            "flushed_rows": 0,
+            "flush_errors": 0,
+            "overflow_rows": 0,
+            "dropped_rows": 0,
+        }
+
+    @property
+    def buffered(self) -> bool:
+        return self.mode == "buffered"
+
+    async def start(self) -> None:
+        if self.buffered and self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def add_message(self, db, conversation_id: int, role: str, content: str, tokens: Optional[Dict[str, int]] = None) -> None:
+        if tokens:
+            row: Tuple[Any, ...] = (conversation_id, role, content, tokens.get("prompt_tokens"), tokens.get("completion_tokens"))
+        else:
+            row = (conversation_id, role, content)
+        columns = _MESSAGE_COLUMNS_TOKENS if tokens else _MESSAGE_COLUMNS
+        await self._add(db, "conversation_messages", columns, row)
+
+    async def add_conversa(self, db, session_id: str, user_message: str, reply: str, tokens: Dict[str, int]) -> None:
+        row = (session_id, user_message, reply, tokens.get("prompt_tokens"), tokens.get("completion_tokens"))
+        await self._add(db, "conversas", _CONVERSAS_COLUMNS, row)
+
+    async def flush(self) -> None:
+        """
+        Grava tudo o que está no buffer (no-op no modo sync ou com buffer vazio). A gravação roda
+        em task própria (`asyncio.shield`): cancelar quem chamou (cliente SSE que desconectou,
+        `stop()` parando o flush periódico) não interrompe o lote. Um flush em andamento segura o
+        lock, então quem chama depois espera ele terminar.
+        """
+        if not (self._messages or self._conversas) and not (self._lock is not None and self._lock.locked()):
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        await asyncio.shield(self._flush_locked())
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "mode": self.mode, "pending_rows": len(self._messages) + len(self._conversas)}
+
+    # ===== Helpers internos =====
+    def _pending(self) -> int:
+        return len(self._messages) + len(self._conversas)
+
+    async def _add(self, db, table: str, columns: str, row: Tuple[Any, ...]) -> None:
+        if self.buffered and self._pending() >= self.max_pending:
+            # Grava o acumulado antes: linhas novas não passam à frente das pendentes (ordem dos ids)
+            await self.flush()
+        if not self.buffered or self._pending() >= self.max_pending:
+            if self.buffered:
+                self._stats["overflow_rows"] += 1
+            sql, params = _multi_row_insert(table, columns, [row])
+            async with db.cursor() as cur:
+                await cur.execute(sql, params)
+            return
+        # Lista atual (o flush troca as listas do buffer)
+        (self._messages if table == "conversation_messages" else self._conversas).append(row)
+        await self._after_add()
+
+    async def _flush_locked(self) -> None:
+        async with self._lock:
+            messages, self._messages = self._messages, []
+            conversas, self._conversas = self._conversas, []
+            try:
+                if messages or conversas:
+                    await self._write_batch(messages, conversas)
+            finally:
+                # O que não foi gravado (rollback, banco fora, cancelamento) volta ao início do buffer
+                self._messages[:0] = messages
+                self._conversas[:0] = conversas
+
+    async def _write_batch(self, messages: List[Tuple[Any, ...]], conversas: List[Tuple[Any, ...]]) -> None:
+        """Grava o lote numa transação; o que foi gravado sai das listas (o resto volta ao buffer)."""
+        try:
+            async with async_db() as db:
+                async with _transaction(db):
+                    async with db.cursor() as cur:
+                        # Mantém a ordem de chegada; agrupa linhas consecutivas com o mesmo formato
+                        for columns, rows in self._group_messages(messages):
+                            sql, params = _multi_row_insert("conversation_messages", columns, rows)
+                            await cur.execute(sql, params)
+                        if conversas:
+                            sql, params = _multi_row_insert("conversas", _CONVERSAS_COLUMNS, conversas)
+                            await cur.execute(sql, params)
+                # Commit feito: sem await até esvaziar as listas, para nada voltar ao buffer
+                self._failures = 0
+                self._stats["flushes"] += 1
+                self._stats["flushed_rows"] += len(messages) + len(conversas)
+                messages.clear()
+                conversas.clear()
+        except Exception as e:
+            if not (messages or conversas):
+                return
+            self._failures += 1
+            self._stats["flush_errors"] += 1
+            print(
+                f"[ChatWriter] falha ao gravar lote ({len(messages) + len(conversas)} linhas, "
+                f"{self._failures} falha(s) seguida(s)): {e}"
+            )
+            if self._failures >= self.max_attempts:
+                await self._write_rows(messages, conversas)
+
+    async def _write_rows(self, messages: List[Tuple[Any, ...]], conversas: List[Tuple[Any, ...]]) -> None:
+        """
+        Grava o lote linha a linha (autocommit), descartando e registrando as que falham. Cada
+        linha sai da lista ao ser gravada ou descartada; sem conexão, o lote fica para o buffer.
+        """
+        try:
+            async with async_db() as db:
+                self._failures = 0
+                for table, rows in (("conversation_messages", messages), ("conversas", conversas)):
+                    while rows:
+                        row = rows[0]
+                        if table == "conversas":
+                            columns = _CONVERSAS_COLUMNS
+                        else:
+                            columns = _MESSAGE_COLUMNS_TOKENS if len(row) == 5 else _MESSAGE_COLUMNS
+                        sql, params = _multi_row_insert(table, columns, [row])
+                        try:
+                            async with db.cursor() as cur:
+                                await cur.execute(sql, params)
+                            self._stats["flushed_rows"] += 1
+                        except Exception as e:
+                            self._stats["dropped_rows"] += 1
+                            print(f"[ChatWriter] linha descartada em {table} {columns}: {row!r} ({e})")
+                        rows.pop(0)
+        except Exception as e:
+            print(f"[ChatWriter] falha ao gravar linha a linha: {e}")
+
+    @staticmethod
+    def _group_messages(rows: List[Tuple[Any, ...]]) -> List[Tuple[str, List[Tuple[Any, ...]]]]:
+        groups: List[Tuple[str, List[Tuple[Any, ...]]]] = []
+        for row in rows:
+            columns = _MESSAGE_COLUMNS_TOKENS if len(row) == 5 else _MESSAGE_COLUMNS
+            if groups and groups[-1][0] == columns:
+                groups[-1][1].append(row)
+            else:
+                groups.append((columns, [row]))
+        return groups
+
+    async def _after_add(self) -> None:
+        self._stats["buffered_rows"] += 1
+        if len(self._messages) + len(self._conversas) >= self.batch_size:
+            await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[ChatWriter] erro no flush periódico: {e}")
+
+
+chat_writer = ChatWriter()
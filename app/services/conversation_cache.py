@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+def _size_of(text: Optional[str]) -> int:
+    return len(text.encode("utf-8")) if text else 0
+
+
+class ConversationContext:
+    """Estado quente de uma sessão: id da conversa, resumo, fatos do usuário e janela das últimas mensagens."""
+
+    __slots__ = ("session_id", "conversation_id", "summary", "facts", "messages", "size")
+
+    def __init__(self, session_id: str, conversation_id: int, summary: Optional[str], messages: List[Dict[str, str]], window_size: int, facts: Optional[Dict[str, Any]] = None) -> None:
+        self.session_id = session_id
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.facts: Dict[str, Any] = facts if facts is not None else {}
+        self.messages: Deque[Dict[str, str]] = deque(messages[-window_size:], maxlen=window_size)
+        self.size = 0
+        self.recompute_size()
+
+    def recompute_size(self) -> int:
+        self.size = (
+            _size_of(self.session_id)
+            + _size_of(self.summary)
+            + (_size_of(json.dumps(self.facts, ensure_ascii=False)) if self.facts else 0)
+            + sum(_size_of(m.get("content")) for m in self.messages)
+        )
+        return self.size
+
+    def window(self) -> List[Dict[str, str]]:
+        return list(self.messages)
+
+
+class ConversationCache:
+    """
+    LRU em memória do contexto do chat por `session_id`, limitado por número de sessões
+    (CHAT_CACHE_MAX_SESSIONS) e por bytes (CHAT_CACHE_MAX_BYTES).
+    Atualizado em write-through: toda mensagem gravada em `conversation_messages` também
+    entra na janela em memória, então a janela não precisa ser relida a cada turno.
+    Os fatos (`facts`) são o mesmo dict atualizado por `conversation_facts.extract_facts`.
+    O cache é por processo: com vários workers, use afinidade de sessão (ou
+    CHAT_CACHE_MAX_SESSIONS=0 para desativar).
+    """
+
+    def __init__(self) -> None:
+        self.max_sessions = int(os.getenv("CHAT_CACHE_MAX_SESSIONS", "2000"))
+        self.max_bytes = int(os.getenv("CHAT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        self._entries: "OrderedDict[str, ConversationContext]" = OrderedDict()
+        self._by_conversation: Dict[int, str] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_sessions > 0
+
+    def get(self, session_id: str, window_size: int) -> Optional[ConversationContext]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(session_id)
+            # Janela configurada mudou: relê do banco
+            if entry is None or entry.messages.maxlen != window_size:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, session_id: str, conversation_id: int, summary: Optional[str], messages: List[Dict[str, str]], window_size: int, facts: Optional[Dict[str, Any]] = None) -> None:
+        if not self.enabled:
+            return
+        entry = ConversationContext(session_id, conversation_id, summary, messages, window_size, facts)
+        with self._lock:
+            self._remove(session_id)
+            self._entries[session_id] = entry
+            self._by_conversation[conversation_id] = session_id
+            self._bytes += entry.size
+            self._evict()
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return
+            entry.messages.append({"role": role, "content": content})
+            self._resize(entry)
+
+    def set_summary(self, conversation_id: int, summary: Optional[str]) -> None:
+        with self._lock:
+            session_id = self._by_conversation.get(conversation_id)
+            entry = self._entries.get(session_id) if session_id is not None else None
+            if entry is None:
+                return
+            entry.summary = summary
+            self._resize(entry)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "sessions": len(self._entries), "bytes": self._bytes}
+
+    # ===== Helpers internos (chamados com o lock) =====
+    def _resize(self, entry: ConversationContext) -> None:
+        before = entry.size
+        self._bytes += entry.recompute_size() - before
+        self._evict()
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._by_conversation.pop(entry.conversation_id, None)
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id = next(iter(self._entries))
+            self._remove(session_id)
+            self._stats["evictions"] += 1
+
+
+conversation_cache = ConversationCache()
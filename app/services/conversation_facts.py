@@ -0,0 +1,127 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from .text_normalize import normalize_text
+
+
+# Padrões compilados uma vez; aplicados só à mensagem nova do usuário
+_NAME_PATTERNS = [
+    re.compile(r"\bmeu nome é\s+([A-Za-zÀ-ÖØ-öø-ÿ]+)"),
+    re.compile(r"\beu sou\s+([A-Za-zÀ-ÖØ-öø-ÿ]+)"),
+    re.compile(r"\bchamo\-?me\s+([A-Za-zÀ-ÖØ-öø-ÿ]+)"),
+]
+_AGE_PATTERNS = [
+    re.compile(r"\btenho\s+(\d{1,3})\s+anos\b"),
+    re.compile(r"\bminha idade é\s+(\d{1,3})\b"),
+]
+# Sobre o texto normalizado (sem acento); "boa tarde" não conta como preferência
+_SHIFT_PATTERN = re.compile(r"\b(?:de|pela|pelo|a|na|no|periodo da|turno da|prefiro|prefiro a|prefiro de)\s+(manha|tarde|noite)\b")
+_SHIFT_LABELS = {"manha": "manhã", "tarde": "tarde", "noite": "noite"}
+_TITLES = {"dr", "dra", "doutor", "doutora", "prof", "profa"}
+
+
+def _name_variants(nome: str) -> List[str]:
+    """Formas normalizadas de um nome de profissional: completo e sem título (Dr./Dra.)."""
+    norm = normalize_text(nome)
+    words = norm.split()
+    while words and words[0] in _TITLES:
+        words = words[1:]
+    variants = {norm, " ".join(words)}
+    return [v for v in variants if len(v) >= 3]
+
+
+def _find_named(norm_message: str, names: Iterable[str]) -> Optional[str]:
+    """Primeiro nome (profissional/serviço) citado na mensagem normalizada."""
+    padded = f" {norm_message} "
+    for nome in names:
+        if not nome:
+            continue
+        for variant in _name_variants(nome):
+            if f" {variant} " in padded:
+                return nome
+    return None
+
+
+def extract_facts(message: str, facts: Dict[str, Any], snapshot: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Atualiza `facts` (in-place) com o que a mensagem do usuário revela: nome, idade, turno
+    preferido e profissional/serviço citados (comparados com o snapshot do painel).
+    Retorna True se algum fato mudou.
+    """
+    before = dict(facts)
+    lower = (message or "").lower()
+    # Nome
+    if "nome" in lower or "sou" in lower or "chamo" in lower:
+        for pat in _NAME_PATTERNS:
+            mt = pat.search(lower)
+            if mt:
+                facts["nome_usuario"] = mt.group(1).strip().title()
+                break
+    # Idade
+    if "anos" in lower or "idade" in lower:
+        for pat in _AGE_PATTERNS:
+            mt = pat.search(lower)
+            if mt:
+                try:
+                    facts["idade_usuario"] = int(mt.group(1))
+                except Exception:
+                    pass
+                break
+
+    norm = normalize_text(message)
+    # Turno
+    mt = _SHIFT_PATTERN.search(norm)
+    if mt:
+        facts["turno_preferido"] = _SHIFT_LABELS[mt.group(1)]
+    # Profissional/serviço escolhidos
+    if snapshot:
+        profissional = _find_named(norm, (p.get("nome") for p in snapshot.get("profissionais_ativos") or []))
+        if profissional:
+            facts["profissional"] = profissional
+        servico = _find_named(norm, (s.get("nome") for s in snapshot.get("servicos_ativos") or []))
+        if servico:
+            facts["servico"] = servico
+    return facts != before
+
+
+def facts_from_history(messages: List[Dict[str, str]], snapshot: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Reconstrói os fatos a partir da janela (conversas anteriores à coluna `facts`)."""
+    facts: Dict[str, Any] = {}
+    for m in messages:
+        if m.get("role") == "user":
+            extract_facts(m.get("content", ""), facts, snapshot)
+    return facts
+
+
+def facts_bullets(facts: Dict[str, Any]) -> str:
+    """Fatos no formato do bloco de contexto do prompt."""
+    labels = [
+        ("nome_usuario", "Nome do usuário"),
+        ("idade_usuario", "Idade do usuário"),
+        ("turno_preferido", "Turno preferido"),
+        ("profissional", "Profissional escolhido"),
+        ("servico", "Serviço escolhido"),
+    ]
+    return "\n".join(f"- {label}: {facts[key]}" for key, label in labels if key in facts)
+
+
+def parse_facts(raw: Any) -> Optional[Dict[str, Any]]:
+    """Valor da coluna `conversations.facts` (jsonb já decodificado ou texto) como dict."""
+    if raw is None:
+        return None
+    if isinstance(raw, dict):
+        return raw
+    try:
+        value = json.loads(raw)
+    except Exception:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+async def save_facts(db, conversation_id: int, facts: Dict[str, Any]) -> None:
+    async with db.cursor() as cur:
+        await cur.execute(
+            "UPDATE conversations SET facts = %s::jsonb WHERE id = %s",
+            (json.dumps(facts, ensure_ascii=False), conversation_id),
+        )
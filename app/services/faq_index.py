@@ -0,0 +1,260 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+from ..core.invalidation import on_change
+from .text_normalize import tokenize
+
+
+# Palavras sem valor de busca (já sem acento, como saem de `tokenize`)
+_STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das", "em", "no", "na",
+    "nos", "nas", "por", "pelo", "pela", "para", "pra", "com", "sem", "e", "ou", "que", "qual", "quais",
+    "se", "eu", "voce", "voces", "vcs", "vc", "me", "meu", "minha", "ao", "aos", "ser", "sao", "tem",
+    "ter", "ha", "como", "gostaria", "queria", "saber", "sobre", "oi", "ola", "bom", "boa", "favor",
+    "obrigado", "obrigada", "quanto", "quanta", "quantos", "quantas", "quero", "posso", "poderia",
+}
+
+
+def _terms(text: Optional[str]) -> List[str]:
+    """Tokens sem acento e sem stopwords, com plural simples reduzido ("consultas" -> "consulta")."""
+    out = []
+    for tok in tokenize(text or ""):
+        if tok in _STOPWORDS:
+            continue
+        if len(tok) > 4 and tok.endswith("s"):
+            tok = tok[:-1]
+        out.append(tok)
+    return out
+
+
+class FAQIndex:
+    """
+    Índice invertido (BM25) em memória sobre as FAQs ativas.
+    - Indexa pergunta + palavras_chave (com peso dobrado) + resposta.
+    - Carregado por completo na primeira busca; depois, cada gravação no painel
+      (`notify_change("faq", id=...)`) marca só aquela FAQ, que é relida e reindexada na
+      busca seguinte. Gravações feitas por outro worker não chegam aqui: a cada
+      CHAT_FAQ_CHECK_SECONDS (5) uma busca confere total, ativas, maior id e maior
+      updated_at de `faq` e, se algo mudou, recarrega tudo.
+    - `confidence` de um resultado: fração (ponderada por IDF) dos termos da pergunta do
+      usuário que aparecem na pergunta/palavras-chave da FAQ.
+    - `best_answer`: resposta da FAQ quando o melhor resultado tem confiança acima de
+      CHAT_FAQ_ANSWER_CONFIDENCE e se destaca do segundo (CHAT_FAQ_MARGIN); o chat responde
+      sem chamar o modelo. Os CHAT_FAQ_TOP_K melhores entram no prompt nos demais casos.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self) -> None:
+        self.answer_confidence = float(os.getenv("CHAT_FAQ_ANSWER_CONFIDENCE", "0.85"))
+        self.margin = float(os.getenv("CHAT_FAQ_MARGIN", "1.2"))
+        self.top_k = int(os.getenv("CHAT_FAQ_TOP_K", "3"))
+        self.check_interval = float(os.getenv("CHAT_FAQ_CHECK_SECONDS", "5"))
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._title_terms: Dict[int, Set[str]] = {}
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._total_len = 0
+        self._loaded = False
+        self._failed_at = 0.0
+        # Resumo de `faq` na última carga completa, conferido a cada check_interval
+        self._version: Optional[tuple] = None
+        self._checked_at = 0.0
+        self._dirty: Set[int] = set()
+        self._lock: Optional[asyncio.Lock] = None
+        self._stats: Dict[str, int] = {"searches": 0, "answered": 0, "reindexed": 0, "full_loads": 0, "version_checks": 0}
+
+    def mark_dirty(self, _table: str = "faq", **info: Any) -> None:
+        faq_id = info.get("id")
+        if faq_id is None:
+            self._loaded = False
+        else:
+            self._dirty.add(int(faq_id))
+
+    async def search(self, db, query: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Top-k FAQs para `query`: dicts com id, pergunta, resposta, score e confidence."""
+        k = self.top_k if k is None else k
+        if k <= 0:
+            return []
+        await self._refresh(db)
+        self._stats["searches"] += 1
+        q_terms = list(dict.fromkeys(_terms(query)))
+        if not q_terms or not self._docs:
+            return []
+        n = len(self._docs)
+        avg_len = self._total_len / n if n else 1.0
+        scores: Dict[int, float] = {}
+        idfs: Dict[str, float] = {}
+        for term in q_terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            idfs[term] = idf
+            for doc_id, tf in postings.items():
+                norm = tf + self.K1 * (1 - self.B + self.B * self._doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / norm
+        if not scores:
+            return []
+
+        # Termos sem ocorrência no índice contam como não encontrados (peso do df=0)
+        missing_idf = math.log(1 + (n + 0.5) / 0.5)
+        total_idf = sum(idfs.get(t, missing_idf) for t in q_terms)
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        results = []
+        for doc_id, score in top:
+            title = self._title_terms[doc_id]
+            matched = sum(idfs[t] for t in q_terms if t in title and t in idfs)
+            doc = self._docs[doc_id]
+            results.append({
+                "id": doc_id,
+                "pergunta": doc["pergunta"],
+                "resposta": doc["resposta"],
+                "score": round(score, 4),
+                "confidence": round(matched / total_idf, 4) if total_idf else 0.0,
+            })
+        return results
+
+    def best_answer(self, results: List[Dict[str, Any]]) -> Optional[str]:
+        """Resposta da FAQ se o melhor resultado for confiável e sem empate com o segundo."""
+        if not results or results[0]["confidence"] < self.answer_confidence:
+            return None
+        if len(results) > 1 and results[0]["score"] < results[1]["score"] * self.margin:
+            return None
+        self._stats["answered"] += 1
+        return results[0]["resposta"] or None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "documents": len(self._docs), "terms": len(self._postings), "pending": len(self._dirty)}
+
+    # ===== Helpers internos =====
+    async def _refresh(self, db) -> None:
+        if self._failed_at and time.monotonic() - self._failed_at > 60:
+            self._failed_at = 0.0
+            self._loaded = False
+        check_due = self._loaded and not self._failed_at and time.monotonic() - self._checked_at >= self.check_interval
+        if self._loaded and not self._dirty and not check_due:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded and not self._failed_at and time.monotonic() - self._checked_at >= self.check_interval:
+                await self._check_version(db)
+            if not self._loaded:
+                # Marcações feitas durante a carga completa são relidas na próxima busca
+                self._dirty.clear()
+                await self._load_all(db)
+                return
+            dirty, self._dirty = self._dirty, set()
+            try:
+                async with db.cursor() as cur:
+                    for faq_id in sorted(dirty):
+                        await cur.execute(
+                            "SELECT id, pergunta, resposta, palavras_chave, ativo FROM faq WHERE id = %s",
+                            (faq_id,),
+                        )
+                        row = await cur.fetchone()
+                        self._remove(faq_id)
+                        if row and self._get(row, "ativo", 4):
+                            self._add(row)
+                        self._stats["reindexed"] += 1
+            except Exception as e:
+                self._dirty |= dirty
+                print(f"[FAQIndex] falha ao reindexar FAQs {sorted(dirty)}: {e}")
+
+    @staticmethod
+    async def _read_version(cur) -> tuple:
+        await cur.execute(
+            "SELECT COUNT(*) AS total, SUM(ativo) AS ativas, MAX(id) AS ultimo, MAX(updated_at) AS alterado FROM faq"
+        )
+        row = await cur.fetchone() or {}
+        return tuple(row.values()) if isinstance(row, dict) else tuple(row)
+
+    async def _check_version(self, db) -> None:
+        """Recarga completa na próxima etapa se `faq` mudou desde a última carga (ex.: outro worker)."""
+        self._checked_at = time.monotonic()
+        self._stats["version_checks"] += 1
+        try:
+            async with db.cursor() as cur:
+                version = await self._read_version(cur)
+        except Exception as e:
+            print(f"[FAQIndex] falha ao conferir versão das FAQs: {e}")
+            self._loaded = False
+            return
+        if version != self._version:
+            self._loaded = False
+            self._dirty.clear()
+
+    async def _load_all(self, db) -> None:
+        try:
+            async with db.cursor() as cur:
+                # Lida antes das linhas: uma gravação no meio da carga dispara outra na conferência.
+                # Sem updated_at, a conferência falha e vira recarga a cada check_interval
+                try:
+                    self._version = await self._read_version(cur)
+                except Exception as e:
+                    print(f"[FAQIndex] falha ao ler versão das FAQs: {e}")
+                    self._version = None
+                self._checked_at = time.monotonic()
+                await cur.execute("SELECT id, pergunta, resposta, palavras_chave, ativo FROM faq WHERE ativo = 1")
+                rows = (await cur.fetchall()) or []
+        except Exception as e:
+            # Sem tabela/sem banco: índice vazio; nova tentativa em 60s
+            print(f"[FAQIndex] falha ao carregar FAQs: {e}")
+            self._loaded = True
+            self._failed_at = time.monotonic()
+            return
+        self._postings.clear()
+        self._doc_len.clear()
+        self._doc_terms.clear()
+        self._title_terms.clear()
+        self._docs.clear()
+        self._total_len = 0
+        for row in rows:
+            self._add(row)
+        self._loaded = True
+        self._stats["full_loads"] += 1
+
+    @staticmethod
+    def _get(row: Any, key: str, idx: int) -> Any:
+        return row[key] if isinstance(row, dict) else row[idx]
+
+    def _add(self, row: Any) -> None:
+        doc_id = int(self._get(row, "id", 0))
+        pergunta = self._get(row, "pergunta", 1) or ""
+        resposta = self._get(row, "resposta", 2) or ""
+        palavras = self._get(row, "palavras_chave", 3) or ""
+        title = _terms(pergunta) + _terms(palavras)
+        terms = title + _terms(palavras) + _terms(resposta)
+        counts = Counter(terms)
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._doc_len[doc_id] = len(terms)
+        self._doc_terms[doc_id] = set(counts)
+        self._title_terms[doc_id] = set(title)
+        self._docs[doc_id] = {"pergunta": pergunta, "resposta": resposta}
+        self._total_len += len(terms)
+
+    def _remove(self, doc_id: int) -> None:
+        if doc_id not in self._docs:
+            return
+        for term in self._doc_terms.pop(doc_id, set()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        self._title_terms.pop(doc_id, None)
+        self._docs.pop(doc_id, None)
+
+
+faq_index = FAQIndex()
+on_change(["faq"], faq_index.mark_dirty)
@@ -4,10 +4,13 @@ Gerencia eventos, disponibilidade e sincronização de agendamentos
 """
 
 import logging
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 import json
 import os
+import threading
+import time
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import Flow
@@ -21,10 +24,13 @@ class GoogleCalendarService:
     # Escopo necessário para leitura e escrita de calendários
     SCOPES = ['https://www.googleapis.com/auth/calendar']
     
-    def __init__(self):
+    def __init__(self, credentials: Optional[Credentials] = None, calendar_id: Optional[str] = None):
         self.service = None
-        self.credentials = None
+        self.credentials = credentials
+        self.calendar_id = calendar_id
         self.timezone = pytz.timezone('America/Sao_Paulo')
+        if credentials is not None:
+            self._build_service()
         
     def get_oauth_url(self, redirect_uri: str, state: str = None) -> str:
         """
@@ -82,10 +88,8 @@ class GoogleCalendarService:
             
             credentials = flow.credentials
             
-            # Salvar credenciais para uso posterior
-            self.credentials = credentials
-            self._build_service()
-            
+            # Sem guardar na instância compartilhada: o cliente do profissional fica no
+            # google_calendar_registry (GoogleCalendarRegistry.register)
             return {
                 'access_token': credentials.token,
                 'refresh_token': credentials.refresh_token,
@@ -110,14 +114,7 @@ class GoogleCalendarService:
             True se credenciais carregadas com sucesso
         """
         try:
-            self.credentials = Credentials(
-                token=token_data['access_token'],
-                refresh_token=token_data.get('refresh_token'),
-                token_uri=token_data.get('token_uri'),
-                client_id=token_data.get('client_id'),
-                client_secret=token_data.get('client_secret'),
-                scopes=self.SCOPES
-            )
+            self.credentials = credentials_from_token(token_data)
             
             # Verificar se o token precisa ser renovado
             if self.credentials.expired and self.credentials.refresh_token:
@@ -133,7 +130,7 @@ class GoogleCalendarService:
     def _build_service(self):
         """Constrói o serviço do Google Calendar"""
         try:
-            self.service = build('calendar', 'v3', credentials=self.credentials)
+            self.service = build('calendar', 'v3', credentials=self.credentials, cache_discovery=False)
         except Exception as e:
             logging.error(f"Erro ao construir serviço Calendar: {str(e)}")
             raise Exception(f"Erro na inicialização do serviço: {str(e)}")
@@ -404,5 +401,180 @@ class GoogleCalendarService:
             logging.error(f"Erro ao excluir evento: {str(e)}")
             raise Exception(f"Erro inesperado: {str(e)}")
 
-# Instância global do serviço
+# Instância global do serviço (fluxo OAuth; chamadas à agenda usam google_calendar_registry)
 google_calendar_service = GoogleCalendarService()
+
+
+def credentials_from_token(token_data: Dict[str, Any]) -> Credentials:
+    """Credentials a partir dos campos salvos em profissional_google_credentials."""
+    credentials = Credentials(
+        token=token_data['access_token'],
+        refresh_token=token_data.get('refresh_token'),
+        token_uri=token_data.get('token_uri'),
+        client_id=token_data.get('client_id'),
+        client_secret=token_data.get('client_secret'),
+        scopes=GoogleCalendarService.SCOPES
+    )
+    expires_at = token_data.get('expires_at')
+    if isinstance(expires_at, str) and expires_at:
+        expires_at = datetime.fromisoformat(expires_at)
+    if isinstance(expires_at, datetime):
+        # google-auth trabalha com expiry em UTC sem fuso
+        if expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        credentials.expiry = expires_at
+    return credentials
+
+
+class _CalendarEntry:
+    __slots__ = ("calendar", "last_used", "lock")
+
+    def __init__(self) -> None:
+        self.calendar: Optional[GoogleCalendarService] = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class GoogleCalendarRegistry:
+    """
+    Um GoogleCalendarService por profissional, em vez de recarregar credenciais na instância
+    global a cada sincronização (duas sincronizações ao mesmo tempo trocavam o token uma da
+    outra, e cada chamada reconstruía o cliente com `build`).
+    - O cliente (credenciais + `build('calendar', 'v3')`) é montado uma vez e reaproveitado.
+    - Tokens que vencem em menos de GOOGLE_CALENDAR_REFRESH_MARGIN_SECONDS (300) são renovados
+      antes do uso, e o novo token volta para profissional_google_credentials.
+    - Entradas sem uso há GOOGLE_CALENDAR_IDLE_SECONDS (1800) saem; no máximo
+      GOOGLE_CALENDAR_MAX_CLIENTS (200) clientes em memória.
+    """
+
+    def __init__(self) -> None:
+        self.refresh_margin = timedelta(seconds=int(os.getenv("GOOGLE_CALENDAR_REFRESH_MARGIN_SECONDS", "300")))
+        self.idle_seconds = float(os.getenv("GOOGLE_CALENDAR_IDLE_SECONDS", "1800"))
+        self.max_clients = int(os.getenv("GOOGLE_CALENDAR_MAX_CLIENTS", "200"))
+        self._entries: "OrderedDict[int, _CalendarEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "loads": 0, "refreshes": 0, "refresh_errors": 0, "evictions": 0}
+
+    def _prune(self, now: float) -> None:
+        # Ordem de último uso: o mais antigo fica no início
+        while self._entries:
+            pid, entry = next(iter(self._entries.items()))
+            if now - entry.last_used <= self.idle_seconds and len(self._entries) <= self.max_clients:
+                break
+            del self._entries[pid]
+            self._stats["evictions"] += 1
+
+    def _entry(self, profissional_id: int) -> _CalendarEntry:
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(profissional_id)
+            if entry is None:
+                entry = self._entries[profissional_id] = _CalendarEntry()
+            entry.last_used = now
+            self._entries.move_to_end(profissional_id)
+            return entry
+
+    def _drop(self, profissional_id: int, entry: _CalendarEntry) -> None:
+        with self._lock:
+            if self._entries.get(profissional_id) is entry:
+                del self._entries[profissional_id]
+
+    def register(self, profissional_id: int, token_data: Dict[str, Any], calendar_id: Optional[str] = None) -> GoogleCalendarService:
+        """Cliente a partir de um token recém-obtido (callback OAuth), já no cache."""
+        calendar = GoogleCalendarService(credentials_from_token(token_data), calendar_id)
+        entry = self._entry(profissional_id)
+        with entry.lock:
+            entry.calendar = calendar
+        return calendar
+
+    def invalidate(self, profissional_id: int) -> None:
+        """Descarta o cliente (desconexão ou novas credenciais)."""
+        with self._lock:
+            self._entries.pop(profissional_id, None)
+
+    def get(self, profissional_id: int, db=None) -> Optional[GoogleCalendarService]:
+        """
+        Cliente do profissional com token válido, ou None sem credenciais ativas. `db` é uma
+        conexão síncrona (get_db) para ler/gravar o token; sem ela, uma é emprestada do pool.
+        """
+        entry = self._entry(profissional_id)
+        with entry.lock:
+            if entry.calendar is None:
+                entry.calendar = self._with_db(db, lambda conn: self._load(conn, profissional_id))
+                if entry.calendar is None:
+                    self._drop(profissional_id, entry)
+                    return None
+                self._stats["loads"] += 1
+            else:
+                self._stats["hits"] += 1
+            try:
+                self._refresh_if_needed(entry.calendar, profissional_id, db)
+            except Exception:
+                # Token revogado/inválido: não guarda o cliente
+                self._drop(profissional_id, entry)
+                raise
+            return entry.calendar
+
+    @staticmethod
+    def _with_db(db, fn):
+        if db is not None:
+            return fn(db)
+        from ..core.db import get_db
+
+        db_gen = get_db()
+        conn = next(db_gen)
+        try:
+            return fn(conn)
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _load(db, profissional_id: int) -> Optional[GoogleCalendarService]:
+        with db.cursor() as cur:
+            cur.execute("""
+                SELECT access_token, refresh_token, token_uri, client_id, client_secret,
+                       expires_at, calendar_id
+                FROM profissional_google_credentials
+                WHERE profissional_id = %s AND ativo = 1
+            """, (profissional_id,))
+            row = cur.fetchone()
+        if not row:
+            return None
+        return GoogleCalendarService(credentials_from_token(row), row.get('calendar_id'))
+
+    def _refresh_if_needed(self, calendar: GoogleCalendarService, profissional_id: int, db) -> None:
+        credentials = calendar.credentials
+        if not credentials.refresh_token:
+            return
+        if credentials.token and credentials.expiry and credentials.expiry - datetime.utcnow() > self.refresh_margin:
+            return
+        try:
+            # Renova no próprio objeto: o cliente já montado passa a usar o token novo
+            credentials.refresh(Request())
+        except Exception as e:
+            self._stats["refresh_errors"] += 1
+            logging.error(f"Erro ao renovar token Google do profissional {profissional_id}: {str(e)}")
+            raise
+        self._stats["refreshes"] += 1
+        self._with_db(db, lambda conn: self._persist(conn, profissional_id, credentials))
+
+    @staticmethod
+    def _persist(db, profissional_id: int, credentials: Credentials) -> None:
+        with db.cursor() as cur:
+            cur.execute("""
+                UPDATE profissional_google_credentials
+                SET access_token = %s, refresh_token = COALESCE(%s, refresh_token),
+                    expires_at = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE profissional_id = %s
+            """, (credentials.token, credentials.refresh_token, credentials.expiry, profissional_id))
+        db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "clients": len(self._entries)}
+
+
+google_calendar_registry = GoogleCalendarRegistry()
@@ -0,0 +1,255 @@
+import asyncio
+import bisect
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+
+# Prioridades (menor = atendido antes)
+PRIORITY_BOOKING = 0     # conversa com agendamento em andamento
+PRIORITY_INTERACTIVE = 1  # demais mensagens do chat
+PRIORITY_BACKGROUND = 2   # sumarização e outras tarefas sem usuário esperando
+
+
+class AdmissionRejected(RuntimeError):
+    """Chamada ao modelo recusada pelo controle de admissão (fila cheia ou prazo esgotado)."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"Chamada ao modelo recusada ({reason})")
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "session_id", "enqueued_at", "future", "granted")
+
+    def __init__(self, priority: int, seq: int, session_id: str, future: "asyncio.Future[None]") -> None:
+        self.priority = priority
+        self.seq = seq
+        self.session_id = session_id
+        self.enqueued_at = time.monotonic()
+        self.future = future
+        self.granted = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """
+    Controle de admissão das chamadas ao modelo (por processo, no event loop).
+    - Limite global de chamadas simultâneas (CHAT_LLM_MAX_CONCURRENCY) e por sessão
+      (CHAT_LLM_SESSION_CONCURRENCY); tarefas em background limitadas a
+      CHAT_LLM_BACKGROUND_CONCURRENCY para sempre sobrar vaga ao chat.
+    - Token bucket opcional (CHAT_LLM_RATE_PER_SEC, rajada CHAT_LLM_BURST) para ficar abaixo
+      do rate limit do provedor; 0 desativa.
+    - Fila limitada (CHAT_LLM_QUEUE_SIZE) ordenada por prioridade e chegada. Cada espera tem
+      prazo (CHAT_LLM_QUEUE_TIMEOUT_MS): quem não é atendido a tempo é descartado, e quem
+      chega com a espera estimada (fila à frente x tempo médio de chamada) acima do prazo é
+      recusado na hora. Com a fila cheia, o pedido de menor prioridade é o descartado.
+    Recusas levantam AdmissionRejected; quem chama responde com o fallback local.
+    """
+
+    def __init__(self) -> None:
+        self.max_concurrency = max(1, int(os.getenv("CHAT_LLM_MAX_CONCURRENCY", "16")))
+        self.session_concurrency = max(1, int(os.getenv("CHAT_LLM_SESSION_CONCURRENCY", "1")))
+        self.background_concurrency = max(1, int(os.getenv("CHAT_LLM_BACKGROUND_CONCURRENCY", str(max(1, self.max_concurrency // 4)))))
+        self.rate = float(os.getenv("CHAT_LLM_RATE_PER_SEC", "0"))
+        self.burst = max(1.0, float(os.getenv("CHAT_LLM_BURST", str(self.max_concurrency))))
+        self.queue_size = max(0, int(os.getenv("CHAT_LLM_QUEUE_SIZE", "100")))
+        self.queue_timeout = float(os.getenv("CHAT_LLM_QUEUE_TIMEOUT_MS", "15000")) / 1000.0
+        self._active = 0
+        self._active_background = 0
+        self._by_session: Dict[str, int] = {}
+        self._queue: List[_Waiter] = []  # ordenada (prioridade, chegada)
+        self._seq = itertools.count()
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._service_time: Optional[float] = None  # média móvel (EWMA) da duração das chamadas
+        self._waits: Deque[float] = deque(maxlen=500)
+        self._stats: Dict[str, int] = {
+            "admitted": 0, "queued": 0, "max_queue_depth": 0,
+            "rejected_queue_full": 0, "rejected_predicted": 0, "rejected_deadline": 0, "cancelled": 0,
+        }
+
+    # --- token bucket ---
+
+    def _refill(self, now: float) -> None:
+        if self.rate <= 0:
+            return
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _has_token(self) -> bool:
+        return self.rate <= 0 or self._tokens >= 1.0
+
+    def _schedule_refill(self) -> None:
+        # Acorda a fila quando o próximo token estiver disponível
+        if self._timer is not None or self.rate <= 0:
+            return
+        delay = max(0.001, (1.0 - self._tokens) / self.rate)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_refill)
+
+    def _on_refill(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    # --- admissão ---
+
+    def _can_start(self, session_id: str, priority: int) -> bool:
+        if self._active >= self.max_concurrency:
+            return False
+        if self._by_session.get(session_id, 0) >= self.session_concurrency:
+            return False
+        if priority >= PRIORITY_BACKGROUND and self._active_background >= self.background_concurrency:
+            return False
+        return self._has_token()
+
+    def _start(self, session_id: str, priority: int) -> None:
+        self._active += 1
+        if priority >= PRIORITY_BACKGROUND:
+            self._active_background += 1
+        self._by_session[session_id] = self._by_session.get(session_id, 0) + 1
+        if self.rate > 0:
+            self._tokens -= 1.0
+        self._stats["admitted"] += 1
+
+    def _release(self, session_id: str, priority: int, duration: Optional[float]) -> None:
+        self._active -= 1
+        if priority >= PRIORITY_BACKGROUND:
+            self._active_background -= 1
+        remaining = self._by_session.get(session_id, 1) - 1
+        if remaining > 0:
+            self._by_session[session_id] = remaining
+        else:
+            self._by_session.pop(session_id, None)
+        if duration is not None:
+            self._service_time = duration if self._service_time is None else 0.8 * self._service_time + 0.2 * duration
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Libera, em ordem de prioridade, os que já podem começar; pula sessões no limite."""
+        now = time.monotonic()
+        self._refill(now)
+        i = 0
+        while i < len(self._queue) and self._active < self.max_concurrency:
+            waiter = self._queue[i]
+            if waiter.future.done():
+                self._queue.pop(i)
+                continue
+            if not self._has_token():
+                self._schedule_refill()
+                break
+            if self._can_start(waiter.session_id, waiter.priority):
+                self._queue.pop(i)
+                self._start(waiter.session_id, waiter.priority)
+                waiter.granted = True
+                self._waits.append(now - waiter.enqueued_at)
+                waiter.future.set_result(None)
+                continue
+            i += 1
+
+    def _estimated_wait(self, ahead: int) -> Optional[float]:
+        # Em média uma vaga abre a cada (duração / vagas); quem chega espera os da frente + 1
+        if self._service_time is None:
+            return None
+        return (ahead + 1) * self._service_time / self.max_concurrency
+
+    def _remove(self, waiter: _Waiter) -> None:
+        idx = bisect.bisect_left(self._queue, waiter)
+        if idx < len(self._queue) and self._queue[idx] is waiter:
+            self._queue.pop(idx)
+
+    async def acquire(self, session_id: str, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> None:
+        timeout = self.queue_timeout if timeout is None else timeout
+        self._refill(time.monotonic())
+        if not self._queue and self._can_start(session_id, priority):
+            self._start(session_id, priority)
+            self._waits.append(0.0)
+            return
+
+        ahead = sum(1 for w in self._queue if w.priority <= priority)
+        estimate = self._estimated_wait(ahead)
+        if estimate is not None and estimate > timeout:
+            self._stats["rejected_predicted"] += 1
+            raise AdmissionRejected("espera estimada acima do prazo")
+
+        if len(self._queue) >= self.queue_size:
+            worst = self._queue[-1] if self._queue else None
+            if worst is None or worst.priority <= priority:
+                self._stats["rejected_queue_full"] += 1
+                raise AdmissionRejected("fila cheia")
+            # Abre espaço descartando o pedido de menor prioridade
+            self._queue.pop()
+            self._stats["rejected_queue_full"] += 1
+            if not worst.future.done():
+                worst.future.set_exception(AdmissionRejected("fila cheia"))
+
+        waiter = _Waiter(priority, next(self._seq), session_id, asyncio.get_running_loop().create_future())
+        bisect.insort(self._queue, waiter)
+        self._stats["queued"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if waiter.granted:
+                return
+            self._remove(waiter)
+            self._stats["rejected_deadline"] += 1
+            raise AdmissionRejected("prazo de espera esgotado")
+        except asyncio.CancelledError:
+            # Cliente desconectou enquanto esperava: devolve a vaga se ela já tinha sido concedida
+            if waiter.granted:
+                self._release(session_id, priority, None)
+            else:
+                self._remove(waiter)
+                waiter.future.cancel()
+            self._stats["cancelled"] += 1
+            raise
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """`async with llm_admission.slot(session_id, priority):` envolve uma chamada ao modelo."""
+        await self.acquire(session_id, priority, timeout)
+        started = time.monotonic()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            # Falhas rápidas não entram na média de duração (subestimariam a espera)
+            self._release(session_id, priority, None if failed else time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> Optional[int]:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000) if waits else None
+
+        return {
+            **self._stats,
+            "active": self._active,
+            "active_background": self._active_background,
+            "queue_depth": len(self._queue),
+            "queue_by_priority": {
+                str(p): sum(1 for w in self._queue if w.priority == p)
+                for p in (PRIORITY_BOOKING, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)
+            },
+            "wait_p50_ms": pct(0.50),
+            "wait_p95_ms": pct(0.95),
+            "wait_p99_ms": pct(0.99),
+            "service_time_ms": round(self._service_time * 1000) if self._service_time is not None else None,
+            "tokens_available": round(self._tokens, 2) if self.rate > 0 else None,
+            "max_concurrency": self.max_concurrency,
+            "session_concurrency": self.session_concurrency,
+            "queue_size": self.queue_size,
+        }
+
+
+llm_admission = AdmissionController()
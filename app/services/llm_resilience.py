@@ -0,0 +1,273 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+
+class CircuitOpenError(RuntimeError):
+    """Todos os backends com circuito aberto: falha rápida, sem chamar o provedor."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Erros 4xx do provedor (exceto 408/409/429) não melhoram com nova tentativa."""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 409, 429):
+        return False
+    return True
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter completo: uniforme em [0, min(teto, base * 2^tentativa)]."""
+    base = float(os.getenv("OPENAI_BACKOFF_BASE_MS", "200")) / 1000.0
+    cap = float(os.getenv("OPENAI_BACKOFF_MAX_MS", "4000")) / 1000.0
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class BackendHealth:
+    """
+    Circuit breaker + estatísticas de um backend (ex.: "azure", "openai").
+    - closed: chamadas liberadas; OPENAI_BREAKER_FAILURES falhas seguidas abrem o circuito.
+    - open: chamadas bloqueadas por OPENAI_BREAKER_RESET_SECONDS.
+    - half_open: depois do tempo de espera, uma chamada de teste; sucesso fecha, falha reabre.
+    Latências das últimas chamadas bem-sucedidas alimentam o p95 usado no hedge.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.failure_threshold = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+        self.reset_timeout = float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", "30"))
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"calls": 0, "successes": 0, "failures": 0, "rejected": 0, "hedges": 0, "cancelled": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._stats["rejected"] += 1
+                    return False
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    self._stats["rejected"] += 1
+                    return False
+                self._probe_in_flight = True
+            self._stats["calls"] += 1
+            return True
+
+    def record_success(self, latency: Optional[float]) -> None:
+        """Backend respondeu; `latency=None` para respostas de erro do cliente (4xx), fora do p95."""
+        with self._lock:
+            self._stats["successes"] += 1
+            if latency is not None:
+                self._latencies.append(latency)
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self.state = "closed"
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        """Chamada cancelada (perdeu o hedge): não conta como falha."""
+        with self._lock:
+            self._stats["cancelled"] += 1
+            self._probe_in_flight = False
+
+    def record_hedge(self) -> None:
+        with self._lock:
+            self._stats["hedges"] += 1
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.50), self.percentile(0.95)
+        with self._lock:
+            return {
+                **self._stats,
+                "state": self.state,
+                "consecutive_failures": self._consecutive_failures,
+                "latency_p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "latency_p95_ms": round(p95 * 1000) if p95 is not None else None,
+            }
+
+
+_backends: Dict[str, BackendHealth] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str) -> BackendHealth:
+    health = _backends.get(name)
+    if health is None:
+        with _backends_lock:
+            health = _backends.setdefault(name, BackendHealth(name))
+    return health
+
+
+def backend_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: health.stats() for name, health in list(_backends.items())}
+
+
+def hedge_delay(health: BackendHealth) -> Optional[float]:
+    """
+    Espera antes da requisição de hedge ao backend alternativo: OPENAI_HEDGE_DELAY_MS fixo,
+    ou o p95 observado do backend principal (mínimo OPENAI_HEDGE_MIN_MS; até 20 amostras,
+    OPENAI_HEDGE_DEFAULT_MS). OPENAI_HEDGE=0 desativa.
+    """
+    if os.getenv("OPENAI_HEDGE", "1").strip().lower() in ("0", "false", "no"):
+        return None
+    fixed = os.getenv("OPENAI_HEDGE_DELAY_MS")
+    if fixed:
+        return float(fixed) / 1000.0
+    minimum = float(os.getenv("OPENAI_HEDGE_MIN_MS", "500")) / 1000.0
+    if health.samples < 20:
+        return max(minimum, float(os.getenv("OPENAI_HEDGE_DEFAULT_MS", "8000")) / 1000.0)
+    p95 = health.percentile(0.95) or 0.0
+    return max(minimum, p95)
+
+
+Backend = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+async def _timed(name: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    health = get_backend(name)
+    started = time.monotonic()
+    try:
+        result = await call()
+    except asyncio.CancelledError:
+        health.record_cancelled()
+        raise
+    except Exception as e:
+        if is_retryable(e):
+            health.record_failure()
+        else:
+            # Requisição inválida: o backend respondeu, não é sinal de indisponibilidade
+            health.record_success(None)
+        raise
+    health.record_success(time.monotonic() - started)
+    return result
+
+
+async def _hedged(candidates: Sequence[Backend]) -> Any:
+    name, call = candidates[0]
+    delay = hedge_delay(get_backend(name)) if len(candidates) > 1 else None
+    if delay is None:
+        return await _timed(name, call)
+
+    tasks = [asyncio.ensure_future(_timed(name, call))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        primary = tasks[0]
+        if done:
+            # Principal terminou antes do hedge: sucesso, ou falha rápida -> failover direto
+            if primary.exception() is None:
+                return primary.result()
+            if not is_retryable(primary.exception()):
+                raise primary.exception()
+        alt_name, alt_call = candidates[1]
+        if not get_backend(alt_name).allow():
+            return await primary
+        if not done:
+            get_backend(alt_name).record_hedge()
+        tasks.append(asyncio.ensure_future(_timed(alt_name, alt_call)))
+        pending = {t for t in tasks if not t.done()}
+        last_error: Optional[BaseException] = primary.exception() if primary.done() else None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        assert last_error is not None
+        raise last_error
+    finally:
+        # Perdedor do hedge (ou tudo, se quem chamou foi cancelado) é cancelado
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_with_resilience(backends: Sequence[Backend]) -> Any:
+    """
+    Executa a chamada no primeiro backend com circuito liberado, com hedge para o seguinte
+    (se houver) após `hedge_delay`; falhas são repetidas até OPENAI_MAX_ATTEMPTS vezes com
+    backoff exponencial e jitter, reavaliando os circuitos a cada tentativa.
+    """
+    attempts = max(1, int(os.getenv("OPENAI_MAX_ATTEMPTS", "3")))
+    last_error: Optional[BaseException] = None
+    for attempt in range(attempts):
+        candidates: List[Backend] = []
+        for backend in backends:
+            # O segundo backend só reserva o circuito (half-open) quando o hedge disparar
+            if not candidates:
+                if get_backend(backend[0]).allow():
+                    candidates.append(backend)
+            elif get_backend(backend[0]).state != "open":
+                candidates.append(backend)
+        if not candidates:
+            raise CircuitOpenError("Backends de IA indisponíveis (circuito aberto)") from last_error
+        try:
+            return await _hedged(candidates)
+        except Exception as e:
+            last_error = e
+            print(f"[LLM][attempt={attempt+1}] {candidates[0][0]} erro: {e}")
+            if not is_retryable(e):
+                raise
+        if attempt + 1 < attempts:
+            await asyncio.sleep(backoff_delay(attempt))
+    assert last_error is not None
+    raise last_error
+
+
+def call_with_resilience_sync(backends: Sequence[Tuple[str, Callable[[], Any]]]) -> Any:
+    """Versão síncrona (sem hedge): circuit breaker, failover e backoff com jitter."""
+    attempts = max(1, int(os.getenv("OPENAI_MAX_ATTEMPTS", "3")))
+    last_error: Optional[BaseException] = None
+    for attempt in range(attempts):
+        # Cada nova tentativa começa pelo backend seguinte (failover sem esperar o circuito abrir)
+        shift = attempt % len(backends) if backends else 0
+        ordered = list(backends[shift:]) + list(backends[:shift])
+        backend = next(((n, c) for n, c in ordered if get_backend(n).allow()), None)
+        if backend is None:
+            raise CircuitOpenError("Backends de IA indisponíveis (circuito aberto)") from last_error
+        name, call = backend
+        health = get_backend(name)
+        started = time.monotonic()
+        try:
+            result = call()
+            health.record_success(time.monotonic() - started)
+            return result
+        except Exception as e:
+            last_error = e
+            print(f"[LLM][attempt={attempt+1}] {name} erro: {e}")
+            if not is_retryable(e):
+                health.record_success(None)
+                raise
+            health.record_failure()
+        if attempt + 1 < attempts:
+            time.sleep(backoff_delay(attempt))
+    assert last_error is not None
+    raise last_error
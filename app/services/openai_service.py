@@ -1,7 +1,57 @@
 import os
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from .llm_resilience import call_with_resilience, call_with_resilience_sync, get_backend
+
+
+# ===== Clientes HTTP compartilhados =====
+# Um cliente por configuração (provedor + endpoint + chave), criado uma vez e reutilizado
+# entre requisições: mantém conexões keep-alive e evita handshake TLS a cada chamada.
+_sync_clients: Dict[Tuple[str, ...], Any] = {}
+_async_clients: Dict[Tuple[str, ...], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _http_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("OPENAI_HTTP_KEEPALIVE_EXPIRY", "60")),
+    )
+
+
+def _http_timeout() -> float:
+    return float(os.getenv("OPENAI_HTTP_TIMEOUT", "60"))
+
+
+def _client_max_retries() -> int:
+    # Retentativas ficam a cargo de llm_resilience (backoff + circuit breaker + failover)
+    return int(os.getenv("OPENAI_CLIENT_MAX_RETRIES", "0"))
+
+
+async def close_openai_clients() -> None:
+    """Fecha os clientes compartilhados (chamado no shutdown da aplicação)."""
+    with _clients_lock:
+        sync_clients = list(_sync_clients.values())
+        async_clients = list(_async_clients.values())
+        _sync_clients.clear()
+        _async_clients.clear()
+    for client in sync_clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+    for client in async_clients:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
 
 class OpenAIService:
     """
@@ -18,6 +68,8 @@ class OpenAIService:
 
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        # Endpoint compatível com a API da OpenAI (ex.: scripts/mock_llm_server.py em testes de carga)
+        self.base_url = os.getenv("OPENAI_BASE_URL") or None
 
         # Azure OpenAI
         # Remover barra final do endpoint para evitar inconsistências
@@ -39,130 +91,306 @@ class OpenAIService:
             "Responda em português do Brasil."
         )
 
-        # Azure OpenAI preferencial se configurado
-        if self.azure_endpoint and self.azure_api_key and self.azure_deployment:
-            result = self._chat_with_azure(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message},
-                ],
-                temperature=0.2,
-            )
-            return result
-
-        # OpenAI padrão
-        from openai import OpenAI  # type: ignore
-        client = OpenAI(api_key=self.api_key)
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[
+        return self.chat_completion(
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_message},
             ],
             temperature=0.2,
         )
-        reply = response.choices[0].message.content or ""
-        usage = getattr(response, "usage", None)
-        tokens = {
-            "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
-            "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
-        }
-        return {"message": reply, "tokens": tokens}
 
+    async def generate_reply_async(self, user_message: str, session_id: str, is_first: bool) -> Dict[str, Any]:
+        """Versão assíncrona de `generate_reply` (não bloqueia o event loop)."""
+        if not self.is_configured():
+            raise RuntimeError("Nenhuma configuração de OpenAI/Azure OpenAI encontrada")
 
+        system_prompt = (
+            "Você é um assistente de agendamentos de clínica, seja objetivo e claro. "
+            "Responda em português do Brasil."
+        )
+        return await self.chat_completion_async(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message},
+            ],
+            temperature=0.2,
+        )
 
     def chat_completion(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> Dict[str, Any]:
         """
         Gera resposta com base em uma lista de mensagens (mensagens já devem incluir o(s) system prompt(s)).
         Retorna { message, tokens } com contagem aproximada do provedor.
+        Circuit breaker, backoff com jitter e failover entre backends: ver `llm_resilience`.
         """
         if not self.is_configured():
             raise RuntimeError("Nenhuma configuração de OpenAI/Azure OpenAI encontrada")
 
-        # Azure OpenAI preferencial
-        if self.azure_endpoint and self.azure_api_key and self.azure_deployment:
-            result = self._chat_with_azure(messages=messages, temperature=temperature)
-            return result
+        # Azure OpenAI preferencial; OpenAI como failover quando ambos configurados
+        return call_with_resilience_sync(self._sync_backends(messages, temperature))
 
-        # OpenAI padrão
-        from openai import OpenAI  # type: ignore
-        client = OpenAI(api_key=self.api_key)
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=temperature,
-        )
-        reply = response.choices[0].message.content or ""
-        usage = getattr(response, "usage", None)
-        tokens = {
-            "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
-            "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
-        }
-        return {"message": reply, "tokens": tokens}
+    async def chat_completion_async(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> Dict[str, Any]:
+        """
+        Versão assíncrona de `chat_completion`, usando o cliente AsyncOpenAI/AsyncAzureOpenAI compartilhado.
+        Retorna { message, tokens }.
+        """
+        if not self.is_configured():
+            raise RuntimeError("Nenhuma configuração de OpenAI/Azure OpenAI encontrada")
 
+        # Com os dois backends configurados, o alternativo recebe uma requisição de hedge
+        # se o principal passar do p95 de latência
+        return await call_with_resilience(self._async_backends(messages, temperature))
 
-    def summarize(self, text: str, max_words: int = 300) -> str:
+    async def chat_completion_stream(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Gera a resposta em streaming, repassando os tokens à medida que o provedor os emite.
+        Produz eventos { type: "token", content } e, ao final, { type: "usage", tokens }.
+        """
+        if not self.is_configured():
+            raise RuntimeError("Nenhuma configuração de OpenAI/Azure OpenAI encontrada")
+
+        # Failover só antes do primeiro token: depois disso a resposta parcial já foi enviada
+        stream = None
+        last_error: Optional[Exception] = None
+        for name, client, model in self._stream_backends():
+            health = get_backend(name)
+            if not health.allow():
+                continue
+            started = time.monotonic()
+            try:
+                stream = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                break
+            except Exception as e:
+                print(f"[LLM][stream] {name} erro: {e}")
+                health.record_failure()
+                last_error = e
+        if stream is None:
+            raise last_error or RuntimeError("Backends de IA indisponíveis (circuito aberto)")
+
+        tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+        try:
+            async for chunk in stream:
+                # Azure envia chunks sem choices (ex.: resultados de filtro de conteúdo)
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield {"type": "token", "content": delta}
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    tokens = {
+                        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+                        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+                    }
+        except Exception:
+            health.record_failure()
+            raise
+        health.record_success(time.monotonic() - started)
+        yield {"type": "usage", "tokens": tokens}
+
+    def summarize(self, text: str, max_words: int = 300, previous_summary: Optional[str] = None) -> str:
         """
         Resume o texto de uma conversa, preservando fatos, decisões e instruções acionáveis.
+        Com `previous_summary`, atualiza o resumo existente apenas com as mensagens novas em `text`.
         """
         if not self.is_configured():
             raise RuntimeError("Nenhuma configuração de OpenAI/Azure OpenAI encontrada")
 
+        result = self.chat_completion(self._summary_messages(text, max_words, previous_summary), temperature=0.2)
+        return result.get("message", "")
+
+    async def summarize_async(self, text: str, max_words: int = 300, previous_summary: Optional[str] = None) -> str:
+        """Versão assíncrona de `summarize`."""
+        if not self.is_configured():
+            raise RuntimeError("Nenhuma configuração de OpenAI/Azure OpenAI encontrada")
+
+        result = await self.chat_completion_async(self._summary_messages(text, max_words, previous_summary), temperature=0.2)
+        return result.get("message", "")
+
+    # ===== Helpers internos =====
+    @staticmethod
+    def _summary_messages(text: str, max_words: int, previous_summary: Optional[str] = None) -> List[Dict[str, str]]:
         system_prompt = (
             "Você é um assistente que cria resumos de conversas clínicas para contexto de chat. "
             "Produza um resumo objetivo, em português do Brasil, preservando: objetivos do usuário, "
             "informações de agendamento, restrições/condições, decisões já tomadas e dados fixos da clínica. "
             f"Limite-se a aproximadamente {max_words} palavras."
         )
-
-        messages = [
+        if previous_summary:
+            system_prompt += (
+                " Você receberá o resumo anterior e apenas as mensagens novas: devolva o resumo atualizado, "
+                "mantendo o que continua válido e corrigindo o que as mensagens novas alterarem."
+            )
+            text = f"Resumo anterior:\n{previous_summary}\n\nMensagens novas:\n{text}"
+        return [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": text},
         ]
 
-        result = self.chat_completion(messages, temperature=0.2)
-        return result.get("message", "")
+    @staticmethod
+    def _parse_response(response: Any) -> Dict[str, Any]:
+        reply = response.choices[0].message.content or ""
+        usage = getattr(response, "usage", None)
+        tokens = {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        }
+        return {"message": reply, "tokens": tokens}
+
+    def _openai_key(self) -> Tuple[str, ...]:
+        return ("openai", self.api_key or "", self.base_url or "")
+
+    def _azure_key(self) -> Tuple[str, ...]:
+        return ("azure", self.azure_endpoint or "", self.azure_api_key or "", self.azure_api_version or "")
+
+    def _get_openai_client(self):
+        key = self._openai_key()
+        client = _sync_clients.get(key)
+        if client is None:
+            from openai import OpenAI, DefaultHttpxClient  # type: ignore
+
+            with _clients_lock:
+                client = _sync_clients.get(key)
+                if client is None:
+                    client = OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        timeout=_http_timeout(),
+                        max_retries=_client_max_retries(),
+                        http_client=DefaultHttpxClient(limits=_http_limits()),
+                    )
+                    _sync_clients[key] = client
+        return client
+
+    def _get_async_openai_client(self):
+        key = self._openai_key()
+        client = _async_clients.get(key)
+        if client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient  # type: ignore
+
+            with _clients_lock:
+                client = _async_clients.get(key)
+                if client is None:
+                    client = AsyncOpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        timeout=_http_timeout(),
+                        max_retries=_client_max_retries(),
+                        http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+                    )
+                    _async_clients[key] = client
+        return client
 
-    # ===== Helpers internos =====
     def _create_azure_client(self):
-        from openai import AzureOpenAI  # type: ignore
+        key = self._azure_key()
+        client = _sync_clients.get(key)
+        if client is None:
+            from openai import AzureOpenAI, DefaultHttpxClient  # type: ignore
 
-        return AzureOpenAI(
-            api_version=self.azure_api_version,
-            azure_endpoint=self.azure_endpoint,
-            api_key=self.azure_api_key,
-        )
+            with _clients_lock:
+                client = _sync_clients.get(key)
+                if client is None:
+                    client = AzureOpenAI(
+                        api_version=self.azure_api_version,
+                        azure_endpoint=self.azure_endpoint,
+                        api_key=self.azure_api_key,
+                        timeout=_http_timeout(),
+                        max_retries=_client_max_retries(),
+                        http_client=DefaultHttpxClient(limits=_http_limits()),
+                    )
+                    _sync_clients[key] = client
+        return client
+
+    def _get_async_azure_client(self):
+        key = self._azure_key()
+        client = _async_clients.get(key)
+        if client is None:
+            from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient  # type: ignore
+
+            with _clients_lock:
+                client = _async_clients.get(key)
+                if client is None:
+                    client = AsyncAzureOpenAI(
+                        api_version=self.azure_api_version,
+                        azure_endpoint=self.azure_endpoint,
+                        api_key=self.azure_api_key,
+                        timeout=_http_timeout(),
+                        max_retries=_client_max_retries(),
+                        http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+                    )
+                    _async_clients[key] = client
+        return client
+
+    def warmup(self) -> None:
+        """Cria antecipadamente o cliente assíncrono do provedor configurado (startup)."""
+        if self.azure_endpoint and self.azure_api_key and self.azure_deployment:
+            self._get_async_azure_client()
+        elif self.api_key:
+            self._get_async_openai_client()
+
+    def _sync_backends(self, messages: List[Dict[str, str]], temperature: float) -> List[Tuple[str, Any]]:
+        backends: List[Tuple[str, Any]] = []
+        if self.azure_endpoint and self.azure_api_key and self.azure_deployment:
+            backends.append(("azure", lambda: self._chat_with_azure(messages, temperature)))
+        if self.api_key:
+            backends.append(("openai", lambda: self._parse_response(
+                self._get_openai_client().chat.completions.create(model=self.model, messages=messages, temperature=temperature)
+            )))
+        return backends
+
+    def _async_backends(self, messages: List[Dict[str, str]], temperature: float) -> List[Tuple[str, Any]]:
+        async def openai_call() -> Dict[str, Any]:
+            response = await self._get_async_openai_client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+            )
+            return self._parse_response(response)
+
+        backends: List[Tuple[str, Any]] = []
+        if self.azure_endpoint and self.azure_api_key and self.azure_deployment:
+            backends.append(("azure", lambda: self._chat_with_azure_async(messages, temperature)))
+        if self.api_key:
+            backends.append(("openai", openai_call))
+        return backends
+
+    def _stream_backends(self) -> List[Tuple[str, Any, str]]:
+        backends: List[Tuple[str, Any, str]] = []
+        if self.azure_endpoint and self.azure_api_key and self.azure_deployment:
+            backends.append(("azure", self._get_async_azure_client(), self.azure_deployment))
+        if self.api_key:
+            backends.append(("openai", self._get_async_openai_client(), self.model))
+        return backends
 
     def _chat_with_azure(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> Dict[str, Any]:
         """
-        Chama Azure OpenAI com pequena política de retry e logs de erro básicos.
+        Uma chamada ao Azure OpenAI (retentativas/failover ficam em `llm_resilience`).
         Retorna { message, tokens }.
         """
         if not (self.azure_endpoint and self.azure_api_key and self.azure_deployment):
             raise RuntimeError("Azure OpenAI não configurado")
 
-        last_error: Optional[Exception] = None
-        for attempt in range(2):  # 2 tentativas rápidas
-            try:
-                client = self._create_azure_client()
-                response = client.chat.completions.create(
-                    messages=messages,
-                    temperature=temperature,
-                    model=self.azure_deployment,
-                )
-                reply = response.choices[0].message.content or ""
-                usage = getattr(response, "usage", None)
-                tokens = {
-                    "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
-                    "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
-                }
-                return {"message": reply, "tokens": tokens}
-            except Exception as e:
-                # Log mínimo para diagnóstico em dev; não interrompe UX (router trata fallback)
-                print(f"[AzureOpenAI][attempt={attempt+1}] erro: {e}")
-                last_error = e
+        client = self._create_azure_client()
+        response = client.chat.completions.create(
+            messages=messages,
+            temperature=temperature,
+            model=self.azure_deployment,
+        )
+        return self._parse_response(response)
 
-        # Se falhar após as tentativas, propagar para o router fazer fallback
-        assert last_error is not None
-        raise last_error
+    async def _chat_with_azure_async(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> Dict[str, Any]:
+        """Versão assíncrona de `_chat_with_azure`."""
+        if not (self.azure_endpoint and self.azure_api_key and self.azure_deployment):
+            raise RuntimeError("Azure OpenAI não configurado")
 
+        client = self._get_async_azure_client()
+        response = await client.chat.completions.create(
+            messages=messages,
+            temperature=temperature,
+            model=self.azure_deployment,
+        )
+        return self._parse_response(response)
@@ -0,0 +1,183 @@
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Marcadores de vazamento de dados internos (painel/BD) ou de "ausência de cadastros"
+DEFAULT_MARKERS = [
+    "painel", "banco de dados", "banco", "no sistema",
+    "no banco", "cadastrado", "cadastrados", "profissionais ativos",
+    "serviços ativos", "servicos ativos", "atualmente não há", "no momento não há",
+    "não há serviços", "não há profissionais", "na base", "no bd",
+]
+
+DEFAULT_REPLACEMENT = (
+    "Posso te ajudar com o agendamento. "
+    "Você prefere um dia/turno específico? Também posso indicar especialidades conforme sua necessidade."
+)
+
+# Chaves em `configuracoes` (não vão para o prompt; ver admin_snapshot)
+CONFIG_MARKERS_KEY = "chat_marcadores_bloqueados"
+CONFIG_REPLACEMENT_KEY = "chat_resposta_bloqueio"
+
+
+class AhoCorasick:
+    """
+    Autômato de Aho-Corasick: encontra qualquer um de N padrões em uma única passada pelo
+    texto, com custo proporcional ao tamanho do texto (e não ao número de padrões).
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Optional[str]] = [None]
+        for pattern in patterns:
+            if pattern:
+                self._insert(pattern)
+        self._link()
+
+    def _insert(self, pattern: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] = pattern
+
+    def _link(self) -> None:
+        # BFS: o link de falha de cada estado aponta para o maior sufixo próprio que também é
+        # prefixo de algum padrão; a saída herda a do link (padrões contidos em outros)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[nxt] is None:
+                    self._out[nxt] = self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> Optional[str]:
+        """Primeiro padrão encontrado em `text` (ou None)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] is not None:
+                return out[state]
+        return None
+
+
+class ReplyGuard:
+    """
+    Sanitização da resposta do modelo: qualquer marcador encontrado troca a resposta inteira.
+    Com poucos marcadores, `in` (busca em C) é mais rápido que o autômato em Python puro; a
+    partir de AUTOMATON_MIN_MARKERS o custo de `in` cresce com a lista e o autômato passa a
+    ser usado (ver scripts/bench_reply_guard.py).
+    """
+
+    AUTOMATON_MIN_MARKERS = 64
+
+    def __init__(self, markers: Iterable[str], replacement: str = DEFAULT_REPLACEMENT) -> None:
+        self.markers = sorted({m.strip().lower() for m in markers if m and m.strip()})
+        self.replacement = replacement
+        self._automaton = AhoCorasick(self.markers) if len(self.markers) >= self.AUTOMATON_MIN_MARKERS else None
+
+    def find(self, text: str) -> Optional[str]:
+        """Primeiro marcador presente em `text` (ou None)."""
+        low = (text or "").lower()
+        if self._automaton is not None:
+            return self._automaton.search(low)
+        return next((m for m in self.markers if m in low), None)
+
+    def sanitize(self, text: str) -> str:
+        if self.find(text) is not None:
+            return self.replacement
+        return text
+
+
+class StreamGuard:
+    """
+    Liberação dos tokens de uma resposta em streaming só depois de passarem pelo `ReplyGuard`.
+    Um marcador pode começar no fim de um token e terminar no seguinte, então as últimas
+    (maior marcador - 1) letras ficam retidas até chegar mais texto ou até `flush()`. Achado um
+    marcador, nada mais é liberado (a resposta final será a de substituição).
+    Cada `feed` verifica só o texto novo + a parte retida: custo linear na resposta inteira.
+    """
+
+    def __init__(self, guard: ReplyGuard) -> None:
+        self.guard = guard
+        self.blocked = False
+        self._hold = max((len(m) for m in guard.markers), default=1) - 1
+        self._text = ""
+        self._checked = 0
+        self._sent = 0
+
+    @property
+    def emitted(self) -> str:
+        """Texto já liberado para o cliente."""
+        return self._text[:self._sent]
+
+    def feed(self, chunk: str) -> str:
+        """Acrescenta um token e devolve o trecho que já pode ser enviado ("" se nenhum)."""
+        self._text += chunk
+        if self.blocked:
+            return ""
+        if self.guard.find(self._text[max(0, self._checked - self._hold):]) is not None:
+            self.blocked = True
+            return ""
+        self._checked = len(self._text)
+        return self._release(len(self._text) - self._hold)
+
+    def flush(self) -> str:
+        """Fim do streaming: devolve o trecho retido (se a resposta não foi bloqueada)."""
+        if self.blocked:
+            return ""
+        return self._release(len(self._text))
+
+    def _release(self, end: int) -> str:
+        if end <= self._sent:
+            return ""
+        chunk = self._text[self._sent:end]
+        self._sent = end
+        return chunk
+
+
+def _split_markers(raw: Any) -> List[str]:
+    """Aceita lista separada por vírgula, ponto e vírgula ou quebra de linha."""
+    if not raw:
+        return []
+    text = str(raw).replace(";", "\n").replace(",", "\n")
+    return [m for m in (part.strip() for part in text.splitlines()) if m]
+
+
+default_guard = ReplyGuard(DEFAULT_MARKERS)
+_configured: Tuple[Any, Any, Optional[ReplyGuard]] = (None, None, None)
+
+
+def guard_from_config(configuracoes: Dict[str, Any]) -> ReplyGuard:
+    """
+    Guarda com os marcadores padrão + `chat_marcadores_bloqueados` e a resposta
+    `chat_resposta_bloqueio` de `configuracoes`. O autômato só é reconstruído quando esses
+    valores mudam.
+    """
+    global _configured
+    raw_markers = configuracoes.get(CONFIG_MARKERS_KEY)
+    raw_replacement = configuracoes.get(CONFIG_REPLACEMENT_KEY)
+    if not raw_markers and not raw_replacement:
+        return default_guard
+    cached_markers, cached_replacement, guard = _configured
+    if guard is not None and cached_markers == raw_markers and cached_replacement == raw_replacement:
+        return guard
+    guard = ReplyGuard(DEFAULT_MARKERS + _split_markers(raw_markers), raw_replacement or DEFAULT_REPLACEMENT)
+    _configured = (raw_markers, raw_replacement, guard)
+    return guard
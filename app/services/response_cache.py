@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from ..core.invalidation import on_change
+from .text_normalize import normalize_text
+
+# Camada semântica opcional: sem NumPy, o cache funciona só por pergunta normalizada idêntica
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+# Perguntas que dependem do histórico ("e quanto custa?", "esse horário serve?") não são
+# reaproveitadas entre sessões
+_FOLLOW_UP_STARTS = ("e ", "mas ", "entao ", "tambem ", "ai ")
+_FOLLOW_UP_WORDS = {
+    "isso", "isto", "esse", "essa", "esses", "essas", "este", "esta", "aquele", "aquela",
+    "ele", "ela", "eles", "elas", "dele", "dela", "nele", "nela", "mesmo", "mesma", "la", "ai",
+}
+# Palavras que a camada semântica pode ignorar; negações ("nao", "nunca", "sem") e o resto
+# contam: um vizinho só é aceito com as mesmas palavras de conteúdo da pergunta
+_FILLER_WORDS = {
+    "o", "a", "os", "as", "um", "uma", "de", "do", "da", "dos", "das", "e", "em", "no", "na",
+    "nos", "nas", "para", "pra", "por", "favor", "me", "qual", "quais", "que", "eu", "gostaria",
+    "queria", "saber", "ola", "oi", "bom", "dia", "boa", "tarde", "noite",
+}
+
+
+def _content_words(norm: str) -> frozenset:
+    return frozenset(w for w in norm.split() if w not in _FILLER_WORDS)
+
+
+def context_digest(history: List[Dict[str, Any]], summary: Optional[str] = None, facts: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Resumo (sha1) do que o modelo sabe da conversa além da pergunta: mensagens anteriores,
+    resumo e fatos. Entra na chave do cache, então uma resposta só é reaproveitada por outra
+    sessão com o mesmo contexto (na prática, perguntas de abertura, sem histórico).
+    """
+    if not history and not summary and not facts:
+        return ""
+    payload = json.dumps(
+        [[(m.get("role"), m.get("content")) for m in history], summary or "", facts or {}],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("reply", "version", "expires_at", "row")
+
+    def __init__(self, reply: str, version: int, expires_at: float, row: Optional[int]) -> None:
+        self.reply = reply
+        self.version = version
+        self.expires_at = expires_at
+        self.row = row
+
+
+class ResponseCache:
+    """
+    Cache de respostas do chat para perguntas repetidas (preços, convênios, horários).
+    - Chave: pergunta normalizada (minúsculas, sem acentos/pontuação) + `context_digest` da
+      conversa (mensagens anteriores, resumo e fatos) + `version` do snapshot do painel;
+      entradas de outra versão nunca são servidas. "sim" depois de uma proposta de horário
+      numa sessão não responde o "sim" de outra.
+    - Camada semântica (opcional, com NumPy; desligada por padrão): cada pergunta vira um vetor
+      de trigramas de caracteres (hashing, L2-normalizado) numa matriz; a busca é um produto
+      matricial (cosseno) e aceita o melhor vizinho acima de CHAT_RESPONSE_CACHE_SIMILARITY
+      (0 = desativada) se ele tiver as mesmas palavras de conteúdo (ver `_FILLER_WORDS`).
+      Trigramas não distinguem "posso remarcar" de "não posso remarcar".
+    - LRU com CHAT_RESPONSE_CACHE_MAX_ENTRIES entradas e expiração por CHAT_RESPONSE_CACHE_TTL_SECONDS.
+    - Esvaziado quando configuracoes/servicos/profissionais/faq/convenios mudam.
+    Só perguntas autocontidas (CHAT_RESPONSE_CACHE_MIN_WORDS palavras, sem referência ao
+    histórico) entram. Desative com CHAT_RESPONSE_CACHE=0.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("CHAT_RESPONSE_CACHE", "1").strip().lower() not in ("0", "false", "no")
+        self.max_entries = int(os.getenv("CHAT_RESPONSE_CACHE_MAX_ENTRIES", "500"))
+        self.ttl = float(os.getenv("CHAT_RESPONSE_CACHE_TTL_SECONDS", "600"))
+        self.min_words = int(os.getenv("CHAT_RESPONSE_CACHE_MIN_WORDS", "3"))
+        self.similarity = float(os.getenv("CHAT_RESPONSE_CACHE_SIMILARITY", "0"))
+        self.dim = int(os.getenv("CHAT_RESPONSE_CACHE_DIM", "1024"))
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._row_keys: List[Optional[str]] = []
+        self._free_rows: List[int] = []
+        self._stats: Dict[str, int] = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def semantic(self) -> bool:
+        return np is not None and self.similarity > 0 and self.max_entries > 0
+
+    def key(self, question: str) -> Optional[str]:
+        """Pergunta normalizada, ou None se não for reaproveitável."""
+        if not self.enabled or self.max_entries <= 0:
+            return None
+        norm = normalize_text(question)
+        words = norm.split()
+        if len(words) < self.min_words:
+            return None
+        if (norm + " ").startswith(_FOLLOW_UP_STARTS) or any(w in _FOLLOW_UP_WORDS for w in words):
+            return None
+        return norm
+
+    def get(self, question: str, version: int, context: str = "") -> Optional[str]:
+        norm = self.key(question)
+        if norm is None:
+            return None
+        vec = self._embed(norm) if self.semantic else None
+        now = time.monotonic()
+        cache_key = f"{context}|{norm}"
+        with self._lock:
+            entry = self._valid(cache_key, version, now)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self._stats["hits"] += 1
+                return entry.reply
+            if vec is not None and self._matrix is not None and self._entries:
+                sims = self._matrix @ vec
+                row = int(sims.argmax())
+                best = self._row_keys[row]
+                if (
+                    best is not None
+                    and float(sims[row]) >= self.similarity
+                    and best.startswith(f"{context}|")
+                    and _content_words(best.split("|", 1)[1]) == _content_words(norm)
+                ):
+                    entry = self._valid(best, version, now)
+                    if entry is not None:
+                        self._entries.move_to_end(best)
+                        self._stats["semantic_hits"] += 1
+                        return entry.reply
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, question: str, version: int, reply: str, context: str = "") -> None:
+        norm = self.key(question)
+        if norm is None or not reply:
+            return
+        vec = self._embed(norm) if self.semantic else None
+        cache_key = f"{context}|{norm}"
+        with self._lock:
+            self._remove(cache_key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+            row = None
+            if vec is not None:
+                if self._matrix is None:
+                    self._matrix = np.zeros((self.max_entries, self.dim), dtype=np.float32)
+                    self._row_keys = [None] * self.max_entries
+                    self._free_rows = list(range(self.max_entries - 1, -1, -1))
+                row = self._free_rows.pop()
+                self._matrix[row] = vec
+                self._row_keys[row] = cache_key
+            self._entries[cache_key] = _Entry(reply, version, time.monotonic() + self.ttl, row)
+            self._stats["stores"] += 1
+
+    def invalidate(self, *_args: Any, **_info: Any) -> None:
+        with self._lock:
+            for norm in list(self._entries):
+                self._remove(norm)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "semantic": self.semantic}
+
+    # ===== Helpers internos (chamados com o lock, exceto _embed) =====
+    def _valid(self, cache_key: str, version: int, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        if entry.version != version or entry.expires_at <= now:
+            self._remove(cache_key)
+            return None
+        return entry
+
+    def _remove(self, cache_key: str) -> None:
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None and entry.row is not None:
+            self._matrix[entry.row] = 0.0
+            self._row_keys[entry.row] = None
+            self._free_rows.append(entry.row)
+
+    def _embed(self, norm: str):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        padded = f" {norm} "
+        for i in range(len(padded) - 2):
+            vec[zlib.crc32(padded[i:i + 3].encode("utf-8")) % self.dim] += 1.0
+        length = float(np.linalg.norm(vec))
+        return vec / length if length else vec
+
+
+response_cache = ResponseCache()
+on_change(["configuracoes", "servicos_clinica", "profissionais", "faq", "convenios_aceitos"], response_cache.invalidate)
@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Flight:
+    __slots__ = ("future", "expires_at")
+
+    def __init__(self, future: "asyncio.Future[Any]") -> None:
+        self.future = future
+        self.expires_at = float("inf")  # em andamento
+
+
+class SingleFlight:
+    """
+    Deduplicação de mensagens repetidas do chat (duplo clique, reenvio do front).
+    A primeira requisição de uma chave (sessão + hash da mensagem) executa o turno; as
+    repetidas que chegam enquanto ela roda recebem o mesmo resultado, sem nova chamada ao
+    modelo nem linhas duplicadas no histórico. Terminado o turno, a chave é liberada: a mesma
+    resposta curta repetida de propósito ("sim", "1") é um turno novo. CHAT_DEDUP_WINDOW_SECONDS
+    (padrão 0) guarda o resultado por mais alguns segundos, para reenvios que chegam depois da
+    resposta; falhas e respostas que quem chama não quer guardar (`keep`) nunca ficam.
+    Desative com CHAT_DEDUP=0.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("CHAT_DEDUP", "1").strip().lower() not in ("0", "false", "no")
+        self.window = float(os.getenv("CHAT_DEDUP_WINDOW_SECONDS", "0"))
+        self._flights: "OrderedDict[str, _Flight]" = OrderedDict()
+        self._stats: Dict[str, int] = {"leaders": 0, "coalesced": 0, "coalesced_in_flight": 0}
+
+    @staticmethod
+    def key(namespace: str, session_id: str, message: str) -> str:
+        digest = hashlib.sha1(message.encode("utf-8")).hexdigest()
+        return f"{namespace}:{session_id}:{digest}"
+
+    def _prune(self, now: float) -> None:
+        # Ordem de início; uma entrada em andamento no topo apenas adia a limpeza
+        while self._flights:
+            flight = next(iter(self._flights.values()))
+            if flight.expires_at > now:
+                break
+            self._flights.popitem(last=False)
+
+    def claim(self, key: str) -> Tuple[bool, "asyncio.Future[Any]"]:
+        """(True, futuro) para quem deve executar e depois chamar `resolve`/`fail`; (False, futuro) para repetidos."""
+        now = time.monotonic()
+        self._prune(now)
+        flight = self._flights.get(key)
+        if flight is not None and flight.expires_at > now and not flight.future.cancelled():
+            self._stats["coalesced"] += 1
+            if not flight.future.done():
+                self._stats["coalesced_in_flight"] += 1
+            return False, flight.future
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._flights[key] = _Flight(future)
+        self._flights.move_to_end(key)
+        self._stats["leaders"] += 1
+        return True, future
+
+    def resolve(self, key: str, future: "asyncio.Future[Any]", value: Any, keep: bool = True) -> None:
+        """Entrega o resultado aos repetidos em espera; com `keep` e janela > 0, guarda-o por `window` segundos."""
+        if not future.done():
+            future.set_result(value)
+        flight = self._flights.get(key)
+        if flight is not None and flight.future is future:
+            if keep and self.window > 0:
+                flight.expires_at = time.monotonic() + self.window
+            else:
+                del self._flights[key]
+
+    def fail(self, key: str, future: "asyncio.Future[Any]", error: Optional[BaseException] = None) -> None:
+        """Libera a chave; repetidos em espera recebem o erro (ou cancelamento) e executam por conta própria."""
+        flight = self._flights.get(key)
+        if flight is not None and flight.future is future:
+            del self._flights[key]
+        if not future.done():
+            if not isinstance(error, Exception):
+                future.cancel()
+            else:
+                future.set_exception(error)
+                # Evita o aviso "exception was never retrieved" quando não há repetidos
+                future.exception()
+
+    async def wait(self, future: "asyncio.Future[Any]") -> Tuple[bool, Any]:
+        """Aguarda o resultado do primeiro; (False, None) se ele falhou ou foi cancelado."""
+        try:
+            return True, await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return False, None
+            raise
+        except Exception:
+            return False, None
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], keep: Optional[Callable[[Any], bool]] = None) -> Any:
+        if not self.enabled:
+            return await fn()
+        leader, future = self.claim(key)
+        if not leader:
+            ok, value = await self.wait(future)
+            if ok:
+                return value
+            return await fn()
+        try:
+            value = await fn()
+        except BaseException as e:
+            self.fail(key, future, e)
+            raise
+        self.resolve(key, future, value, keep is None or keep(value))
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "tracked": len(self._flights), "window_seconds": self.window, "enabled": self.enabled}
+
+
+single_flight = SingleFlight()
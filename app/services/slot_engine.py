@@ -0,0 +1,119 @@
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+# Um dia é representado em minutos inteiros a partir de 00:00 (0..1440); intervalos são
+# semiabertos [inicio, fim)
+MINUTES_PER_DAY = 24 * 60
+
+Interval = Tuple[int, int]
+
+# "HH:MM" pré-calculado para todos os minutos do dia (sem strftime por slot)
+_HHMM = [f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_PER_DAY + 1)]
+
+
+def to_minutes(value: Any) -> Optional[int]:
+    """
+    Minutos desde 00:00 para os formatos de hora que chegam do banco: `time` (psycopg),
+    `timedelta` (colunas TIME no PyMySQL), `datetime` ou texto "HH:MM[:SS]". None se vazio.
+    """
+    if value is None:
+        return None
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    if isinstance(value, timedelta):
+        return int(value.total_seconds()) // 60
+    if isinstance(value, datetime):
+        return value.hour * 60 + value.minute
+    if isinstance(value, str) and value:
+        parts = value.split(":")
+        return int(parts[0]) * 60 + int(parts[1])
+    return None
+
+
+def format_minutes(minutes: int) -> str:
+    if 0 <= minutes <= MINUTES_PER_DAY:
+        return _HHMM[minutes]
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Ordena e funde intervalos sobrepostos ou encostados em uma única varredura."""
+    ordered = sorted(iv for iv in intervals if iv[1] > iv[0])
+    merged: List[Interval] = []
+    for start, end in ordered:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_gaps(work_start: int, work_end: int, busy: Iterable[Interval]) -> Iterator[Interval]:
+    """Trechos livres do expediente [work_start, work_end) descontados os períodos ocupados."""
+    cursor = work_start
+    for start, end in merge_intervals(busy):
+        if end <= cursor:
+            continue
+        if start >= work_end:
+            break
+        if start > cursor:
+            yield cursor, start
+        cursor = max(cursor, end)
+        if cursor >= work_end:
+            return
+    if cursor < work_end:
+        yield cursor, work_end
+
+
+def iter_free_slots(
+    work_start: int,
+    work_end: int,
+    busy: Iterable[Interval],
+    duration: int,
+    step: Optional[int] = None,
+) -> Iterator[Interval]:
+    """
+    Slots livres de `duration` minutos, gerados sob demanda (em ordem).
+    - step=None: slots encadeados a partir do início de cada trecho livre (o primeiro slot
+      depois de uma consulta começa quando ela termina), como `calcular_slots_disponiveis`.
+    - step=N: slots alinhados à grade work_start + k*N, independentemente de onde terminam
+      as consultas e bloqueios.
+    """
+    if duration <= 0 or work_end <= work_start:
+        return
+    for gap_start, gap_end in free_gaps(work_start, work_end, busy):
+        if step:
+            offset = (gap_start - work_start) % step
+            start = gap_start + (step - offset if offset else 0)
+            stride = step
+        else:
+            start = gap_start
+            stride = duration
+        last_start = gap_end - duration
+        while start <= last_start:
+            yield start, start + duration
+            start += stride
+
+
+def slots_as_dicts(slots: Iterable[Interval]) -> List[Dict[str, Any]]:
+    """Formato de resposta de `/api/slots-disponiveis`."""
+    return [{"inicio": _HHMM[s], "fim": _HHMM[e], "disponivel": True} for s, e in slots]
+
+
+def day_busy(
+    intervalo_inicio: Any,
+    intervalo_fim: Any,
+    ocupados: Sequence[Tuple[Any, Any]],
+) -> List[Interval]:
+    """Intervalo de descanso + agendamentos/bloqueios (horas em qualquer formato de `to_minutes`)."""
+    busy: List[Interval] = []
+    pause_start, pause_end = to_minutes(intervalo_inicio), to_minutes(intervalo_fim)
+    if pause_start is not None and pause_end is not None:
+        busy.append((pause_start, pause_end))
+    for inicio, fim in ocupados:
+        start, end = to_minutes(inicio), to_minutes(fim)
+        if start is not None and end is not None:
+            busy.append((start, end))
+    return busy
@@ -0,0 +1,332 @@
+import asyncio
+import os
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from ..core.db import async_db, is_postgres_connection
+from ..core.invalidation import on_change
+from .availability import TIPOS_COMPATIVEIS, AvailabilityWindow, _placeholders, _row_slots
+from .slot_engine import format_minutes
+
+
+# Tabelas cuja gravação muda a disponibilidade (quem grava chama notify_change após o commit)
+WATCHED_TABLES = ["agendamentos", "bloqueios_agenda", "disponibilidades_profissional"]
+
+
+class SlotStore:
+    """
+    Slots livres materializados na tabela `slots_livres` (profissional, data, minuto de início),
+    criada por scripts/create_scheduling_tables.py, de hoje até AGENDA_SLOTS_HORIZONTE_DIAS.
+    - Leitura: varredura de faixa no índice, sem recalcular a agenda a cada consulta.
+    - Escrita: a cada notify_change, só o trecho afetado é recalculado e regravado, em
+      background (os dias do agendamento/bloqueio; o horizonte do profissional quando a grade
+      semanal muda). Leituras no mesmo processo aplicam antes o que estiver pendente.
+    - `slots_livres_estado` guarda até que dia cada profissional foi gerado; quem ainda não
+      foi gerado (ou ficou para trás com a virada do dia) é gerado na primeira leitura.
+    Só PostgreSQL. Sem a tabela, com AGENDA_SLOTS_MATERIALIZADOS=0 ou para datas além do
+    horizonte, as rotas calculam os slots na hora (AvailabilityWindow).
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.getenv("AGENDA_SLOTS_MATERIALIZADOS", "1").strip().lower() not in ("0", "false", "no")
+        self.horizon_days = int(os.getenv("AGENDA_SLOTS_HORIZONTE_DIAS", "90"))
+        self.insert_batch = int(os.getenv("AGENDA_SLOTS_INSERT_LOTE", "500"))
+        self._rebuild_all = False
+        self._dirty_professionals: Set[int] = set()
+        # profissional_id (None = bloqueio geral) -> (primeiro, último) dia a recalcular
+        self._dirty_ranges: Dict[Optional[int], Tuple[date, date]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._failed_at = 0.0
+        self._stats: Dict[str, int] = {
+            "reads": 0, "rebuilt_professionals": 0, "refreshed_ranges": 0, "rows_written": 0, "fallbacks": 0,
+        }
+        on_change(WATCHED_TABLES, self.mark_dirty)
+
+    def _horizon_end(self) -> date:
+        return date.today() + timedelta(days=self.horizon_days - 1)
+
+    # ===== Invalidação =====
+    def mark_dirty(self, table: str, **info: Any) -> None:
+        if not self.enabled:
+            return
+        profissional_id = info.get("profissional_id")
+        inicio = info.get("data") or info.get("data_inicio")
+        fim = info.get("data") or info.get("data_fim") or inicio
+        if table == "disponibilidades_profissional" or inicio is None:
+            # Grade semanal (ou gravação sem data): o horizonte inteiro
+            if profissional_id is None:
+                self._rebuild_all = True
+            else:
+                self._dirty_professionals.add(profissional_id)
+        else:
+            inicio, fim = max(inicio, date.today()), min(fim, self._horizon_end())
+            if inicio > fim:
+                return
+            atual = self._dirty_ranges.get(profissional_id)
+            if atual:
+                inicio, fim = min(inicio, atual[0]), max(fim, atual[1])
+            self._dirty_ranges[profissional_id] = (inicio, fim)
+        self._schedule()
+
+    def _pending(self) -> bool:
+        return self._rebuild_all or bool(self._dirty_professionals) or bool(self._dirty_ranges)
+
+    def _schedule(self) -> None:
+        # O custo de regravar fica na escrita, fora da resposta de quem lê
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._apply_in_background())
+
+    async def _apply_in_background(self) -> None:
+        await asyncio.sleep(0)  # junta as notificações da mesma requisição
+        try:
+            async with async_db() as db:
+                if is_postgres_connection(db):
+                    await self.apply_pending(db)
+        except Exception as e:
+            print(f"[SlotStore] falha ao atualizar slots_livres: {e}")
+
+    # ===== Escrita =====
+    async def apply_pending(self, db) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            rebuild_all, self._rebuild_all = self._rebuild_all, False
+            professionals, self._dirty_professionals = self._dirty_professionals, set()
+            ranges, self._dirty_ranges = self._dirty_ranges, {}
+            try:
+                if rebuild_all:
+                    professionals = set(await self._active_professionals(db))
+                if professionals:
+                    await self._rebuild(db, sorted(professionals), date.today(), self._horizon_end(), track=True)
+                    self._stats["rebuilt_professionals"] += len(professionals)
+                for pid, (inicio, fim) in ranges.items():
+                    if pid in professionals:
+                        continue
+                    # Bloqueio geral: todos os profissionais no período
+                    pids = [pid] if pid is not None else await self._active_professionals(db)
+                    await self._rebuild(db, pids, max(inicio, date.today()), fim)
+                    self._stats["refreshed_ranges"] += 1
+            except Exception:
+                # Devolve o trabalho para a próxima tentativa
+                self._rebuild_all |= rebuild_all
+                self._dirty_professionals |= professionals
+                for pid, (inicio, fim) in ranges.items():
+                    atual = self._dirty_ranges.get(pid, (inicio, fim))
+                    self._dirty_ranges[pid] = (min(inicio, atual[0]), max(fim, atual[1]))
+                raise
+
+    async def _active_professionals(self, db) -> List[int]:
+        async with db.cursor() as cur:
+            await cur.execute("SELECT id FROM profissionais WHERE ativo = 1 ORDER BY id")
+            return [r["id"] for r in (await cur.fetchall()) or []]
+
+    async def _rebuild(self, db, profissional_ids: Sequence[int], inicio: date, fim: date, track: bool = False) -> None:
+        """Recalcula [inicio, fim] dos profissionais (quatro consultas) e troca as linhas numa transação."""
+        if not profissional_ids or inicio > fim:
+            return
+        window = await AvailabilityWindow.load(db, profissional_ids, inicio, fim)
+        rows: List[Tuple[Any, ...]] = []
+        for pid in window.profissionais:
+            dia = inicio
+            while dia <= fim:
+                # Uma linha por expediente, com o tipo dele; o filtro de tipo fica na leitura
+                occupied = window.busy(pid, dia)
+                for row in window.day_rows(pid, dia):
+                    for s, e, _ in _row_slots(row, occupied, None):
+                        rows.append((pid, dia, s, e, row["tipo_atendimento"]))
+                dia += timedelta(days=1)
+
+        marks = _placeholders(profissional_ids)
+        async with db.transaction():
+            async with db.cursor() as cur:
+                # Dias passados saem junto com o trecho recalculado
+                await cur.execute(
+                    f"DELETE FROM slots_livres WHERE profissional_id IN ({marks}) AND (data < %s OR data BETWEEN %s AND %s)",
+                    (*profissional_ids, date.today(), inicio, fim),
+                )
+                for i in range(0, len(rows), self.insert_batch):
+                    batch = rows[i:i + self.insert_batch]
+                    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))
+                    await cur.execute(
+                        f"INSERT INTO slots_livres (profissional_id, data, inicio_min, fim_min, tipo_atendimento) VALUES {values} "
+                        "ON CONFLICT DO NOTHING",
+                        tuple(v for row in batch for v in row),
+                    )
+                if track:
+                    values = ", ".join(["(%s, %s, %s, CURRENT_TIMESTAMP)"] * len(profissional_ids))
+                    await cur.execute(
+                        f"""
+                        INSERT INTO slots_livres_estado (profissional_id, gerado_de, gerado_ate, atualizado_em)
+                        VALUES {values}
+                        ON CONFLICT (profissional_id) DO UPDATE
+                        SET gerado_de = EXCLUDED.gerado_de, gerado_ate = EXCLUDED.gerado_ate, atualizado_em = CURRENT_TIMESTAMP
+                        """,
+                        tuple(v for pid in profissional_ids for v in (pid, inicio, fim)),
+                    )
+        self._stats["rows_written"] += len(rows)
+
+    async def _ensure_generated(self, db, profissional_ids: Sequence[int]) -> None:
+        """Gera o horizonte de quem ainda não está materializado ou ficou para trás com a virada do dia."""
+        marks = _placeholders(profissional_ids)
+        async with db.cursor() as cur:
+            await cur.execute(
+                f"SELECT profissional_id, gerado_ate FROM slots_livres_estado WHERE profissional_id IN ({marks})",
+                tuple(profissional_ids),
+            )
+            gerado_ate = {r["profissional_id"]: r["gerado_ate"] for r in (await cur.fetchall()) or []}
+        horizon_end = self._horizon_end()
+        missing = [pid for pid in profissional_ids if gerado_ate.get(pid) is None or gerado_ate[pid] < horizon_end]
+        if missing:
+            await self._rebuild(db, missing, date.today(), horizon_end, track=True)
+            self._stats["rebuilt_professionals"] += len(missing)
+
+    # ===== Leitura =====
+    def usable(self, db, data_fim: date) -> bool:
+        if not self.enabled or not is_postgres_connection(db) or data_fim > self._horizon_end():
+            return False
+        # Depois de uma falha (ex.: tabela ainda não criada), tenta de novo após 60s
+        return not self._failed_at or time.monotonic() - self._failed_at > 60
+
+    async def read(
+        self,
+        db,
+        profissional_ids: Sequence[int],
+        inicio: date,
+        fim: date,
+        tipo_atendimento: Optional[str] = None,
+        not_before: Optional[int] = None,
+        limit: Optional[int] = None,
+        max_por_profissional: Optional[int] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Slots livres em ordem (data, início, profissional), com profissional_id, data,
+        inicio_min, fim_min, nome e especialidade. `not_before` vale para o dia `inicio`.
+        None quando a tabela não pode ser usada; quem chama recalcula com AvailabilityWindow.
+        """
+        ids = list(dict.fromkeys(profissional_ids))
+        if not ids or not self.usable(db, fim):
+            return None
+        try:
+            if self._pending():
+                await self.apply_pending(db)
+            await self._ensure_generated(db, ids)
+            where = [f"s.profissional_id IN ({_placeholders(ids)})", "s.data BETWEEN %s AND %s"]
+            params: List[Any] = [*ids, inicio, fim]
+            if tipo_atendimento:
+                tipos = TIPOS_COMPATIVEIS.get(tipo_atendimento, [tipo_atendimento])
+                where.append(f"s.tipo_atendimento IN ({_placeholders(tipos)})")
+                params.extend(tipos)
+            if not_before is not None:
+                where.append("(s.data > %s OR s.inicio_min >= %s)")
+                params.extend([inicio, not_before])
+            row_number = ", ROW_NUMBER() OVER (PARTITION BY s.profissional_id ORDER BY s.data, s.inicio_min) AS n"
+            sql = f"""
+                SELECT s.profissional_id, s.data, s.inicio_min, s.fim_min, p.nome, p.especialidade
+                {row_number if max_por_profissional else ""}
+                FROM slots_livres s
+                JOIN profissionais p ON p.id = s.profissional_id AND p.ativo = 1
+                WHERE {" AND ".join(where)}
+            """
+            if max_por_profissional:
+                sql = f"SELECT * FROM ({sql}) r WHERE n <= %s"
+                params.append(max_por_profissional)
+            sql += " ORDER BY data, inicio_min, profissional_id"
+            if limit:
+                sql += " LIMIT %s"
+                params.append(limit)
+            async with db.cursor() as cur:
+                await cur.execute(sql, tuple(params))
+                rows = (await cur.fetchall()) or []
+            self._stats["reads"] += 1
+            self._failed_at = 0.0
+            return rows
+        except Exception as e:
+            print(f"[SlotStore] slots_livres indisponível, calculando na hora: {e}")
+            self._failed_at = time.monotonic()
+            self._stats["fallbacks"] += 1
+            return None
+
+    async def next_available(
+        self,
+        db,
+        profissional_ids: Sequence[int],
+        data_inicio: date,
+        dias: int,
+        quantidade: int,
+        tipo_atendimento: Optional[str] = None,
+        not_before: Optional[int] = None,
+        max_por_profissional: Optional[int] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Mesmo resultado de `find_next_available`, em uma consulta com LIMIT; None para recalcular."""
+        if not profissional_ids or quantidade <= 0 or dias <= 0:
+            return []
+        rows = await self.read(
+            db, sorted(set(profissional_ids)), data_inicio, data_inicio + timedelta(days=dias - 1),
+            tipo_atendimento, not_before, quantidade, max_por_profissional,
+        )
+        if rows is None:
+            return None
+        return [
+            {
+                "profissional_id": r["profissional_id"],
+                "profissional_nome": r["nome"],
+                "especialidade": r.get("especialidade"),
+                "data": r["data"].isoformat(),
+                "inicio": format_minutes(r["inicio_min"]),
+                "fim": format_minutes(r["fim_min"]),
+                "duracao_consulta": r["fim_min"] - r["inicio_min"],
+            }
+            for r in rows
+        ]
+
+    async def period(
+        self,
+        db,
+        profissional_ids: Sequence[int],
+        inicio: date,
+        fim: date,
+        tipo_atendimento: Optional[str] = None,
+        not_before: Optional[int] = None,
+    ) -> Optional[Tuple[Dict[int, Dict[str, Any]], Dict[Tuple[int, date], List[Tuple[int, int, int]]]]]:
+        """
+        Para `/api/slots-disponiveis/periodo`: profissionais ativos e slots (inicio, fim, duracao)
+        por (profissional, dia); None para recalcular com AvailabilityWindow.
+        """
+        rows = await self.read(db, profissional_ids, inicio, fim, tipo_atendimento, not_before)
+        if rows is None:
+            return None
+        ids = list(dict.fromkeys(profissional_ids))
+        async with db.cursor() as cur:
+            await cur.execute(
+                f"SELECT id, nome, especialidade FROM profissionais WHERE id IN ({_placeholders(ids)}) AND ativo = 1",
+                tuple(ids),
+            )
+            profissionais = {
+                r["id"]: {"id": r["id"], "nome": r["nome"], "especialidade": r.get("especialidade")}
+                for r in (await cur.fetchall()) or []
+            }
+        by_day: Dict[Tuple[int, date], List[Tuple[int, int, int]]] = {}
+        for r in rows:
+            by_day.setdefault((r["profissional_id"], r["data"]), []).append(
+                (r["inicio_min"], r["fim_min"], r["fim_min"] - r["inicio_min"])
+            )
+        return profissionais, by_day
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "horizon_days": self.horizon_days,
+            "pending_professionals": len(self._dirty_professionals),
+            "pending_ranges": len(self._dirty_ranges),
+            "available": not self._failed_at,
+        }
+
+
+slot_store = SlotStore()
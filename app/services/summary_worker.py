@@ -0,0 +1,263 @@
+import asyncio
+import os
+from typing import Dict, Optional, Set
+
+from ..core.db import async_db, is_postgres_connection
+from .chat_writer import chat_writer
+from .conversation_cache import conversation_cache
+from .llm_admission import PRIORITY_BACKGROUND, llm_admission
+from .openai_service import OpenAIService
+
+
+async def summarize_conversation(conversation_id: int, ai: OpenAIService) -> bool:
+    """
+    Atualiza o resumo da conversa de forma incremental: resumo anterior + mensagens novas
+    desde `summary_last_message_id` (marca d'água). Lê no máximo
+    CHAT_SUMMARY_BATCH_MESSAGES mensagens / CHAT_SUMMARY_MAX_INPUT_CHARS caracteres,
+    então o custo de leitura e de tokens por sumarização é constante.
+    A conexão do pool não fica presa durante a chamada ao modelo: leitura, modelo e gravação
+    (resumo + remoção do job em `summary_jobs`) usam empréstimos separados. A gravação só vale
+    se a marca d'água ainda for a lida (outro processo pode ter resumido no meio tempo).
+    Retorna True se ainda restam mensagens além do lote processado.
+    """
+    batch_size = int(os.getenv("CHAT_SUMMARY_BATCH_MESSAGES", "40"))
+    max_chars = int(os.getenv("CHAT_SUMMARY_MAX_INPUT_CHARS", "12000"))
+    min_new = int(os.getenv("CHAT_SUMMARY_MIN_NEW_MESSAGES", "4"))
+
+    async with async_db() as db:
+        async with db.cursor() as cur:
+            await cur.execute("SELECT summary, summary_last_message_id FROM conversations WHERE id = %s", (conversation_id,))
+            conv = await cur.fetchone()
+            if conv:
+                previous_summary = conv["summary"] if isinstance(conv, dict) else conv[0]
+                last_id = (conv["summary_last_message_id"] if isinstance(conv, dict) else conv[1]) or 0
+
+                # Busca um a mais para saber se há mensagens além do lote
+                await cur.execute(
+                    "SELECT id, role, content FROM conversation_messages WHERE conversation_id = %s AND id > %s ORDER BY id ASC LIMIT %s",
+                    (conversation_id, last_id, batch_size + 1),
+                )
+                rows = (await cur.fetchall()) or []
+            else:
+                rows = []
+        # Nada a resumir agora (sem conversa, sem mensagens novas ou poucas para um resumo
+        # existente): o job termina aqui, ainda na mesma conexão
+        if not rows or (previous_summary and len(rows) < min_new):
+            await _delete_job(db, conversation_id)
+            return False
+
+    has_more = len(rows) > batch_size
+    text = []
+    used = 0
+    new_mark = last_id
+    for r in rows[:batch_size]:
+        msg_id = r["id"] if isinstance(r, dict) else r[0]
+        role = r["role"] if isinstance(r, dict) else r[1]
+        content = r["content"] if isinstance(r, dict) else r[2]
+        line = f"{role.upper()}: {content}"
+        if text and used + len(line) > max_chars:
+            has_more = True
+            break
+        # Uma única mensagem maior que o limite é truncada (mantém o final)
+        if len(line) > max_chars:
+            line = line[-max_chars:]
+        text.append(line)
+        used += len(line)
+        new_mark = msg_id
+
+    # Prioridade mais baixa: cede as vagas de chamada ao modelo para o chat; se recusada,
+    # o job volta para a tabela e é tentado de novo
+    async with llm_admission.slot(f"summary:{conversation_id}", PRIORITY_BACKGROUND):
+        summary = await ai.summarize_async("\n".join(text), max_words=300, previous_summary=previous_summary)
+
+    async with async_db() as db:
+        async with db.cursor() as cur:
+            await cur.execute(
+                "UPDATE conversations SET summary = %s, summary_last_message_id = %s, updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = %s AND COALESCE(summary_last_message_id, 0) = %s",
+                (summary, new_mark, conversation_id, last_id),
+            )
+            updated = cur.rowcount
+        await _delete_job(db, conversation_id)
+    if not updated:
+        # Resumo mais novo gravado por outro processo: descarta este e relê na próxima rodada
+        return True
+    conversation_cache.set_summary(conversation_id, summary)
+    return has_more
+
+
+async def _delete_job(db, conversation_id: int) -> None:
+    if is_postgres_connection(db):
+        async with db.cursor() as cur:
+            await cur.execute("DELETE FROM summary_jobs WHERE conversation_id = %s", (conversation_id,))
+
+
+class SummaryWorker:
+    """
+    Fila de sumarização em background.
+    - Em memória (asyncio): um job por `conversation_id`; novos pedidos dentro do debounce
+      apenas adiam a execução (o resumo roda uma vez, após a conversa "assentar").
+    - Tabela `summary_jobs` como fallback durável: recebe jobs quando a fila em memória está
+      cheia/parada, jobs que falharam e os pendentes no shutdown; é lida no startup e
+      periodicamente (inclusive jobs deixados por outros workers do uvicorn).
+    """
+
+    def __init__(self) -> None:
+        self.debounce = float(os.getenv("CHAT_SUMMARY_DEBOUNCE_SECONDS", "5"))
+        self.poll_interval = float(os.getenv("CHAT_SUMMARY_POLL_SECONDS", "30"))
+        self.max_queue = int(os.getenv("CHAT_SUMMARY_QUEUE_SIZE", "1000"))
+        self.concurrency = max(1, int(os.getenv("CHAT_SUMMARY_WORKERS", "2")))
+        self.max_attempts = int(os.getenv("CHAT_SUMMARY_MAX_ATTEMPTS", "5"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._queued: Set[int] = set()
+        self._running: Set[int] = set()
+        self._tasks: list = []
+        self._stats: Dict[str, int] = {"scheduled": 0, "deduplicated": 0, "completed": 0, "failed": 0, "persisted": 0}
+
+    @property
+    def started(self) -> bool:
+        return self._queue is not None
+
+    async def start(self) -> None:
+        if self.started:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._poll_durable()))
+
+    async def stop(self) -> None:
+        if not self.started:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        pending = set(self._timers) | self._queued | self._running
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        self._queued.clear()
+        self._queue = None
+        # Pendentes não se perdem: ficam na tabela para o próximo processo
+        for conversation_id in pending:
+            await self._persist(conversation_id, delay=0)
+
+    def schedule(self, conversation_id: int) -> None:
+        """Agenda (ou adia, se já agendado) a sumarização da conversa. Não bloqueia."""
+        self._stats["scheduled"] += 1
+        if not self.started:
+            asyncio.get_running_loop().create_task(self._persist(conversation_id, delay=self.debounce))
+            return
+        if conversation_id in self._queued:
+            self._stats["deduplicated"] += 1
+            return
+        loop = asyncio.get_running_loop()
+        handle = self._timers.pop(conversation_id, None)
+        if handle is not None:
+            handle.cancel()
+            self._stats["deduplicated"] += 1
+        self._timers[conversation_id] = loop.call_later(self.debounce, self._enqueue, conversation_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self._stats,
+            "debouncing": len(self._timers),
+            "queued": len(self._queued),
+            "running": len(self._running),
+        }
+
+    # ===== Helpers internos =====
+    def _enqueue(self, conversation_id: int) -> None:
+        self._timers.pop(conversation_id, None)
+        if self._queue is None or conversation_id in self._queued:
+            return
+        try:
+            self._queue.put_nowait(conversation_id)
+            self._queued.add(conversation_id)
+        except asyncio.QueueFull:
+            asyncio.get_running_loop().create_task(self._persist(conversation_id, delay=0))
+
+    async def _consume(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            conversation_id = await queue.get()
+            self._queued.discard(conversation_id)
+            if conversation_id in self._running:
+                # Já em execução: reagenda para depois do resumo atual
+                self.schedule(conversation_id)
+                queue.task_done()
+                continue
+            self._running.add(conversation_id)
+            try:
+                # Write-behind: o resumo precisa enxergar as mensagens ainda no buffer
+                await chat_writer.flush()
+                has_more = await summarize_conversation(conversation_id, OpenAIService())
+                self._stats["completed"] += 1
+                if has_more:
+                    # Backlog longo (ex.: conversa antiga): segue em lotes, um por execução
+                    self.schedule(conversation_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Job fica/volta para a tabela e é tentado de novo pelo poll
+                self._stats["failed"] += 1
+                print(f"[SummaryWorker] falha ao resumir conversa {conversation_id}: {e}")
+                await self._persist(conversation_id, delay=self.poll_interval)
+            finally:
+                self._running.discard(conversation_id)
+                queue.task_done()
+
+    async def _persist(self, conversation_id: int, delay: float) -> None:
+        try:
+            async with async_db() as db:
+                if not is_postgres_connection(db):
+                    return
+                async with db.cursor() as cur:
+                    await cur.execute(
+                        """
+                        INSERT INTO summary_jobs (conversation_id, due_at, attempts)
+                        VALUES (%s, CURRENT_TIMESTAMP + make_interval(secs => %s), 0)
+                        ON CONFLICT (conversation_id) DO UPDATE SET due_at = EXCLUDED.due_at
+                        """,
+                        (conversation_id, delay),
+                    )
+            self._stats["persisted"] += 1
+        except Exception as e:
+            print(f"[SummaryWorker] falha ao persistir job da conversa {conversation_id}: {e}")
+
+    async def _poll_durable(self) -> None:
+        while True:
+            try:
+                async with async_db() as db:
+                    if is_postgres_connection(db):
+                        async with db.cursor() as cur:
+                            # Reivindica os jobs vencidos com um lease (seguro entre processos);
+                            # se o processo cair, o job volta a vencer e é retomado
+                            await cur.execute(
+                                """
+                                UPDATE summary_jobs
+                                SET due_at = CURRENT_TIMESTAMP + make_interval(secs => %s), attempts = attempts + 1
+                                WHERE conversation_id IN (
+                                    SELECT conversation_id FROM summary_jobs
+                                    WHERE due_at <= CURRENT_TIMESTAMP AND attempts < %s
+                                    ORDER BY due_at
+                                    LIMIT 50
+                                    FOR UPDATE SKIP LOCKED
+                                )
+                                RETURNING conversation_id
+                                """,
+                                (self.poll_interval * 4, self.max_attempts),
+                            )
+                            rows = (await cur.fetchall()) or []
+                        for r in rows:
+                            self.schedule(r["conversation_id"] if isinstance(r, dict) else r[0])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SummaryWorker] falha ao ler summary_jobs: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+summary_worker = SummaryWorker()
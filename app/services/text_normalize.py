@@ -0,0 +1,22 @@
+import re
+import unicodedata
+from typing import List
+
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def fold_accents(text: str) -> str:
+    """Remove acentos/diacríticos ("não" -> "nao", "ação" -> "acao")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos e sem pontuação, com espaços colapsados."""
+    return _NON_WORD.sub(" ", fold_accents((text or "").lower())).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados (ver `normalize_text`)."""
+    return normalize_text(text).split()
@@ -0,0 +1,164 @@
+import os
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Tokenizer oficial (opcional). Sem o pacote, ou sem os arquivos BPE em cache
+# (TIKTOKEN_CACHE_DIR, para ambientes offline), cai na estimativa por caracteres.
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+
+# Custo fixo do formato de chat da OpenAI: por mensagem e para iniciar a resposta
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_REPLY_PRIMING = 3
+
+
+def _tokenizer_model() -> str:
+    return os.getenv("CHAT_TOKENIZER_MODEL") or os.getenv("OPENAI_MODEL", "gpt-4o")
+
+
+@lru_cache(maxsize=8)
+def _encoder(model: str):
+    """Encoder carregado uma vez por modelo; None quando indisponível."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Nome de deployment/modelo desconhecido: usa a codificação dos modelos gpt-4o
+        pass
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _count(text: str, model: str) -> int:
+    enc = _encoder(model)
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    """Tokens de um texto. Cacheado por texto: a janela do chat se repete entre turnos."""
+    if not text:
+        return 0
+    return _count(text, model or _tokenizer_model())
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+    """Tokens de prompt de uma lista de mensagens no formato de chat."""
+    total = _TOKENS_REPLY_PRIMING
+    for m in messages:
+        total += _TOKENS_PER_MESSAGE + count_tokens(m.get("content"), model)
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Mantém o início do texto com no máximo `max_tokens` tokens."""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    enc = _encoder(model or _tokenizer_model())
+    if enc is None:
+        return text[: max_tokens * 4]
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+
+async def fit_prompt(
+    system_rules: str,
+    history: List[Dict[str, str]],
+    *,
+    summary: Optional[str] = None,
+    facts: Optional[str] = None,
+    faq: Optional[str] = None,
+    snapshot: Optional[Callable[[int], Awaitable[str]]] = None,
+    model: Optional[str] = None,
+) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+    """
+    Monta as mensagens do modelo dentro de CHAT_PROMPT_MAX_TOKENS.
+    Prioridade (da maior para a menor): regras do system, mensagem atual do usuário
+    (última da janela), fatos, resumo (até CHAT_PROMPT_SUMMARY_TOKENS), FAQs relevantes
+    (até CHAT_PROMPT_FAQ_TOKENS), snapshot do painel (até CHAT_PROMPT_SNAPSHOT_TOKENS) e o restante da janela, da mais recente para a mais antiga.
+    `snapshot` recebe o orçamento em tokens e devolve (awaitable) o JSON que cabe nele.
+    Retorna as mensagens e contagens: `prompt_tokens` (enviado) e `context_tokens`
+    (tamanho do contexto completo, antes dos cortes; usado no limiar de sumarização).
+    """
+    max_tokens = int(os.getenv("CHAT_PROMPT_MAX_TOKENS", "6000"))
+    summary_cap = int(os.getenv("CHAT_PROMPT_SUMMARY_TOKENS", "800"))
+    snapshot_cap = int(os.getenv("CHAT_PROMPT_SNAPSHOT_TOKENS", "1500"))
+    faq_cap = int(os.getenv("CHAT_PROMPT_FAQ_TOKENS", "600"))
+
+    history_costs = [_TOKENS_PER_MESSAGE + count_tokens(m["content"], model) for m in history]
+    summary_text = f"Resumo da conversa até aqui:\n{summary}" if summary else ""
+    facts_text = f"Fatos conhecidos sobre o usuário:\n{facts}" if facts else ""
+    faq_text = f"Perguntas frequentes relevantes:\n{faq}" if faq else ""
+    context_tokens = (
+        _TOKENS_REPLY_PRIMING
+        + _TOKENS_PER_MESSAGE * 2
+        + count_tokens(system_rules, model)
+        + count_tokens(summary_text, model)
+        + count_tokens(facts_text, model)
+        + count_tokens(faq_text, model)
+        + sum(history_costs)
+    )
+
+    # Obrigatórios: regras, bloco de contexto e a mensagem atual
+    used = _TOKENS_REPLY_PRIMING + _TOKENS_PER_MESSAGE * 2 + count_tokens(system_rules, model)
+    if history_costs:
+        used += history_costs[-1]
+
+    parts: List[str] = []
+    if facts_text:
+        used += count_tokens(facts_text, model)
+    if summary_text:
+        summary_text = truncate_to_tokens(summary_text, min(summary_cap, max(0, max_tokens - used)), model)
+        if summary_text:
+            parts.append(summary_text)
+            used += count_tokens(summary_text, model)
+    if faq_text:
+        faq_text = truncate_to_tokens(faq_text, min(faq_cap, max(0, max_tokens - used)), model)
+        if faq_text:
+            parts.append(faq_text)
+            used += count_tokens(faq_text, model)
+    if snapshot is not None:
+        header = "Dados do painel (contexto):\n"
+        snap_budget = min(snapshot_cap, max_tokens - used) - count_tokens(header, model)
+        snap_str = await snapshot(snap_budget) if snap_budget > 0 else ""
+        if snap_str:
+            parts.append(header + snap_str)
+            snap_tokens = count_tokens(parts[-1], model)
+            used += snap_tokens
+            context_tokens += snap_tokens
+    if facts_text:
+        parts.append(facts_text)
+
+    # Janela: entra da mais recente para a mais antiga enquanto houver orçamento
+    start = max(0, len(history) - 1)
+    while start > 0 and used + history_costs[start - 1] <= max_tokens:
+        start -= 1
+        used += history_costs[start]
+
+    messages: List[Dict[str, str]] = [{"role": "system", "content": system_rules}]
+    if parts:
+        messages.append({"role": "system", "content": "\n\n".join(parts)})
+    messages.extend(history[start:])
+    return messages, {
+        "prompt_tokens": count_message_tokens(messages, model),
+        "context_tokens": context_tokens,
+        "dropped_messages": start,
+    }
+
+
+def budget_info() -> Dict[str, Any]:
+    """Tokenizer em uso (para diagnóstico)."""
+    model = _tokenizer_model()
+    enc = _encoder(model)
+    return {"model": model, "tokenizer": enc.name if enc is not None else "chars/4"}
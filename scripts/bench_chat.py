@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga do chat (`/api/messages` e `/api/messages/stream`)
+Dispara N sessões simultâneas, cada uma com T mensagens em sequência, contra a aplicação
+rodando com PostgreSQL e um provedor de IA (de preferência o mock: scripts/mock_llm_server.py).
+Reporta p50/p95/p99 de latência (e do primeiro token, no modo stream), vazão, erros e, com as
+variáveis PG* definidas, consultas ao banco por mensagem (delta de `xact_commit` em
+`pg_stat_database`: com autocommit, cada comando é uma transação).
+
+Uso:
+    python scripts/mock_llm_server.py --latency-ms 800 &
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn app.main:app --port 8000 &
+    python scripts/bench_chat.py --url http://127.0.0.1:8000 --sessions 50 --turns 5 --concurrency 20 [--stream]
+
+O banco é compartilhado: rode sem outras cargas para que o número de consultas faça sentido.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+try:
+    import psycopg
+except Exception:
+    psycopg = None
+
+
+_QUESTIONS = [
+    "Olá, boa tarde",
+    "Quais serviços vocês oferecem?",
+    "Meu nome é Ana e tenho 34 anos",
+    "Qual o valor da consulta?",
+    "Vocês aceitam convênio?",
+    "Tem horário na quinta de manhã?",
+    "Prefiro pela tarde",
+    "Quanto tempo dura a sessão?",
+    "Qual o endereço da clínica?",
+    "Obrigada!",
+]
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def _fmt_ms(value: Optional[float]) -> str:
+    return f"{value * 1000:8.1f} ms" if value is not None else "       -"
+
+
+def _pg_commits() -> Optional[int]:
+    """Total de transações confirmadas no banco da aplicação (None sem PG* / psycopg)."""
+    if psycopg is None or not os.getenv("PGHOST"):
+        return None
+    try:
+        with psycopg.connect(
+            host=os.getenv("PGHOST"),
+            port=int(os.getenv("PGPORT", "5432")),
+            user=os.getenv("PGUSER"),
+            password=os.getenv("PGPASSWORD"),
+            dbname=os.getenv("PGDATABASE"),
+            sslmode=os.getenv("PGSSLMODE", "require"),
+            autocommit=True,
+        ) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_stat_clear_snapshot()")
+                cur.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+                row = cur.fetchone()
+                return int(row[0]) if row else None
+    except Exception as e:
+        print(f"[Bench] pg_stat_database indisponível: {e}")
+        return None
+
+
+class Results:
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.first_token: List[float] = []
+        self.errors: Dict[str, int] = {}
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+async def _turn_json(client: httpx.AsyncClient, session_id: str, message: str, results: Results) -> None:
+    started = time.perf_counter()
+    resp = await client.post("/api/messages", json={"message": message, "sessionId": session_id})
+    elapsed = time.perf_counter() - started
+    if resp.status_code != 200:
+        results.error(f"http_{resp.status_code}")
+        return
+    if not resp.json().get("success", True):
+        results.error("success_false")
+        return
+    results.latencies.append(elapsed)
+
+
+async def _turn_stream(client: httpx.AsyncClient, session_id: str, message: str, results: Results) -> None:
+    started = time.perf_counter()
+    first: Optional[float] = None
+    done = False
+    async with client.stream("POST", "/api/messages/stream", json={"message": message, "sessionId": session_id}) as resp:
+        if resp.status_code != 200:
+            results.error(f"http_{resp.status_code}")
+            return
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:].strip())
+            if first is None and event.get("type") in ("token", "done"):
+                first = time.perf_counter() - started
+            if event.get("type") == "done":
+                done = True
+    if not done:
+        results.error("stream_incompleto")
+        return
+    results.latencies.append(time.perf_counter() - started)
+    if first is not None:
+        results.first_token.append(first)
+
+
+async def _session(client: httpx.AsyncClient, turns: int, stream: bool, limiter: asyncio.Semaphore, results: Results, rng: random.Random) -> None:
+    session_id = f"bench-{uuid.uuid4().hex[:12]}"
+    async with limiter:
+        for _ in range(turns):
+            message = rng.choice(_QUESTIONS)
+            try:
+                if stream:
+                    await _turn_stream(client, session_id, message, results)
+                else:
+                    await _turn_json(client, session_id, message, results)
+            except httpx.TimeoutException:
+                results.error("timeout")
+            except Exception as e:
+                results.error(type(e).__name__)
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, timeout=args.timeout, limits=limits) as client:
+        if args.warmup:
+            # Aquece snapshot/índices da aplicação; fora das estatísticas
+            await _session(client, args.warmup, args.stream, asyncio.Semaphore(1), Results(), rng)
+
+        commits_before = _pg_commits()
+        results = Results()
+        limiter = asyncio.Semaphore(args.concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _session(client, args.turns, args.stream, limiter, results, rng) for _ in range(args.sessions)
+        ))
+        wall = time.perf_counter() - started
+        if commits_before is not None:
+            # Escritas em segundo plano (chat_writer) e o envio das estatísticas ao coletor
+            await asyncio.sleep(args.settle)
+        commits_after = _pg_commits() if commits_before is not None else None
+
+    ok = len(results.latencies)
+    total = args.sessions * args.turns
+    print(f"\nModo: {'stream' if args.stream else 'json'} | sessões={args.sessions} turnos={args.turns} concorrência={args.concurrency}")
+    print(f"Mensagens: {ok}/{total} ok em {wall:.2f}s -> {ok / wall:.1f} msg/s")
+    print(f"Latência    p50 {_fmt_ms(_percentile(results.latencies, 0.50))}  p95 {_fmt_ms(_percentile(results.latencies, 0.95))}  p99 {_fmt_ms(_percentile(results.latencies, 0.99))}")
+    if args.stream:
+        print(f"1º token    p50 {_fmt_ms(_percentile(results.first_token, 0.50))}  p95 {_fmt_ms(_percentile(results.first_token, 0.95))}  p99 {_fmt_ms(_percentile(results.first_token, 0.99))}")
+    if results.errors:
+        print("Erros: " + ", ".join(f"{k}={v}" for k, v in sorted(results.errors.items())))
+    if commits_before is not None and commits_after is not None and total:
+        # Inclui as conexões do próprio benchmark (2 consultas) e a checagem do pool (SELECT 1)
+        queries = commits_after - commits_before
+        print(f"Banco: {queries} transações -> {queries / total:.2f} por mensagem")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de carga do chat")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10, help="sessões simultâneas")
+    parser.add_argument("--stream", action="store_true", help="usa /api/messages/stream e mede o 1º token")
+    parser.add_argument("--warmup", type=int, default=2, help="mensagens de aquecimento antes da medição")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--settle", type=float, default=1.5, help="espera antes de ler pg_stat_database")
+    parser.add_argument("--token", default=os.getenv("APP_AUTH_TOKEN"), help="Bearer token (APP_AUTH_TOKEN)")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
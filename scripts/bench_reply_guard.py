@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark da sanitização de respostas do chat (`_sanitize_reply`)
+Compara, por resposta, a varredura linear com `in` (implementação anterior), uma regex
+alternada, o autômato de Aho-Corasick e o `ReplyGuard` (que escolhe entre `in` e o autômato
+pelo tamanho da lista; `app/services/reply_guard.py`) conforme a lista de marcadores cresce.
+
+Uso: python scripts/bench_reply_guard.py [--replies 2000] [--sizes 16,100,300,1000]
+"""
+
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.reply_guard import DEFAULT_MARKERS, AhoCorasick, ReplyGuard  # noqa: E402
+
+
+_WORDS = (
+    "olá claro posso ajudar com o seu agendamento temos horários disponíveis na terça e na quinta "
+    "pela manhã a consulta com a doutora dura cerca de cinquenta minutos e o valor é informado "
+    "na recepção você prefere algum turno específico ou deseja que eu sugira o primeiro horário"
+).split()
+
+
+def _markers(n: int, rng: random.Random) -> list:
+    markers = list(DEFAULT_MARKERS)
+    while len(markers) < n:
+        size = rng.randint(2, 3)
+        markers.append(" ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(size)))
+    return markers[:n]
+
+
+def _replies(count: int, rng: random.Random) -> list:
+    # Respostas limpas (pior caso: a varredura percorre o texto inteiro)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(30, 120))) for _ in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replies", type=int, default=2000)
+    parser.add_argument("--sizes", default="16,100,300,1000")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    replies = [r.lower() for r in _replies(args.replies, rng)]
+    print(f"{'marcadores':>10} | {'linear (µs)':>12} | {'regex (µs)':>11} | {'aho-corasick (µs)':>18} | {'ReplyGuard (µs)':>16}")
+    print("-" * 81)
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        markers = _markers(n, rng)
+        regex = re.compile("|".join(re.escape(m) for m in sorted(markers, key=len, reverse=True)))
+        automaton = AhoCorasick(markers)
+        guard = ReplyGuard(markers)
+
+        def linear():
+            for text in replies:
+                any(m in text for m in markers)
+
+        def alternation():
+            for text in replies:
+                regex.search(text)
+
+        def aho():
+            for text in replies:
+                automaton.search(text)
+
+        def guarded():
+            for text in replies:
+                guard.find(text)
+
+        results = []
+        for fn in (linear, alternation, aho, guarded):
+            best = min(timeit.repeat(fn, number=1, repeat=5))
+            results.append(best / len(replies) * 1e6)
+        print(f"{n:>10} | {results[0]:>12.2f} | {results[1]:>11.2f} | {results[2]:>18.2f} | {results[3]:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
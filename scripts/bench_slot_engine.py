@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cálculo de slots livres por profissional-dia
+Compara a implementação anterior de `calcular_slots_disponiveis` (datetime/timedelta/strftime
+por slot; copiada abaixo como referência) com o motor em minutos inteiros
+(`app/services/slot_engine.py`), sobre milhares de profissionais-dia sintéticos com
+intervalo de almoço, consultas, encaixes fora da grade e bloqueios sobrepostos. Antes de medir,
+confere que as duas versões geram exatamente os mesmos slots.
+
+Uso: python scripts/bench_slot_engine.py [--days 5000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.slot_engine import day_busy, iter_free_slots, slots_as_dicts, to_minutes  # noqa: E402
+
+
+def legacy_slots(
+    hora_inicio: time,
+    hora_fim: time,
+    intervalo_inicio: Optional[time],
+    intervalo_fim: Optional[time],
+    duracao_consulta: int,
+    agendamentos_existentes: List[tuple],
+) -> List[dict]:
+    """Implementação anterior de `calcular_slots_disponiveis` (app/routers/agendamento.py)."""
+    slots = []
+    base_date = date.today()
+    inicio_trabalho = datetime.combine(base_date, hora_inicio)
+    fim_trabalho = datetime.combine(base_date, hora_fim)
+    inicio_intervalo = datetime.combine(base_date, intervalo_inicio) if intervalo_inicio else None
+    fim_intervalo = datetime.combine(base_date, intervalo_fim) if intervalo_fim else None
+    periodos_ocupados = []
+    if inicio_intervalo and fim_intervalo:
+        periodos_ocupados.append((inicio_intervalo, fim_intervalo))
+    for agendamento in agendamentos_existentes:
+        inicio_agend = datetime.combine(base_date, agendamento[0])
+        fim_agend = datetime.combine(base_date, agendamento[1])
+        periodos_ocupados.append((inicio_agend, fim_agend))
+    periodos_ocupados.sort(key=lambda x: x[0])
+    atual = inicio_trabalho
+    for periodo_ocupado in periodos_ocupados:
+        inicio_ocupado, fim_ocupado = periodo_ocupado
+        while atual + timedelta(minutes=duracao_consulta) <= inicio_ocupado:
+            slot_fim = atual + timedelta(minutes=duracao_consulta)
+            slots.append({"inicio": atual.time().strftime("%H:%M"), "fim": slot_fim.time().strftime("%H:%M"), "disponivel": True})
+            atual += timedelta(minutes=duracao_consulta)
+        atual = max(atual, fim_ocupado)
+    while atual + timedelta(minutes=duracao_consulta) <= fim_trabalho:
+        slot_fim = atual + timedelta(minutes=duracao_consulta)
+        slots.append({"inicio": atual.time().strftime("%H:%M"), "fim": slot_fim.time().strftime("%H:%M"), "disponivel": True})
+        atual += timedelta(minutes=duracao_consulta)
+    return slots
+
+
+def engine_slots(hora_inicio, hora_fim, intervalo_inicio, intervalo_fim, duracao_consulta, agendamentos_existentes) -> List[dict]:
+    busy = day_busy(intervalo_inicio, intervalo_fim, agendamentos_existentes)
+    return slots_as_dicts(iter_free_slots(to_minutes(hora_inicio), to_minutes(hora_fim), busy, duracao_consulta))
+
+
+def engine_first_slot(hora_inicio, hora_fim, intervalo_inicio, intervalo_fim, duracao_consulta, agendamentos_existentes):
+    """Uso típico do bot ("primeiro horário livre"): a geração sob demanda para no primeiro."""
+    busy = day_busy(intervalo_inicio, intervalo_fim, agendamentos_existentes)
+    return next(iter_free_slots(to_minutes(hora_inicio), to_minutes(hora_fim), busy, duracao_consulta), None)
+
+
+def _t(minutes: int) -> time:
+    return time(minutes // 60, minutes % 60)
+
+
+def _professional_day(rng: random.Random) -> tuple:
+    start = rng.choice([7, 8, 9]) * 60 + rng.choice([0, 30])
+    end = rng.choice([17, 18, 19]) * 60
+    duration = rng.choice([20, 30, 40, 45, 50, 60])
+    pause = (12 * 60, 13 * 60) if rng.random() < 0.8 else (None, None)
+    busy = []
+    # Consultas na grade do dia
+    cursor = start
+    while cursor + duration <= end:
+        if rng.random() < 0.45:
+            busy.append((_t(cursor), _t(cursor + duration)))
+        cursor += duration
+    # Encaixes fora da grade e bloqueios parciais (podem se sobrepor às consultas)
+    for _ in range(rng.randint(0, 3)):
+        s = rng.randrange(start, end - 15)
+        busy.append((_t(s), _t(min(end, s + rng.choice([15, 25, 40, 90])))))
+    rng.shuffle(busy)
+    return (
+        _t(start), _t(end),
+        _t(pause[0]) if pause[0] is not None else None,
+        _t(pause[1]) if pause[1] is not None else None,
+        duration, busy,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do cálculo de slots livres")
+    parser.add_argument("--days", type=int, default=5000, help="profissionais-dia sintéticos")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    days = [_professional_day(rng) for _ in range(args.days)]
+
+    mismatches = sum(1 for d in days if legacy_slots(*d) != engine_slots(*d))
+    total_slots = sum(len(engine_slots(*d)) for d in days)
+    print(f"{len(days)} profissionais-dia, {total_slots} slots livres, divergências: {mismatches}")
+
+    cases = [
+        ("anterior (datetime/strftime)", legacy_slots),
+        ("motor em minutos", engine_slots),
+        ("motor, só o 1º slot", engine_first_slot),
+    ]
+    baseline = None
+    for label, fn in cases:
+        best = min(timeit.repeat(lambda: [fn(*d) for d in days], number=1, repeat=args.repeat))
+        per_day = best / len(days) * 1e6
+        baseline = baseline or best
+        print(f"{label:32s} {best * 1000:8.1f} ms  {per_day:7.2f} µs/dia  ({baseline / best:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
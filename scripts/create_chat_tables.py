@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Script para criar/atualizar tabelas auxiliares do chat (/api/messages)
+"""
+
+import os
+import sys
+
+import psycopg
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+
+
+SQL_COMMANDS = [
+    # 1. Fila durável de sumarização (fallback da fila em memória do SummaryWorker)
+    """
+    CREATE TABLE IF NOT EXISTS summary_jobs (
+        conversation_id INTEGER PRIMARY KEY REFERENCES conversations(id) ON DELETE CASCADE,
+        due_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_summary_jobs_due_at ON summary_jobs(due_at);
+    """,
+    # 2. Marca d'água do resumo incremental (última mensagem já incorporada ao resumo)
+    """
+    ALTER TABLE conversations
+    ADD COLUMN IF NOT EXISTS summary_last_message_id BIGINT;
+    """,
+    # 3. Fatos do usuário extraídos incrementalmente (nome, idade, turno, profissional, serviço)
+    """
+    ALTER TABLE conversations
+    ADD COLUMN IF NOT EXISTS facts JSONB;
+    """,
+    # 4. Regras de sanitização do chat editáveis no painel (o POST /configuracoes só atualiza chaves existentes)
+    """
+    INSERT INTO configuracoes (chave, valor)
+    SELECT 'chat_marcadores_bloqueados', ''
+    WHERE NOT EXISTS (SELECT 1 FROM configuracoes WHERE chave = 'chat_marcadores_bloqueados');
+    """,
+    """
+    INSERT INTO configuracoes (chave, valor)
+    SELECT 'chat_resposta_bloqueio', ''
+    WHERE NOT EXISTS (SELECT 1 FROM configuracoes WHERE chave = 'chat_resposta_bloqueio');
+    """,
+]
+
+
+def create_chat_tables() -> bool:
+    """Executa os comandos DDL do chat"""
+    try:
+        conn = psycopg.connect(
+            host=os.getenv("PGHOST"),
+            port=int(os.getenv("PGPORT", "5432")),
+            user=os.getenv("PGUSER"),
+            password=os.getenv("PGPASSWORD"),
+            dbname=os.getenv("PGDATABASE"),
+            sslmode=os.getenv("PGSSLMODE", "require"),
+        )
+    except Exception as e:
+        print(f"Erro ao conectar no banco: {e}")
+        return False
+
+    try:
+        with conn.cursor() as cur:
+            for i, sql in enumerate(SQL_COMMANDS):
+                try:
+                    print(f"Executando comando {i+1}/{len(SQL_COMMANDS)}...")
+                    cur.execute(sql)
+                    conn.commit()
+                except Exception as e:
+                    print(f"Erro no comando {i+1}: {e}")
+                    conn.rollback()
+        print("Tabelas do chat criadas/atualizadas com sucesso!")
+        return True
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if not create_chat_tables():
+        sys.exit(1)
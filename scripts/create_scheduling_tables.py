@@ -173,6 +173,42 @@ def create_scheduling_tables():
         ('2025-01-01', '2025-01-01', 'feriado', 'Ano Novo'),
         ('2025-04-21', '2025-04-21', 'feriado', 'Tiradentes')
         ON CONFLICT DO NOTHING;
+        """,
+
+        # 11. Slots livres materializados (app/services/slot_store.py), minutos desde 00:00
+        """
+        CREATE TABLE IF NOT EXISTS slots_livres (
+            profissional_id INTEGER REFERENCES profissionais(id) ON DELETE CASCADE,
+            data DATE NOT NULL,
+            inicio_min SMALLINT NOT NULL,
+            fim_min SMALLINT NOT NULL,
+            tipo_atendimento VARCHAR(20) NOT NULL,
+            PRIMARY KEY (profissional_id, data, inicio_min)
+        );
+        CREATE INDEX IF NOT EXISTS idx_slots_livres_data
+        ON slots_livres(data, inicio_min);
+        CREATE TABLE IF NOT EXISTS slots_livres_estado (
+            profissional_id INTEGER PRIMARY KEY REFERENCES profissionais(id) ON DELETE CASCADE,
+            gerado_de DATE NOT NULL,
+            gerado_ate DATE NOT NULL,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+
+        # 12. Sem dois agendamentos ativos (agendado/confirmado) sobrepostos do mesmo profissional
+        # (app/services/booking.py); falha se já houver sobreposição nos dados
+        """
+        CREATE EXTENSION IF NOT EXISTS btree_gist;
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'agendamentos_sem_sobreposicao') THEN
+                ALTER TABLE agendamentos ADD CONSTRAINT agendamentos_sem_sobreposicao
+                EXCLUDE USING gist (
+                    profissional_id WITH =,
+                    tsrange(data_consulta + hora_inicio, data_consulta + hora_fim) WITH &&
+                ) WHERE (status IN (0, 1));
+            END IF;
+        END $$;
         """
     ]
     
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatível com a API de chat da OpenAI/Azure OpenAI, para testes de carga do chat
+Responde POST /v1/chat/completions (OpenAI) e /openai/deployments/{deployment}/chat/completions
+(Azure), com e sem streaming, simulando latência, taxa de tokens e erros.
+
+Uso:
+    python scripts/mock_llm_server.py --port 8100 --latency-ms 800 --tokens-per-sec 60 --error-rate 0.02
+
+Apontando a aplicação para o mock:
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn app.main:app
+    (ou AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8100 AZURE_OPENAI_API_KEY=mock AZURE_OPENAI_DEPLOYMENT=mock)
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+_WORDS = (
+    "Claro posso ajudar com o seu agendamento Temos horários disponíveis pela manhã e à tarde "
+    "Você prefere algum profissional ou dia da semana Também posso informar valores e convênios"
+).split()
+
+
+class MockSettings:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.latency_ms = args.latency_ms
+        self.latency_sigma = args.latency_sigma
+        self.tokens_per_sec = args.tokens_per_sec
+        self.reply_tokens = args.reply_tokens
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.stall_rate = args.stall_rate
+        self.stall_ms = args.stall_ms
+        self.seed = args.seed
+
+
+def _first_token_delay(settings: MockSettings) -> float:
+    """Latência até o primeiro token: log-normal com mediana `latency_ms` e dispersão `latency_sigma`."""
+    delay = settings.latency_ms / 1000.0
+    if settings.latency_sigma > 0:
+        delay *= math.exp(random.gauss(0, settings.latency_sigma))
+    if settings.stall_rate and random.random() < settings.stall_rate:
+        # Cauda longa (brownout): algumas requisições demoram muito mais
+        delay += settings.stall_ms / 1000.0
+    return delay
+
+
+def _reply_words(settings: MockSettings) -> List[str]:
+    count = max(1, int(random.gauss(settings.reply_tokens, settings.reply_tokens * 0.25)))
+    return [random.choice(_WORDS) for _ in range(count)]
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content") or "")) for m in messages) // 4 + 3 * len(messages)
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI(title="mock-llm")
+    stats: Dict[str, int] = {"requests": 0, "streams": 0, "errors_500": 0, "errors_429": 0}
+
+    async def _handle(request: Request, deployment: str) -> Any:
+        body = await request.json()
+        messages = body.get("messages") or []
+        model = body.get("model") or deployment
+        stats["requests"] += 1
+
+        roll = random.random()
+        if roll < settings.error_rate:
+            stats["errors_500"] += 1
+            await asyncio.sleep(_first_token_delay(settings) * 0.2)
+            return JSONResponse(status_code=500, content={"error": {"message": "mock: erro injetado", "type": "server_error"}})
+        if roll < settings.error_rate + settings.rate_limit_rate:
+            stats["errors_429"] += 1
+            return JSONResponse(status_code=429, content={"error": {"message": "mock: rate limit injetado", "type": "rate_limit"}})
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        words = _reply_words(settings)
+        prompt_tokens = _prompt_tokens(messages)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+        per_token = 1.0 / settings.tokens_per_sec if settings.tokens_per_sec > 0 else 0.0
+
+        if body.get("stream"):
+            stats["streams"] += 1
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+            async def events() -> AsyncIterator[str]:
+                await asyncio.sleep(_first_token_delay(settings))
+                for i, word in enumerate(words):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    if per_token:
+                        await asyncio.sleep(per_token)
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                if include_usage:
+                    yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': [], 'usage': usage})}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(_first_token_delay(settings) + per_token * len(words))
+        return JSONResponse(content={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        return await _handle(request, "mock")
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_chat(deployment: str, request: Request):
+        return await _handle(request, deployment)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock local da API de chat da OpenAI/Azure OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=800, help="mediana da latência até o primeiro token")
+    parser.add_argument("--latency-sigma", type=float, default=0.35, help="dispersão log-normal da latência (0 = fixa)")
+    parser.add_argument("--tokens-per-sec", type=float, default=60, help="velocidade de geração (0 = instantâneo)")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="tamanho médio da resposta em tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fração de respostas 429")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fração de requisições com atraso extra")
+    parser.add_argument("--stall-ms", type=float, default=10000, help="atraso extra das requisições lentas")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(args)
+    if settings.seed is not None:
+        random.seed(settings.seed)
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Teste do cache de respostas do chat entre sessões (`app/services/response_cache.py`)
+Roda `/api/messages` (função `_message_reply`) com banco e modelo falsos, em memória:
+- a sessão A recebe uma proposta de horário e responde "sim" / "sim, pode ser";
+- a sessão B, depois de outra proposta, responde o mesmo e não pode receber a resposta de A;
+- perguntas de abertura, sem histórico, continuam sendo reaproveitadas entre sessões.
+
+Uso: python scripts/test_chat_cache_isolation.py
+"""
+
+import asyncio
+import contextlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("CHAT_PERSISTENCE_MODE", "sync")
+
+import app.routers.messages as messages  # noqa: E402
+from app.schemas.feedback import ChatIn  # noqa: E402
+from app.services.response_cache import response_cache  # noqa: E402
+
+
+class _FakeCursor:
+    """Responde só às consultas do turno do chat; o resto volta vazio."""
+
+    def __init__(self, db: "_FakeDB") -> None:
+        self.db = db
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    async def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.rows = []
+        if sql.startswith("SELECT id FROM conversations"):
+            conv = self.db.conversations.get(params[0])
+            self.rows = [{"id": conv}] if conv else []
+        elif sql.startswith("INSERT INTO conversations"):
+            conv = len(self.db.conversations) + 1
+            self.db.conversations[params[0]] = conv
+            self.rows = [{"id": conv}]
+        elif sql.startswith("INSERT INTO conversation_messages"):
+            self.db.messages.append({"conversation_id": params[0], "role": params[1], "content": params[2]})
+        elif sql.startswith("SELECT role, content FROM conversation_messages"):
+            rows = [m for m in self.db.messages if m["conversation_id"] == params[0]]
+            self.rows = list(reversed(rows[-params[1]:]))
+        elif sql.startswith("SELECT summary, facts"):
+            self.rows = [{"summary": None, "facts": None}]
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return self.rows
+
+
+class _FakeDB:
+    def __init__(self) -> None:
+        self.conversations = {}
+        self.messages = []
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+class _FakeModel:
+    """Responde pela última mensagem do usuário e pelo que o assistente propôs antes."""
+
+    calls = 0
+
+    async def chat_completion_async(self, msgs):
+        _FakeModel.calls += 1
+        user = msgs[-1]["content"].lower()
+        proposta = next((m["content"] for m in reversed(msgs[:-1]) if m["role"] == "assistant"), "")
+        if user.startswith("sim"):
+            reply = f"Confirmado: {proposta.replace('Posso agendar ', '').rstrip('?')}."
+        elif "tarde" in user:
+            reply = "Posso agendar quinta às 15h com o Dr. Paulo?"
+        elif "manha" in user or "manhã" in user:
+            reply = "Posso agendar terça às 9h com a Dra. Ana?"
+        else:
+            reply = "A consulta custa R$ 200,00."
+        return {"message": reply, "tokens": {"prompt_tokens": 1, "completion_tokens": 1}}
+
+
+def _setup() -> None:
+    db = _FakeDB()
+
+    @contextlib.asynccontextmanager
+    async def fake_async_db():
+        yield db
+
+    messages.async_db = fake_async_db
+    messages.is_postgres_connection = lambda _db: True
+    messages.OpenAIService = _FakeModel
+    response_cache.enabled = True
+    response_cache.min_words = 1
+    response_cache.invalidate()
+
+
+async def _say(session_id: str, text: str) -> str:
+    content = await messages._message_reply(ChatIn(sessionId=session_id, message=text), text)
+    return content["message"]
+
+
+async def test_resposta_curta_nao_vaza_entre_sessoes() -> None:
+    _setup()
+    a1 = await _say("sessao-a", "quero marcar uma consulta de manhã")
+    b1 = await _say("sessao-b", "quero marcar uma consulta à tarde")
+    assert a1 != b1, (a1, b1)
+
+    for resposta in ("sim", "sim, pode ser"):
+        a2 = await _say("sessao-a", resposta)
+        chamadas = _FakeModel.calls
+        b2 = await _say("sessao-b", resposta)
+        assert "9h" in a2 and "Dra. Ana" in a2, a2
+        assert b2 != a2, f"sessão B recebeu a resposta da sessão A: {b2!r}"
+        assert "15h" in b2, b2
+        assert _FakeModel.calls == chamadas + 1, "a resposta de B deveria vir do modelo"
+    print("✓ 'sim' da sessão B não recebe a resposta da sessão A")
+
+
+async def test_pergunta_de_abertura_reaproveitada() -> None:
+    _setup()
+    primeira = await _say("sessao-c", "quanto custa a consulta")
+    chamadas = _FakeModel.calls
+    segunda = await _say("sessao-d", "quanto custa a consulta")
+    assert segunda == primeira and _FakeModel.calls == chamadas, "pergunta sem histórico deveria vir do cache"
+    print("✓ pergunta de abertura, sem histórico, vem do cache para outra sessão")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_resposta_curta_nao_vaza_entre_sessoes())
+    asyncio.run(test_pergunta_de_abertura_reaproveitada())
+    print(response_cache.stats())
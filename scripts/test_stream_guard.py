@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Teste da sanitização no streaming do chat (`/api/messages/stream`, `app/services/reply_guard.py`)
+Roda `_stream_events` com banco e modelo falsos, em memória:
+- um marcador dividido entre dois tokens ("no ban" + "co de dados") não chega ao cliente em
+  nenhum evento `token`; o `done` traz a resposta de substituição com `replaced=true`;
+- uma resposta limpa chega inteira pelos tokens (o trecho retido sai no fim) e `replaced=false`;
+- o `StreamGuard` sozinho, token a token, nunca libera texto com marcador.
+
+Uso: python scripts/test_stream_guard.py
+"""
+
+import asyncio
+import contextlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("CHAT_PERSISTENCE_MODE", "sync")
+
+import app.routers.messages as messages  # noqa: E402
+from app.schemas.feedback import ChatIn  # noqa: E402
+from app.services.reply_guard import DEFAULT_REPLACEMENT, StreamGuard, default_guard  # noqa: E402
+from app.services.response_cache import response_cache  # noqa: E402
+
+
+class _FakeCursor:
+    """Responde só às consultas do turno do chat; o resto volta vazio."""
+
+    def __init__(self, db: "_FakeDB") -> None:
+        self.db = db
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    async def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.rows = []
+        if sql.startswith("SELECT id FROM conversations"):
+            conv = self.db.conversations.get(params[0])
+            self.rows = [{"id": conv}] if conv else []
+        elif sql.startswith("INSERT INTO conversations"):
+            conv = len(self.db.conversations) + 1
+            self.db.conversations[params[0]] = conv
+            self.rows = [{"id": conv}]
+        elif sql.startswith("INSERT INTO conversation_messages"):
+            self.db.messages.append({"conversation_id": params[0], "role": params[1], "content": params[2]})
+        elif sql.startswith("SELECT summary, facts"):
+            self.rows = [{"summary": None, "facts": None}]
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return self.rows
+
+
+class _FakeDB:
+    def __init__(self) -> None:
+        self.conversations = {}
+        self.messages = []
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+class _FakeModel:
+    """Emite a resposta configurada em `chunks`, um token por item."""
+
+    chunks = []
+
+    async def chat_completion_stream(self, msgs):
+        for chunk in _FakeModel.chunks:
+            yield {"type": "token", "content": chunk}
+        yield {"type": "usage", "tokens": {"prompt_tokens": 1, "completion_tokens": len(_FakeModel.chunks)}}
+
+
+def _setup(chunks) -> None:
+    db = _FakeDB()
+
+    @contextlib.asynccontextmanager
+    async def fake_async_db():
+        yield db
+
+    messages.async_db = fake_async_db
+    messages.is_postgres_connection = lambda _db: True
+    messages.OpenAIService = _FakeModel
+    response_cache.enabled = False
+    _FakeModel.chunks = chunks
+
+
+async def _events(text: str):
+    return [e async for e in messages._stream_events(ChatIn(sessionId="sessao-stream", message=text), text)]
+
+
+async def test_marcador_dividido_nao_vaza() -> None:
+    _setup(["Olá! Verifiquei aqui no ban", "co de dados e não há profissionais ", "disponíveis amanhã."])
+    events = await _events("tem horário amanhã?")
+    shown = "".join(e["content"] for e in events if e["type"] == "token")
+    assert default_guard.find(shown) is None, f"marcador chegou ao cliente: {shown!r}"
+    assert "no ban" not in shown, shown
+    done = events[-1]
+    assert done["type"] == "done" and done["replaced"] and done["message"] == DEFAULT_REPLACEMENT, done
+    print("✓ marcador dividido entre tokens não chega ao cliente")
+
+
+async def test_resposta_limpa_chega_inteira() -> None:
+    chunks = ["Temos horários ", "na terça às 9h ", "e na quinta às 15h."]
+    _setup(chunks)
+    events = await _events("quais horários vocês têm?")
+    shown = "".join(e["content"] for e in events if e["type"] == "token")
+    done = events[-1]
+    assert shown == "".join(chunks), shown
+    assert done["message"] == shown and not done["replaced"], done
+    print("✓ resposta limpa chega inteira pelos tokens, sem replaced")
+
+
+def test_stream_guard_token_a_token() -> None:
+    text = "Posso ajudar. Atualmente não há horários no sistema para esse dia."
+    stream = StreamGuard(default_guard)
+    shown = ""
+    for ch in text:
+        shown += stream.feed(ch)
+        assert default_guard.find(shown) is None, shown
+    shown += stream.flush()
+    assert stream.blocked and default_guard.find(shown) is None, shown
+    print("✓ StreamGuard não libera texto com marcador, mesmo letra a letra")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_marcador_dividido_nao_vaza())
+    asyncio.run(test_resposta_limpa_chega_inteira())
+    test_stream_guard_token_a_token()
@@ -96,6 +96,19 @@ function sendMessage() {
     
     // Envia para o servidor
     const API_BASE = (window.CONFIG && window.CONFIG.API_BASE) ? window.CONFIG.API_BASE : 'http://127.0.0.1:8000/api';
+    if (window.CONFIG && window.CONFIG.STREAMING && window.ReadableStream && window.TextDecoder) {
+        streamMessage(API_BASE, message)
+            .catch(error => {
+                hideTyping();
+                addDebugLog('Erro de rede (stream)', String(error));
+            })
+            .finally(() => {
+                isSending = false;
+                const sendBtn3 = document.getElementById('sendButton');
+                if (sendBtn3) sendBtn3.disabled = false;
+            });
+        return;
+    }
     fetch(`${API_BASE}/messages`, {
         method: 'POST',
         headers: {
@@ -146,6 +159,82 @@ function sendMessage() {
     });
 }
 
+// Streaming (SSE): exibe os tokens conforme chegam e aplica o texto final sanitizado no evento "done"
+async function streamMessage(API_BASE, message) {
+    const response = await fetch(`${API_BASE}/messages/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            ...(window.CONFIG && window.CONFIG.AUTH_TOKEN ? { 'Authorization': `Bearer ${window.CONFIG.AUTH_TOKEN}` } : {})
+        },
+        body: JSON.stringify({
+            message: message,
+            sessionId: sessionId,
+            isFirst: isFirstMessage
+        })
+    });
+    if (!response.ok || !response.body) {
+        throw new Error('HTTP ' + response.status);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    let messageId = null;
+
+    const handleEvent = (data) => {
+        if (data.type === 'token') {
+            text += data.content;
+            if (!messageId) {
+                hideTyping();
+                messageId = addMessage('bot', text);
+            } else {
+                setMessageText(messageId, text);
+            }
+        } else if (data.type === 'done') {
+            hideTyping();
+            if (!messageId) {
+                messageId = addMessage('bot', data.message);
+            } else if (data.replaced) {
+                setMessageText(messageId, data.message);
+            }
+            if (data.tokens) {
+                updateStats(data.tokens);
+            }
+            addDebugLog('Resposta recebida (stream)', data);
+            isFirstMessage = false;
+        }
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const chunk = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const line = chunk.split('\n').find(l => l.startsWith('data: '));
+            if (!line) continue;
+            try {
+                handleEvent(JSON.parse(line.slice(6)));
+            } catch (e) {
+                addDebugLog('Evento inválido no stream', chunk);
+            }
+        }
+    }
+}
+
+function setMessageText(messageId, content) {
+    const el = document.getElementById(messageId);
+    if (!el) return;
+    const p = el.querySelector('.message-text p') || el.querySelector('.content p');
+    if (p) p.innerHTML = formatMessage(content);
+    const messagesContainer = document.getElementById('chatMessages');
+    if (messagesContainer) messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
 function addMessage(type, content) {
     const messagesContainer = document.getElementById('chatMessages');
     const messageId = 'msg_' + (++messageIdCounter);
@@ -1,6 +1,7 @@
 window.CONFIG = {
   API_BASE: 'http://127.0.0.1:8000/api',
   AUTH_TOKEN: null,
+  STREAMING: true,
   GOOGLE_CLIENT_ID: '887886506943-srvna2o5t8rh6m7p6prct9cpubliedoq.apps.googleusercontent.com'
 };
 